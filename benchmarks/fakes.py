@@ -0,0 +1,407 @@
+"""
+Local stand-ins for every external service the planner talks to.
+
+Each backend sleeps for a configurable latency and fails at a configurable
+rate, and counts its calls. `FakeBackends.install()` patches them in place of
+Gemini, Reddit, Wikipedia, the NPS API, Amadeus, Priceline, Google Maps,
+Nominatim and OpenRouteService, so the pipeline runs with no network.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+from urllib.parse import urlparse
+
+import requests
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+# Latency (seconds) per backend when no profile is given
+DEFAULT_LATENCY = {
+    "gemini": 0.8,
+    "reddit": 0.3,
+    "wikipedia": 0.4,
+    "nps": 0.25,
+    "amadeus": 0.5,
+    "priceline": 0.6,
+    "google_maps": 0.15,
+    "nominatim": 0.2,
+    "openrouteservice": 0.3,
+}
+
+# Base coordinates for the cities the benchmarks plan trips to
+CITIES = {
+    "moab, ut": (38.5733, -109.5498),
+    "san diego, california": (32.7157, -117.1611),
+    "salt lake city, utah": (40.7608, -111.8910),
+    "washington dc": (38.9072, -77.0369),
+    "boston, ma": (42.3601, -71.0589),
+    "new york": (40.7128, -74.0060),
+    "denver, co": (39.7392, -104.9903),
+    "seattle, wa": (47.6062, -122.3321),
+}
+
+CANNED_ITINERARY = """Get ready for an unforgettable trip full of trails, history and food!
+**Day 1: Arrival and Old Town**
+* **9:00 AM** Arrive and check in to your hotel.
+* **11:00 AM** Explore Old Town State Historic Park.
+* **1:00 PM** Lunch at Casa Guadalajara.
+* **3:00 PM** Visit the Maritime Museum.
+* **7:00 PM** Dinner in the Gaslamp Quarter.
+**Day 2: Trails and Views**
+* **8:00 AM** Hike the Delicate Arch Trail at Arches National Park.
+* **12:00 PM** Picnic at Balboa Park.
+* **3:00 PM** Sunset at Dead Horse Point State Park.
+**Day 3: Museums**
+* **10:00 AM** Visit the Natural History Museum.
+* **2:00 PM** Stroll through Seaport Village.
+Flights and hotel details are listed below."""
+
+CANNED_PLACES = """Here are some places that match your interests:
+* **Balboa Park**: gardens, museums and trails.
+* **Arches National Park**: iconic sandstone arches and hiking.
+* **Gaslamp Quarter** - food and nightlife.
+* **Old Town State Historic Park**: history of the region."""
+
+CANNED_STRUCTURED = {
+    "sales_pitch": "Get ready for an unforgettable trip full of trails, history and food!",
+    "days": [
+        {
+            "day": 1, "title": "Arrival and Old Town", "locations": ["Old Town State Historic Park", "Maritime Museum"],
+            "activities": [
+                {"time": "11:00 AM", "description": "Explore Old Town.", "location": "Old Town State Historic Park"},
+                {"time": "3:00 PM", "description": "Visit the Maritime Museum.", "location": "Maritime Museum",
+                 "hours": "Daily 10am-5pm"},
+            ],
+        },
+        {
+            "day": 2, "title": "Trails", "locations": ["Arches National Park", "Balboa Park"],
+            "activities": [
+                {"time": "8:00 AM", "description": "Hike Delicate Arch.", "location": "Arches National Park"},
+                {"time": "12:00 PM", "description": "Picnic at Balboa Park.", "location": "Balboa Park"},
+            ],
+        },
+    ],
+    "logistics": ["Rent a car for day two."],
+    "hotel": "Hotel del Coronado, San Diego",
+}
+
+
+class BackendProfile:
+    """Latency and failure behavior of one fake backend."""
+
+    def __init__(self, latency=0.1, jitter=0.25, failure_rate=0.0):
+        """
+        Args:
+            latency (float): mean response time in seconds.
+            jitter (float): +/- fraction of latency added at random.
+            failure_rate (float): probability a call fails (0..1).
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+
+
+class FakeBackends:
+    """Shared state for all fakes: profiles, call counters and randomness."""
+
+    def __init__(self, profiles=None, latency_scale=1.0, failure_rate=0.0, seed=0):
+        self.profiles = {
+            name: BackendProfile(latency * latency_scale, failure_rate=failure_rate)
+            for name, latency in DEFAULT_LATENCY.items()
+        }
+        self.profiles.update(profiles or {})
+        self.calls = Counter()
+        self.failures = Counter()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def hit(self, backend):
+        """
+        Simulate one call: count it, sleep for its latency, and report whether
+        it should fail.
+        """
+        profile = self.profiles[backend]
+        with self.lock:
+            self.calls[backend] += 1
+            spread = self.random.uniform(-profile.jitter, profile.jitter)
+            failed = self.random.random() < profile.failure_rate
+            if failed:
+                self.failures[backend] += 1
+        time.sleep(max(0.0, profile.latency * (1 + spread)))
+        return failed
+
+    def reset_counts(self):
+        with self.lock:
+            self.calls.clear()
+            self.failures.clear()
+
+    @contextmanager
+    def install(self):
+        """Patch every external client with its fake for the duration of the block."""
+        backends = self
+        chat_model = make_fake_chat_model(backends)
+
+        with ExitStack() as stack:
+            patches = [
+                mock.patch("utils.llm.ChatGoogleGenerativeAI", chat_model),
+                mock.patch("requests.get", lambda url, **kw: backends.http("GET", url, **kw)),
+                mock.patch("requests.post", lambda url, **kw: backends.http("POST", url, **kw)),
+                # utils.http_client sends everything through pooled sessions
+                mock.patch("requests.Session.request",
+                           lambda session, method, url, **kw: backends.http(method, url, **kw)),
+                mock.patch("reddit_data.praw.Reddit", lambda **kw: FakeReddit(backends)),
+                mock.patch("reddit_data.RedditPostsLoader", lambda **kw: FakeLoader(backends, "reddit", kw)),
+                mock.patch("wikipedia_info.WikipediaLoader", lambda **kw: FakeLoader(backends, "wikipedia", kw)),
+                mock.patch("utils.geocoding.Nominatim", lambda **kw: FakeNominatim(backends)),
+                mock.patch("openrouteservice.Client", lambda **kw: FakeORSClient(backends)),
+            ]
+            for patch in patches:
+                stack.enter_context(patch)
+            yield self
+
+    # HTTP APIs
+
+    def http(self, method, url, params=None, headers=None, data=None, **kwargs):
+        host = urlparse(url).netloc
+        path = urlparse(url).path
+        backend = {
+            "developer.nps.gov": "nps",
+            "test.api.amadeus.com": "amadeus",
+            "priceline-com2.p.rapidapi.com": "priceline",
+            "maps.googleapis.com": "google_maps",
+        }.get(host)
+        if backend is None:
+            raise requests.ConnectionError(f"No fake backend for {host}")
+        if self.hit(backend):
+            return FakeResponse(503, {"error": "injected failure"})
+        return FakeResponse(200, getattr(self, f"_{backend}")(path, params or {}))
+
+    def _nps(self, path, params):
+        endpoint = path.rsplit("/", 1)[-1]
+        if endpoint == "parks":
+            return {"total": len(FAKE_PARKS), "data": FAKE_PARKS}
+        codes = (params.get("parkCode") or "").split(",")
+        return {"total": len(codes) * 3, "data": [
+            {"parkCode": code, "title": f"{endpoint.title()} {i} at {code}",
+             "activities": [{"name": "Hiking"}, {"name": "Wildlife Watching"}],
+             "topics": [{"name": "Geology"}],
+             "shortDescription": "A scenic hike with views of arches and canyons.",
+             "relatedParks": [{"parkCode": code}]}
+            for code in codes for i in range(3)
+        ]}
+
+    def _amadeus(self, path, params):
+        if path.endswith("/token"):
+            return {"access_token": "fake-token"}
+        return {"data": [
+            {"id": str(i), "price": {"total": f"{180 + 20 * i}.00"},
+             "itineraries": [{"segments": [{"carrierCode": "DL", "number": str(1000 + i),
+                                            "departure": {"at": "2025-05-25T08:00"},
+                                            "arrival": {"at": "2025-05-25T10:00"}}]}]}
+            for i in range(5)
+        ]}
+
+    def _priceline(self, path, params):
+        if path.endswith("auto-complete"):
+            return {"data": {"searchItems": [{"type": "CITY", "id": "3000035821"}]}}
+        return {"data": {"hotels": [
+            {"name": f"Hotel {i}", "price": 120 + 15 * i, "rating": 8.5 - i / 10} for i in range(5)
+        ]}}
+
+    def _google_maps(self, path, params):
+        if path.endswith("geocode/json"):
+            return {"status": "OK", "results": [{"formatted_address": f"{params.get('latlng')} Main St"}]}
+        stops = [params["origin"]] + [w for w in (params.get("waypoints") or "").split("|")
+                                      if w and not w.startswith("optimize")] + [params["destination"]]
+        legs = []
+        for start, end in zip(stops, stops[1:]):
+            a, b = fake_coordinates(start), fake_coordinates(end)
+            points = [(a[0] + (b[0] - a[0]) * t / 20, a[1] + (b[1] - a[1]) * t / 20) for t in range(21)]
+            steps = [{
+                "html_instructions": f"Head <b>north</b> for step {i}",
+                "end_location": {"lat": points[i + 1][0], "lng": points[i + 1][1]},
+                "distance": {"value": 250}, "duration": {"value": 60},
+                "polyline": {"points": encode_polyline(points[i:i + 2])},
+            } for i in range(20)]
+            legs.append({"steps": steps, "distance": {"value": 5000}, "duration": {"value": 1200}})
+        all_points = [fake_coordinates(stop) for stop in stops]
+        return {"status": "OK", "routes": [{"legs": legs, "overview_polyline": {"points": encode_polyline(all_points)}}]}
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = str(payload)
+        self.headers = {}
+        self.ok = status_code < 400
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+
+def fake_coordinates(query):
+    """Deterministic coordinates for a place name, near a known city if one is mentioned."""
+    key = query.lower()
+    base = next((coords for city, coords in CITIES.items() if city.split(",")[0] in key), (38.57, -109.55))
+    digest = hashlib.md5(key.encode("utf-8")).digest()
+    return (base[0] + (digest[0] - 128) / 2000, base[1] + (digest[1] - 128) / 2000)
+
+
+def encode_polyline(points):
+    """Google encoded polyline for a list of (lat, lng)."""
+    result = []
+    last_lat = last_lng = 0
+    for lat, lng in points:
+        lat_e5, lng_e5 = int(round(lat * 1e5)), int(round(lng * 1e5))
+        for delta in (lat_e5 - last_lat, lng_e5 - last_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        last_lat, last_lng = lat_e5, lng_e5
+    return "".join(result)
+
+
+def _make_fake_parks(count=470, seed=7):
+    rng = random.Random(seed)
+    parks = [{"fullName": "Arches National Park", "parkCode": "arch", "states": "UT",
+              "latLong": "lat:38.72261844, long:-109.5863666",
+              "activities": [{"name": "Hiking"}, {"name": "Stargazing"}],
+              "topics": [{"name": "Geology"}], "description": "Over 2,000 natural stone arches."}]
+    for i in range(count - 1):
+        lat, lng = rng.uniform(25, 49), rng.uniform(-124, -67)
+        parks.append({"fullName": f"Fake National Site {i}", "parkCode": f"f{i:03d}", "states": "US",
+                      "latLong": f"lat:{lat:.6f}, long:{lng:.6f}",
+                      "activities": [{"name": rng.choice(["Hiking", "Fishing", "Camping", "Guided Tours"])}],
+                      "topics": [{"name": rng.choice(["History", "Geology", "Wildlife"])}],
+                      "description": "A fake park used for offline benchmarks."})
+    return parks
+
+
+FAKE_PARKS = _make_fake_parks()
+
+
+class FakeNominatim:
+    def __init__(self, backends):
+        self.backends = backends
+
+    def geocode(self, query, timeout=None, **kwargs):
+        if self.backends.hit("nominatim"):
+            raise requests.ConnectionError("injected Nominatim failure")
+        lat, lng = fake_coordinates(query)
+        return FakeLocation(lat, lng, query)
+
+
+class FakeLocation:
+    def __init__(self, latitude, longitude, address):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.address = address
+        self.raw = {"lat": latitude, "lon": longitude, "display_name": address}
+
+
+class FakeORSClient:
+    def __init__(self, backends):
+        self.backends = backends
+
+    def directions(self, coordinates, profile=None, format=None, **kwargs):
+        if self.backends.hit("openrouteservice"):
+            raise requests.ConnectionError("injected ORS failure")
+        line = []
+        for (lng1, lat1), (lng2, lat2) in zip(coordinates, coordinates[1:]):
+            line.extend([lng1 + (lng2 - lng1) * t / 50, lat1 + (lat2 - lat1) * t / 50] for t in range(50))
+        line.append(coordinates[-1])
+        return {"features": [{"geometry": {"coordinates": line}}]}
+
+
+class FakeReddit:
+    def __init__(self, backends):
+        self.backends = backends
+        self.subreddits = self
+
+    def search(self, query, limit=10):
+        self.backends.hit("reddit")
+        name = re.sub(r"\W+", "", query.split(",")[0].title())
+        return [type("Subreddit", (), {"display_name": f"{name}{i or ''}"}) for i in range(min(limit, 3))]
+
+
+class FakeLoader:
+    """Stands in for RedditPostsLoader and WikipediaLoader."""
+
+    def __init__(self, backends, backend, kwargs):
+        self.backends = backends
+        self.backend = backend
+        self.count = kwargs.get("number_posts") or kwargs.get("load_max_docs") or 10
+
+    def load(self):
+        if self.backends.hit(self.backend):
+            raise requests.ConnectionError(f"injected {self.backend} failure")
+        text = ("Hiking at Arches National Park is amazing. The history museum is great. "
+                "Try the tacos in the Gaslamp Quarter. ") * 40
+        return [Document(page_content=text, metadata={"source": self.backend, "n": i}) for i in range(self.count)]
+
+
+def make_fake_chat_model(backends):
+    """A chat model class accepting the same arguments as ChatGoogleGenerativeAI."""
+
+    class FakeChatModel(BaseChatModel):
+        model: str = "fake-gemini"
+        google_api_key: object = None
+        temperature: float = 0.0
+
+        @property
+        def _llm_type(self):
+            return "fake-gemini"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            if backends.hit("gemini"):
+                raise RuntimeError("429 ResourceExhausted: injected quota failure. retry_delay { seconds: 0 }")
+            prompt = "\n".join(str(message.content) for message in messages)
+            text = fake_reply(prompt)
+            usage = {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4,
+                     "total_tokens": (len(prompt) + len(text)) // 4}
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+        def with_structured_output(self, schema, **kwargs):
+            def respond(prompt):
+                if backends.hit("gemini"):
+                    raise RuntimeError("429 ResourceExhausted: injected quota failure")
+                return schema.model_validate(CANNED_STRUCTURED) if hasattr(schema, "model_validate") else dict(CANNED_STRUCTURED)
+            return RunnableLambda(respond)
+
+    return FakeChatModel
+
+
+def fake_reply(prompt):
+    """Canned Gemini output; plays a two-step ReAct agent when given an agent prompt."""
+    if "Action Input" not in prompt:
+        return CANNED_PLACES if "list of places" in prompt else CANNED_ITINERARY
+    # The agent prompt's format instructions mention "Observation:" too, so
+    # look for our own first step in the scratchpad instead
+    if "(fake)" in prompt:
+        return "Thought: I now know the final answer\nFinal Answer: " + CANNED_PLACES
+
+    if "hotels" in prompt:
+        match = re.search(r"in (.+?) for the dates (\S+) to (\S+?)\.", prompt)
+        city, check_in, check_out = match.groups() if match else ("Moab, UT", "2025-05-25", "2025-05-31")
+        return ("Thought: (fake) search hotels\nAction: SearchFlights\n"
+                f"Action Input: {{'city_name': '{city}', 'check_in': '{check_in}', 'check_out': '{check_out}', 'rooms': 1, 'adults': 1}}")
+    dates = re.findall(r"\d{4}-\d{2}-\d{2}", prompt) or ["2025-05-25", "2025-05-31"]
+    return ("Thought: (fake) search flights\nAction: SearchFlights\n"
+            f"Action Input: {{'origin': 'SLC', 'destination': 'SAN', 'departure_date': '{dates[0]}', "
+            f"'return_date': '{dates[-1]}'}}")
+
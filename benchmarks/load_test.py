@@ -0,0 +1,282 @@
+"""
+Concurrent load test for the itinerary pipeline.
+
+Simulates many planners using the app at once against the fake backends in
+benchmarks/fakes.py. Each simulated user picks a destination and interests,
+runs the pipeline and saves the result the way PromptScreen does (load the
+data file, run, save). Reports throughput, latency percentiles, queueing
+delay, memory growth and lost storage updates, then applies a pass/fail gate.
+
+    python -m benchmarks.load_test --users 50 --workers 10 --arrival-rate 5
+    python -m benchmarks.load_test --users 20 --max-p95 10 --min-throughput 1
+
+Exits with status 1 when any gate fails.
+"""
+import os
+import tempfile
+
+# Configure the app for offline runs before any of its modules are imported
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+os.environ.setdefault("NAV_API_KEY", "offline-benchmark")
+os.environ.setdefault("GEMINI_RPM", "100000")
+os.environ.setdefault("LLM_CACHE", "0")
+os.environ.setdefault("TRACING", "0")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("NOMINATIM_RPS", "1000")
+# Keep the background interest index build from competing with the measured work
+os.environ.setdefault("INTEREST_INDEX", "0")
+# Keep the on-disk caches of benchmark runs away from the real ones
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="travel-planner-bench-"))
+
+import argparse
+import gc
+import json
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeBackends
+from benchmarks.run_benchmarks import percentile
+
+DESTINATIONS = [
+    ("San Diego, California", "Salt Lake City, Utah"),
+    ("Moab, UT", "Denver, CO"),
+    ("Washington DC", "Boston, MA"),
+    ("Seattle, WA", "Salt Lake City, Utah"),
+    ("Boston, MA", "New York"),
+    ("Denver, CO", "Denver, CO"),
+]
+INTERESTS = ["Hiking", "History", "Food", "Museums", "Beaches", "Nightlife", "Camping", "Photography"]
+
+
+class UserResult:
+    def __init__(self, user, destination, arrived, started):
+        self.user = user
+        self.destination = destination
+        self.arrived = arrived
+        self.started = started
+        self.finished = None
+        self.error = None
+
+    @property
+    def queue_delay(self):
+        return self.started - self.arrived
+
+    @property
+    def latency(self):
+        return self.finished - self.started
+
+
+def make_request(user, rng):
+    destination, origin = rng.choice(DESTINATIONS)
+    interests = ", ".join(rng.sample(INTERESTS, rng.randint(1, 3)))
+    return {
+        "destination": destination,
+        "prompt": interests,
+        "origin": origin,
+        "date_start": "2025-05-25",
+        "date_end": "2025-05-28",
+        "interests": interests,
+        "limit": 3,
+    }
+
+
+def simulate_user(user, request, arrived, mode):
+    """
+    One planner session, mirroring PromptScreen._fetch_itinerary: read the
+    data file, run the pipeline, write the plan back under this user's key.
+    """
+    import itinerary_generator as ig
+    from utils.storage import load_data, save_data
+
+    result = UserResult(user, request["destination"], arrived, time.perf_counter())
+    try:
+        data = load_data()
+        output = ig.run_itinerary_pipeline(dict(request), mode=mode)
+        data.setdefault("plans", {})[f"user-{user}"] = {
+            "destination": request["destination"],
+            "prompt": request["prompt"],
+            "steps": output["sales_pitch"].split("\n"),
+            "daily_waypoints": output.get("daily_waypoints") or "",
+        }
+        save_data(data)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.finished = time.perf_counter()
+    return result
+
+
+class MemorySampler(threading.Thread):
+    """Samples traced memory while the load runs, to tell growth from a one-off peak."""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.samples.append(tracemalloc.get_traced_memory()[0])
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_load(users, workers, arrival_rate, mode, backends, seed=0):
+    """
+    Submit `users` sessions to a pool of `workers` threads, arriving at
+    `arrival_rate` per second (0 = all at once).
+    Returns:
+        dict: the load test report.
+    """
+    from utils import http_client, storage
+
+    rng = random.Random(seed)
+    requests = [make_request(user, rng) for user in range(users)]
+    storage.DATA_FILE = os.path.join(tempfile.mkdtemp(), "travel_data.json")
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    sampler = MemorySampler()
+    sampler.start()
+
+    started = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for user, request in enumerate(requests):
+            if arrival_rate > 0:
+                # Poisson arrivals
+                time.sleep(rng.expovariate(arrival_rate))
+            futures.append(pool.submit(simulate_user, user, request, time.perf_counter(), mode))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    sampler.stop()
+    peak = tracemalloc.get_traced_memory()[1]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    # Every user saved under its own key; missing keys were overwritten by a
+    # concurrent load/save of the shared data file
+    saved = storage.load_data().get("plans", {})
+    succeeded = [r for r in results if r.error is None]
+    lost = [r.user for r in succeeded if f"user-{r.user}" not in saved]
+
+    latencies = [r.latency for r in succeeded] or [0.0]
+    queue_delays = [r.queue_delay for r in results]
+    return {
+        "users": users,
+        "workers": workers,
+        "arrival_rate": arrival_rate,
+        "mode": mode,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(succeeded) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(1 - len(succeeded) / users, 3),
+        "errors": dict(Counter(r.error.split(":")[0] for r in results if r.error)),
+        "latency_s": {
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(max(latencies), 3),
+        },
+        "queue_delay_s": {
+            "p50": round(percentile(queue_delays, 0.50), 3),
+            "p95": round(percentile(queue_delays, 0.95), 3),
+            "max": round(max(queue_delays), 3),
+        },
+        "memory_mb": {
+            "peak": round((peak - baseline) / 2 ** 20, 2),
+            "retained": round(retained / 2 ** 20, 2),
+            "samples": [round((s - baseline) / 2 ** 20, 2) for s in sampler.samples[:: max(1, len(sampler.samples) // 20)]],
+        },
+        "lost_updates": len(lost),
+        "backend_calls": dict(sorted(backends.calls.items())),
+        "backend_failures": dict(sorted(backends.failures.items())),
+        "http_hosts": http_client.http.stats(),
+    }
+
+
+def check_gates(report, args):
+    """
+    Compare the report against the thresholds given on the command line.
+    Returns:
+        list[str]: one message per failed gate; empty when everything passed.
+    """
+    failures = []
+    if args.max_p95 is not None and report["latency_s"]["p95"] > args.max_p95:
+        failures.append(f"p95 latency {report['latency_s']['p95']}s > {args.max_p95}s")
+    if args.max_queue_p95 is not None and report["queue_delay_s"]["p95"] > args.max_queue_p95:
+        failures.append(f"p95 queueing delay {report['queue_delay_s']['p95']}s > {args.max_queue_p95}s")
+    if args.min_throughput is not None and report["throughput_per_s"] < args.min_throughput:
+        failures.append(f"throughput {report['throughput_per_s']}/s < {args.min_throughput}/s")
+    if report["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {report['error_rate']} > {args.max_error_rate}")
+    if args.max_memory_mb is not None and report["memory_mb"]["retained"] > args.max_memory_mb:
+        failures.append(f"retained memory {report['memory_mb']['retained']} MB > {args.max_memory_mb} MB")
+    if not args.allow_lost_updates and report["lost_updates"]:
+        failures.append(f"{report['lost_updates']} saved plans were overwritten by concurrent saves")
+    return failures
+
+
+def format_report(report):
+    latency = report["latency_s"]
+    queue = report["queue_delay_s"]
+    memory = report["memory_mb"]
+    return "\n".join([
+        f"{report['users']} users, {report['workers']} workers, "
+        f"arrival rate {report['arrival_rate'] or 'burst'}, mode {report['mode']}",
+        f"elapsed {report['elapsed_s']}s, throughput {report['throughput_per_s']}/s, "
+        f"error rate {report['error_rate']} {report['errors'] or ''}",
+        f"latency  p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s  max {latency['max']}s",
+        f"queueing p50 {queue['p50']}s  p95 {queue['p95']}s  max {queue['max']}s",
+        f"memory   peak +{memory['peak']} MB  retained +{memory['retained']} MB",
+        f"lost storage updates: {report['lost_updates']}",
+        "backend calls: " + ", ".join(f"{k}={v}" for k, v in report["backend_calls"].items()),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test with fake backends.")
+    parser.add_argument("--users", type=int, default=20, help="planner sessions to simulate")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent sessions (default: all users)")
+    parser.add_argument("--arrival-rate", type=float, default=0.0, help="users arriving per second (0 = burst)")
+    parser.add_argument("--mode", choices=["quality", "fast"], default="quality")
+    parser.add_argument("--latency-scale", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    gates = parser.add_argument_group("pass/fail gates")
+    gates.add_argument("--max-p95", type=float, help="seconds")
+    gates.add_argument("--max-queue-p95", type=float, help="seconds")
+    gates.add_argument("--min-throughput", type=float, help="sessions per second")
+    gates.add_argument("--max-error-rate", type=float, default=0.0)
+    gates.add_argument("--max-memory-mb", type=float, help="memory retained after the run")
+    gates.add_argument("--allow-lost-updates", action="store_true")
+    args = parser.parse_args(argv)
+
+    backends = FakeBackends(latency_scale=args.latency_scale, failure_rate=args.failure_rate, seed=args.seed)
+    with backends.install():
+        report = run_load(args.users, args.workers or args.users, args.arrival_rate, args.mode, backends, args.seed)
+
+    failures = check_gates(report, args)
+    report["passed"] = not failures
+    report["gate_failures"] = failures
+
+    print(format_report(report))
+    print("PASS" if not failures else "FAIL\n  " + "\n  ".join(failures))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Offline benchmarks for the travel planner.
+
+Runs each stage against the fakes in benchmarks/fakes.py and reports p50/p95
+latency, backend call counts and memory allocations per stage.
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --stages directions storage --iterations 20
+    python -m benchmarks.run_benchmarks --latency-scale 0.1 --latency gemini=0.5 --failure-rate 0.05
+"""
+import os
+import tempfile
+
+# Configure the app for offline runs before any of its modules are imported
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+os.environ.setdefault("NAV_API_KEY", "offline-benchmark")
+os.environ.setdefault("GEMINI_RPM", "100000")
+os.environ.setdefault("LLM_CACHE", "0")
+os.environ.setdefault("TRACING", "0")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("NOMINATIM_RPS", "1000")
+# Keep the background interest index build from competing with the measured work
+os.environ.setdefault("INTEREST_INDEX", "0")
+# Keep the on-disk caches of benchmark runs away from the real ones
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="travel-planner-bench-"))
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.fakes import BackendProfile, FakeBackends
+
+REQUEST = {
+    "destination": "San Diego, California",
+    "prompt": "Hiking, History, Food",
+    "origin": "Salt Lake City, Utah",
+    "date_start": "2025-05-25",
+    "date_end": "2025-05-28",
+    "interests": "Hiking, History, Food",
+    "limit": 3,
+}
+WAYPOINTS = ["Balboa Park, San Diego", "USS Midway Museum, San Diego", "Old Town, San Diego", "La Jolla Cove, San Diego"]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+# Stages: each returns a zero-argument callable that runs one iteration
+
+def stage_itinerary(mode):
+    def setup():
+        import itinerary_generator as ig
+        from utils.retrieval import destination_indexes
+
+        def run():
+            # Measure cold runs: don't let the previous iteration's documents be reused
+            destination_indexes.entries.clear()
+            return ig.run_itinerary_pipeline(dict(REQUEST), mode=mode)
+        return run
+    return setup
+
+
+def clear_route_caches():
+    """Forget cached routes and geocodes, so a route stage measures a cold run."""
+    import google_directions as gd
+    from utils.geocoding import get_geocoder
+    from utils.route_cache import get_route_cache
+
+    get_route_cache().store.clear()
+    get_geocoder().store.clear()
+    gd.get_geocode_cache().clear()
+
+
+def stage_parks():
+    import nps_api_search as nps
+    return lambda: nps.get_parks_near_city("Moab, UT", max_distance_km=100)
+
+
+def stage_directions(warm):
+    def setup():
+        import google_directions as gd
+
+        def run():
+            if not warm:
+                clear_route_caches()
+            return gd._fetch_directions("offline-benchmark", WAYPOINTS[0], WAYPOINTS[1:-1], WAYPOINTS[-1])
+        return run
+    return setup
+
+
+def stage_route_geometry(warm):
+    def setup():
+        import google_directions as gd
+
+        def run():
+            if not warm:
+                clear_route_caches()
+            return gd.get_route_geometry("offline-benchmark", WAYPOINTS[0], WAYPOINTS[1:-1], WAYPOINTS[-1])
+        return run
+    return setup
+
+
+def stage_route_polyline(warm):
+    def setup():
+        from screens.map_screen import Map
+        # Skip the widget constructor; get_route_polyline only needs the location cache
+        screen = object.__new__(Map)
+        screen.location_cache = {}
+
+        def run():
+            if not warm:
+                clear_route_caches()
+                screen.location_cache.clear()
+            return screen.get_route_polyline(WAYPOINTS)
+        return run
+    return setup
+
+
+def stage_storage():
+    from utils import storage
+    storage.DATA_FILE = os.path.join(tempfile.mkdtemp(), "travel_data.json")
+    steps = ["* **9:00 AM** Visit a place with a reasonably long description."] * 60
+    data = {"destinations": [f"City {i}" for i in range(50)],
+            "plans": {f"City {i}": {"destination": f"City {i}", "steps": steps, "daily_waypoints": {}}
+                      for i in range(50)}}
+
+    def run():
+        storage.save_data(data)
+        loaded = storage.load_data()
+        loaded["plans"]["City 0"]["prompt"] = "updated"
+        storage.save_data(loaded)
+    return run
+
+
+STAGES = {
+    "itinerary_quality": stage_itinerary("quality"),
+    "itinerary_fast": stage_itinerary("fast"),
+    "parks_near_city": stage_parks,
+    # Cold stages start every iteration with empty route and geocode caches;
+    # warm ones are answered from the caches the warmup run filled
+    "directions": stage_directions(warm=False),
+    "directions_warm": stage_directions(warm=True),
+    "route_geometry": stage_route_geometry(warm=False),
+    "route_geometry_warm": stage_route_geometry(warm=True),
+    "route_polyline": stage_route_polyline(warm=False),
+    "route_polyline_warm": stage_route_polyline(warm=True),
+    "storage": stage_storage,
+}
+
+def run_stage(name, backends, iterations, warmup=1):
+    """
+    Run one stage `iterations` times and collect its statistics.
+    Returns:
+        dict: latency percentiles, errors, backend calls and allocations per iteration.
+    """
+    run = STAGES[name]()
+    for _ in range(warmup):
+        try:
+            run()
+        except Exception:
+            pass
+
+    backends.reset_counts()
+    latencies = []
+    errors = Counter()
+    allocated = []
+    peaks = []
+    for _ in range(iterations):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            run()
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        allocated.append(current)
+        peaks.append(peak)
+
+    return {
+        "stage": name,
+        "iterations": iterations,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+        "errors": dict(errors),
+        "calls_per_iteration": {k: round(v / iterations, 2) for k, v in sorted(backends.calls.items())},
+        "retained_kb": round(percentile(allocated, 0.5) / 1024, 1),
+        "peak_kb": round(percentile(peaks, 0.5) / 1024, 1),
+    }
+
+
+def format_report(results):
+    lines = [f"{'stage':<20} {'p50 ms':>9} {'p95 ms':>9} {'peak KB':>9} {'kept KB':>9}  calls/iter  errors"]
+    for r in results:
+        calls = ", ".join(f"{k}={v}" for k, v in r["calls_per_iteration"].items()) or "-"
+        errors = ", ".join(f"{k}={v}" for k, v in r["errors"].items()) or "-"
+        lines.append(f"{r['stage']:<20} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['peak_kb']:>9} {r['retained_kb']:>9}  {calls}  {errors}")
+    return "\n".join(lines)
+
+
+def parse_latency_overrides(pairs):
+    overrides = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        overrides[name] = float(value)
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency benchmarks with fake backends.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--latency-scale", type=float, default=0.05,
+                        help="multiplier on the default backend latencies (1.0 = realistic)")
+    parser.add_argument("--latency", nargs="*", metavar="BACKEND=SECONDS",
+                        help="fixed latency for specific backends, e.g. gemini=0.5")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    backends = FakeBackends(latency_scale=args.latency_scale, failure_rate=args.failure_rate, seed=args.seed)
+    for name, latency in parse_latency_overrides(args.latency).items():
+        backends.profiles[name] = BackendProfile(latency, failure_rate=args.failure_rate)
+
+    results = []
+    with backends.install():
+        for stage in args.stages:
+            results.append(run_stage(stage, backends, args.iterations))
+
+    print(format_report(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
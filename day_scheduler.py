@@ -0,0 +1,259 @@
+"""
+Split a trip's attractions into compact days.
+
+Groups geocoded attractions into one cluster per trip day with a
+capacity-constrained k-means, so each day stays in one part of town. An
+attraction's opening days (the "hours" field of models/plan_model.py) keep it
+off days it is closed. Each day is then ordered with route_optimizer.
+"""
+import math
+import random
+import re
+from datetime import date, datetime, timedelta
+from itertools import permutations
+
+from route_optimizer import haversine_km, optimize_day
+from waypoint_extractor import normalize_place
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+_WEEKDAY = r"\b(mon(?:day)?|tue(?:s|sday)?|wed(?:nesday)?|thu(?:rs?|rsday)?|fri(?:day)?|sat(?:urday)?|sun(?:day)?)s?\b\.?"
+_RANGE = re.compile(_WEEKDAY + r"\s*(?:-|–|—|to|through|thru)\s*" + _WEEKDAY)
+_CLOSED = re.compile(r"closed\s+(?:on\s+)?((?:" + _WEEKDAY + r"(?:\s*(?:,|&|and|/)\s*)?)+)")
+
+
+def to_date(value):
+    """Accept a date, a datetime or an ISO string; None when missing or unparsable."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def trip_dates(date_start, date_end, days=None):
+    """
+    The dates of the trip, one per day. Without dates, `days` placeholders
+    (None) are returned so scheduling still works.
+    """
+    start, end = to_date(date_start), to_date(date_end)
+    if start and end and end >= start:
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return [None] * (days or 1)
+
+
+def open_weekdays(hours):
+    """
+    Weekdays (0 = Monday) an attraction is open, read from free-text hours such
+    as "Tue-Sun 10am-5pm" or "Open daily, closed Mondays". Unknown or
+    unparsable hours count as open every day.
+    """
+    everyday = set(range(7))
+    if not hours:
+        return everyday
+    text = str(hours).lower()
+
+    open_days = set()
+    for first, last in _RANGE.findall(text):
+        a, b = WEEKDAYS.index(first[:3]), WEEKDAYS.index(last[:3])
+        open_days.update((a + i) % 7 for i in range((b - a) % 7 + 1))
+
+    closed = set()
+    for match in _CLOSED.finditer(text):
+        closed.update(WEEKDAYS.index(day[:3]) for day in re.findall(_WEEKDAY, match.group(1)))
+
+    if not open_days:
+        # Single days listed without a range, e.g. "Sat, Sun 9am-3pm"
+        listed = {WEEKDAYS.index(day[:3]) for day in re.findall(_WEEKDAY, _CLOSED.sub("", text))}
+        open_days = listed if listed and "daily" not in text else everyday
+    return (open_days - closed) or everyday
+
+
+def _centroid(points):
+    return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+
+def _initial_centers(points, k, rng):
+    """k-means++ seeding."""
+    centers = [points[rng.randrange(len(points))]]
+    while len(centers) < k:
+        weights = [min(haversine_km(p, c) for c in centers) ** 2 for p in points]
+        total = sum(weights)
+        if total == 0:
+            centers.append(points[rng.randrange(len(points))])
+            continue
+        threshold = rng.random() * total
+        for point, weight in zip(points, weights):
+            threshold -= weight
+            if threshold <= 0:
+                centers.append(point)
+                break
+        else:
+            centers.append(points[-1])
+    return centers
+
+
+def _assign(points, centers, capacity):
+    """Assign points to centers, nearest pairs first, without exceeding a day's capacity."""
+    pairs = sorted(
+        (haversine_km(p, c), i, d) for i, p in enumerate(points) for d, c in enumerate(centers)
+    )
+    assignment = [None] * len(points)
+    load = [0] * len(centers)
+    for _, i, d in pairs:
+        if assignment[i] is None and load[d] < capacity:
+            assignment[i] = d
+            load[d] += 1
+    return assignment
+
+
+def _match_days(assignment, day_count, allowed):
+    """
+    Give each cluster the date that the fewest of its members are closed on.
+    Returns:
+        list[int]: the day of each cluster.
+    """
+    closed = [[0] * day_count for _ in range(day_count)]
+    for i, cluster in enumerate(assignment):
+        for d in range(day_count):
+            closed[cluster][d] += d not in allowed[i]
+
+    if day_count <= 8:
+        return list(min(permutations(range(day_count)),
+                        key=lambda days: sum(closed[c][d] for c, d in enumerate(days))))
+    days = [None] * day_count
+    free = set(range(day_count))
+    for c in sorted(range(day_count), key=lambda c: -sum(closed[c])):
+        days[c] = min(free, key=lambda d: closed[c][d])
+        free.remove(days[c])
+    return days
+
+
+def _repair(points, assignment, day_count, allowed, capacity):
+    """
+    Move points off days they are closed on: to the nearest allowed day with
+    room, or by swapping with a point there that may go on this day.
+    """
+    for i, day in enumerate(assignment):
+        if day in allowed[i]:
+            continue
+        members = lambda d: [j for j, a in enumerate(assignment) if a == d]
+        centroid = lambda d: _centroid([points[j] for j in members(d)] or [points[i]])
+        for target in sorted(allowed[i], key=lambda d: haversine_km(points[i], centroid(d))):
+            if len(members(target)) < capacity:
+                assignment[i] = target
+                break
+            swaps = [j for j in members(target) if day in allowed[j]]
+            if swaps:
+                j = min(swaps, key=lambda j: haversine_km(points[j], centroid(day)))
+                assignment[i], assignment[j] = target, day
+                break
+    return assignment
+
+
+def cluster_days(points, day_count, allowed=None, capacity=None, iterations=25, seed=0):
+    """
+    Capacity-constrained k-means over (lat, lng) points, with clusters then
+    matched to the days their attractions are open.
+    Args:
+        points (list[tuple]): attraction coordinates.
+        day_count (int): number of days (clusters).
+        allowed (list[set[int]]): day indices each point may go on.
+        capacity (int): maximum points per day. Defaults to an even split.
+    Returns:
+        list[int]: the day index of each point.
+    """
+    if not points:
+        return []
+    k = max(1, min(day_count, len(points)))
+    capacity = capacity or math.ceil(len(points) / k)
+    allowed = allowed or [set(range(day_count))] * len(points)
+    rng = random.Random(seed)
+
+    centers = _initial_centers(points, k, rng)
+    # Days beyond the number of points start empty
+    centers += [centers[i % k] for i in range(day_count - k)]
+    assignment = None
+    for _ in range(iterations):
+        new_assignment = _assign(points, centers, capacity)
+        if new_assignment == assignment:
+            break
+        assignment = new_assignment
+        for d in range(day_count):
+            members = [points[i] for i, a in enumerate(assignment) if a == d]
+            if members:
+                centers[d] = _centroid(members)
+
+    days = _match_days(assignment, day_count, allowed)
+    assignment = [days[cluster] for cluster in assignment]
+    return _repair(points, assignment, day_count, allowed, capacity)
+
+
+def schedule_days(attractions, locate, date_start=None, date_end=None, days=None, hotel=None, seed=0):
+    """
+    Build daily waypoints from a trip's attractions.
+
+    Args:
+        attractions (list): place names, or plan records with the fields of
+            models/plan_model.py ("attraction", "address", "hours").
+        locate (callable): name or address → (lat, lng), or None when unknown.
+        date_start, date_end: trip dates (date or ISO string). The trip has one
+            day per date; without dates, `days` days.
+        hotel (tuple): (lat, lng) each day starts and ends at, if known.
+    Returns:
+        dict[str, list[str]]: "Day N" → attraction names in visiting order.
+    """
+    dates = trip_dates(date_start, date_end, days)
+    names, points, allowed, unlocated = [], [], [], []
+    for attraction in attractions:
+        if isinstance(attraction, dict):
+            name = attraction.get("attraction") or attraction.get("address")
+            queries = dict.fromkeys(q for q in (attraction.get("address"), name) if q)
+            coords = next((c for c in map(locate, queries) if c is not None), None)
+            hours = attraction.get("hours")
+        else:
+            name, coords, hours = attraction, locate(attraction), None
+        if not name or name in names or name in unlocated:
+            continue
+        if coords is None:
+            unlocated.append(name)
+            continue
+        weekdays = open_weekdays(hours)
+        names.append(name)
+        points.append(tuple(coords))
+        allowed.append({d for d, day in enumerate(dates) if day is None or day.weekday() in weekdays})
+
+    assignment = cluster_days(points, len(dates), allowed, seed=seed)
+    days_out = [[] for _ in dates]
+    for i, d in enumerate(assignment):
+        days_out[d].append(i)
+
+    schedule = {}
+    for d, members in enumerate(days_out):
+        places = [names[i] for i in members]
+        if len(places) > 1:
+            places, _, _ = optimize_day(places, [points[i] for i in members], start=hotel, end=hotel)
+        schedule[f"Day {d + 1}"] = places
+
+    # Places that could not be geocoded go to the lightest days
+    for name in unlocated:
+        lightest = min(schedule, key=lambda day: len(schedule[day]))
+        schedule[lightest].append(name)
+    return {day: places for day, places in schedule.items() if places}
+
+
+def rebalance_schedule(daily_waypoints, locate, date_start=None, date_end=None, hours=None, hotel=None):
+    """
+    Re-split an existing "Day N" → places schedule (e.g. the LLM's) into
+    compact days. Keeps the original number of days when the trip has no
+    dates. `hours` maps place names to opening hours text, if known; names
+    are compared loosely ("the Maritime Museum" = "Maritime Museum").
+    """
+    places = []
+    for day_places in daily_waypoints.values():
+        places.extend(place for place in day_places if place not in places)
+    by_name = {normalize_place(name): text for name, text in (hours or {}).items()}
+    attractions = [{"attraction": place, "hours": by_name.get(normalize_place(place))} for place in places]
+    return schedule_days(attractions, locate, date_start, date_end, days=len(daily_waypoints), hotel=hotel)
@@ -4,7 +4,8 @@ import pandas as pd
 from dotenv import load_dotenv
 from langchain.tools import StructuredTool
 from langchain.tools import Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.llm import create_llm
+from utils import http_client, tracing
 from langchain.agents import initialize_agent
 
 # Set the model name for our LLMs.
@@ -41,7 +42,11 @@ def get_bearer_token():
         "client_secret": AMADEUS_CLIENT_SECRET
     }
     
-    response = requests.post(auth_url, headers=headers, data=data)
+    try:
+        response = http_client.post(auth_url, headers=headers, data=data)
+    except requests.RequestException as e:
+        print(f"Error: {e}")
+        return None
     
     if response.status_code == 200:
         return response.json().get("access_token")
@@ -74,7 +79,11 @@ def get_flight_offers(origin, destination, departure_date, return_date):
         "Authorization": f"Bearer {token}"
     }
     
-    response = requests.get(url, headers=headers)
+    try:
+        response = http_client.get(url, headers=headers)
+    except requests.RequestException as e:
+        print(f"Error: {e}")
+        return None
     
     if response.status_code == 200:
         return response.json()
@@ -111,12 +120,12 @@ def find_flights(origin, destination, departure_date, return_date):
     )
 
     # Initialize the LangChain agent with the tools
-    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, api_key=GEMINI_API_KEY)
+    llm = create_llm(model=GEMINI_MODEL)
 
     agent = initialize_agent([search_flights_tool], llm, agent_type="zero-shot-react-description", verbose=True)
 
     # Use the agent to search for parks and activities matching interests
-    result = agent.run(f"You are a travel agent searching for the cheapest roundtrip flight from {origin} to {destination} for the dates {departure_date} and {return_date}. Using the airport codes from the airport_codes.csv file, get the three digit IATA code to input into the get_flight_offers function. Use the Amadeus API through the get_flight_offers function to find the 5 best flight offers. If there are multiple airports in the same city, make calls for each aiport to get the 5 best options. Of the 5 best flights give your recommendation and why. Return the results as if you were customer service. Make sure to include the flight number, departure and arrival times, and the price for each of the five options before your recommendation. If an error is thrown or no flights are available, just renturn 'No direct flight information were found' instead of an error message.")
+    result = agent.run(f"You are a travel agent searching for the cheapest roundtrip flight from {origin} to {destination} for the dates {departure_date} and {return_date}. Using the airport codes from the airport_codes.csv file, get the three digit IATA code to input into the get_flight_offers function. Use the Amadeus API through the get_flight_offers function to find the 5 best flight offers. If there are multiple airports in the same city, make calls for each aiport to get the 5 best options. Of the 5 best flights give your recommendation and why. Return the results as if you were customer service. Make sure to include the flight number, departure and arrival times, and the price for each of the five options before your recommendation. If an error is thrown or no flights are available, just renturn 'No direct flight information were found' instead of an error message.", callbacks=[tracing.tracing_callback])
     return result
 
 
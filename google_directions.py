@@ -1,5 +1,39 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
+from utils import http_client, tracing
+from utils.disk_cache import DiskCache
+from utils.geometry import RouteGeometry
+from utils.route_cache import get_route_cache
+
+# Reverse geocoding requests in flight at once while resolving route steps
+GEOCODE_WORKERS = int(os.getenv("GEOCODE_WORKERS", "8"))
+# Decimal places kept when caching coordinates: 4 is about 11 m
+GEOCODE_PRECISION = 4
+GEOCODE_CACHE_TTL = 30 * 24 * 3600
+
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache():
+    """The persistent reverse geocoding cache, opened on first use."""
+    global _geocode_cache
+    with _geocode_cache_lock:
+        if _geocode_cache is None:
+            _geocode_cache = DiskCache("reverse_geocode.sqlite", max_entries=50000, ttl=GEOCODE_CACHE_TTL)
+    return _geocode_cache
+
+
+def quantize(lat, lng, precision=GEOCODE_PRECISION):
+    """Round a coordinate so nearby points share a cache entry."""
+    return round(lat, precision), round(lng, precision)
+
+
 def get_directions(api_key, origin, destination):
     """
     Connects to the Google Maps Directions API and retrieves step-by-step directions
@@ -12,7 +46,8 @@ def get_directions(api_key, origin, destination):
     """
     return _fetch_directions(api_key, origin, [], destination)
 
-def get_directions_via_waypoints(api_key, origin, waypoints, destination, optimize=False):
+def get_directions_via_waypoints(api_key, origin, waypoints, destination, optimize=False, geocode_steps=True,
+                                 with_geometry=False):
     """
     Retrieves step-by-step directions from origin, through each waypoint in order,
     to the final destination.
@@ -22,14 +57,59 @@ def get_directions_via_waypoints(api_key, origin, waypoints, destination, optimi
     :param waypoints: List of intermediate locations as strings.
     :param destination: Final destination as a string.
     :param optimize: If True, lets Google reorder waypoints for the shortest route.
-    :return: List of tuples with (instruction, approx_address) for the full route.
+    :param geocode_steps: If False, use each step's instruction text instead of an address.
+    :param with_geometry: If True, also return the route's RouteGeometry.
+    :return: List of tuples with (instruction, approx_address) for the full route,
+             or (steps, geometry) with with_geometry=True.
     """
-    return _fetch_directions(api_key, origin, waypoints, destination, optimize=optimize)
+    return _fetch_directions(api_key, origin, waypoints, destination, optimize=optimize,
+                             geocode_steps=geocode_steps, with_geometry=with_geometry)
+
+def get_route_geometry(api_key, origin, waypoints, destination, optimize=False):
+    """
+    Retrieves only the geometry of the route through the waypoints: decoded
+    points per leg with leg distances and durations. Makes a single API call.
+
+    :return: RouteGeometry for the route.
+    """
+    return RouteGeometry.from_route(_request_route(api_key, origin, waypoints, destination, optimize))
+
+def _fetch_directions(api_key, origin, waypoints, destination, optimize=False, geocode_steps=True,
+                      with_geometry=False):
+    """
+    Internal helper that turns the route into (instruction, address) steps.
+    Step addresses are reverse geocoded concurrently through a cache; with
+    geocode_steps=False the step's instruction text is used instead.
+    """
+    route = _request_route(api_key, origin, waypoints, destination, optimize)
+
+    # steps of every leg (origin→wp1, wp1→wp2, …, lastWp→destination)
+    steps = [step for leg in route["legs"] for step in leg["steps"]]
+    instructions = [step.get("html_instructions", "") for step in steps]
+
+    if not geocode_steps:
+        steps_info = [(instruction, strip_html(instruction)) for instruction in instructions]
+    else:
+        coords = [(step["end_location"]["lat"], step["end_location"]["lng"]) for step in steps]
+        steps_info = list(zip(instructions, reverse_geocode_many(api_key, coords)))
 
-def _fetch_directions(api_key, origin, waypoints, destination, optimize=False):
+    if with_geometry:
+        return steps_info, RouteGeometry.from_route(route)
+    return steps_info
+
+def _request_route(api_key, origin, waypoints, destination, optimize=False):
     """
     Internal helper that builds the Directions API call with optional waypoints.
+    Routes are cached on disk by their stop sequence, so the same route is
+    only requested once.
+    :return: The first route of the response.
     """
+    stops = [origin, *(waypoints or []), destination]
+    cache = get_route_cache()
+    route = cache.get_route("google", "driving", stops, optimize=optimize)
+    if route is not None:
+        return route
+
     base_url = "https://maps.googleapis.com/maps/api/directions/json"
     params = {
         "origin": origin,
@@ -44,7 +124,7 @@ def _fetch_directions(api_key, origin, waypoints, destination, optimize=False):
             wp_string = "optimize:true|" + wp_string
         params["waypoints"] = wp_string
 
-    response = requests.get(base_url, params=params)
+    response = http_client.get(base_url, params=params)
     if response.status_code != 200:
         raise Exception(f"Google Maps API error: {response.status_code} - {response.text}")
 
@@ -52,17 +132,75 @@ def _fetch_directions(api_key, origin, waypoints, destination, optimize=False):
     if data.get("status") != "OK":
         raise Exception(f"Google Maps API returned status: {data.get('status')}")
 
-    steps_info = []
-    # iterate through each leg (origin→wp1, wp1→wp2, …, lastWp→destination)
-    for leg in data["routes"][0]["legs"]:
-        for step in leg["steps"]:
-            instruction = step.get("html_instructions", "")
-            lat = step["end_location"]["lat"]
-            lng = step["end_location"]["lng"]
-            address = reverse_geocode(api_key, lat, lng)
-            steps_info.append((instruction, address))
+    route = compact_route(data["routes"][0])
+    cache.set_route("google", "driving", stops, route, optimize=optimize)
+    return route
 
-    return steps_info
+def compact_route(route):
+    """
+    Keep only the route fields this module reads; geometry stays as the
+    encoded polylines, which are already compact.
+    """
+    return {
+        "legs": [
+            {
+                "distance": leg.get("distance"),
+                "duration": leg.get("duration"),
+                "steps": [
+                    {
+                        "html_instructions": step.get("html_instructions", ""),
+                        "end_location": step["end_location"],
+                        "polyline": step.get("polyline"),
+                    }
+                    for step in leg.get("steps", [])
+                ],
+            }
+            for leg in route.get("legs", [])
+        ],
+        "overview_polyline": route.get("overview_polyline"),
+        "waypoint_order": route.get("waypoint_order", []),
+    }
+
+def strip_html(instruction):
+    """Plain text of an html_instructions string."""
+    return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", instruction)).strip()
+
+def reverse_geocode_many(api_key, coords, max_workers=GEOCODE_WORKERS):
+    """
+    Reverse geocodes a batch of coordinates.
+
+    Coordinates are quantized to about 10 m, deduplicated and looked up in the
+    persistent cache; the misses are fetched concurrently, at most
+    `max_workers` at a time.
+
+    :param api_key: Your Google Maps API key.
+    :param coords: List of (lat, lng) tuples.
+    :return: List of address strings, one per coordinate.
+    """
+    cache = get_geocode_cache()
+    keys = [quantize(lat, lng) for lat, lng in coords]
+    addresses = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        cached = cache.get(f"{key[0]},{key[1]}")
+        if cached is not None:
+            addresses[key] = cached
+        else:
+            missing.append(key)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as executor:
+            futures = [
+                executor.submit(tracing.propagate(_fetch_address), api_key, *key) for key in missing
+            ]
+            for key, future in zip(missing, futures):
+                address, found = future.result()
+                addresses[key] = address
+                # Don't remember failures; they may succeed next time
+                if found:
+                    cache.set(f"{key[0]},{key[1]}", address)
+
+    return [addresses[key] for key in keys]
 
 def reverse_geocode(api_key, lat, lng):
     """
@@ -73,18 +211,28 @@ def reverse_geocode(api_key, lat, lng):
     :param lng: Longitude of the location.
     :return: A formatted address string.
     """
+    return reverse_geocode_many(api_key, [(lat, lng)])[0]
+
+def _fetch_address(api_key, lat, lng):
+    """
+    Calls the Geocoding API for one coordinate.
+    :return: (address, found) where found is False for the "Unknown location" fallback.
+    """
     geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
     params = {
         "latlng": f"{lat},{lng}",
         "key": api_key
     }
 
-    response = requests.get(geocode_url, params=params)
+    try:
+        response = http_client.get(geocode_url, params=params)
+    except requests.RequestException:
+        return f"Unknown location ({lat}, {lng})", False
     if response.status_code != 200:
-        return f"Unknown location ({lat}, {lng})"
+        return f"Unknown location ({lat}, {lng})", False
 
     data = response.json()
     if data.get("status") == "OK" and data.get("results"):
-        return data["results"][0]["formatted_address"]
+        return data["results"][0]["formatted_address"], True
     else:
-        return f"Unknown location ({lat}, {lng})"
\ No newline at end of file
+        return f"Unknown location ({lat}, {lng})", False
\ No newline at end of file
@@ -3,7 +3,8 @@ from dotenv import load_dotenv
 import requests
 from langchain.tools import StructuredTool
 from langchain.tools import Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.llm import create_llm
+from utils import http_client, tracing
 from langchain.agents import initialize_agent
 
 PRICELINE_API_KEY = os.getenv("RAPIDAPI_KEY")
@@ -32,7 +33,11 @@ def get_location_id(city_name):
     }
     params = {"query": city_name}
 
-    response = requests.get(url, headers=headers, params=params)
+    try:
+        response = http_client.get(url, headers=headers, params=params)
+    except requests.RequestException as e:
+        print("LocationId request failed:", e)
+        return None
     data = response.json()
     print(data)
     location_id = response.json().get("cityID")
@@ -83,7 +88,10 @@ def get_hotels_nearby(city_name, check_in, check_out, rooms=1, adults=1):
 		"adults": str(adults)
 	}
     
-    response = requests.get(url, headers=headers, params=params)
+    try:
+        response = http_client.get(url, headers=headers, params=params)
+    except requests.RequestException as e:
+        return {"error": str(e)}
     
     return response.json()
 
@@ -111,12 +119,12 @@ def find_hotels(city_name, check_in, check_out, rooms=1, adults=1):
     )
 
     # Initialize the LangChain agent with the tools
-    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, api_key=GEMINI_API_KEY)
+    llm = create_llm(model=GEMINI_MODEL)
 
     agent = initialize_agent([search_hotels_tool], llm, agent_type="zero-shot-react-description", verbose=True)
 
     # Use the agent to search for parks and activities matching interests
-    result = agent.run(f"You are a travel agent searching for hotels. List 5 hotels with the best price to review ratio in {city_name} for the dates {check_in} to {check_out}. Include the number of rooms: {rooms} and adults: {adults}. Of the 5 best hotels give your recommendation and why. Return the results as if you were customer service. Make sure to include the address, check in and check out times, the price per night, total price for all nights, the brand, and amenities, the rating for each of the five options before your recommendation. If an error is thrown or no flights are available, just return 'available rooms were found' instead of an error message.")
+    result = agent.run(f"You are a travel agent searching for hotels. List 5 hotels with the best price to review ratio in {city_name} for the dates {check_in} to {check_out}. Include the number of rooms: {rooms} and adults: {adults}. Of the 5 best hotels give your recommendation and why. Return the results as if you were customer service. Make sure to include the address, check in and check out times, the price per night, total price for all nights, the brand, and amenities, the rating for each of the five options before your recommendation. If an error is thrown or no flights are available, just return 'available rooms were found' instead of an error message.", callbacks=[tracing.tracing_callback])
     return result
 
 if __name__ == "__main__":
@@ -6,38 +6,50 @@ import os
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
 
-from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.documents import Document
 from typing_extensions import TypedDict
+from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
+from geopy.distance import geodesic
 
 import reddit_data as rd
 import nps_api_search as nps
 import flight_info as fi
 import hotel_info as hi
 import wikipedia_info as wi
+from waypoint_extractor import Gazetteer, extract_waypoint_schedule, known_places_from_documents
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import re
-import time
 from kivy.logger import Logger
 from utils.storage import load_data, save_data
+from utils import tracing
+from utils.llm import create_llm
+from utils.summarize import summarize_documents
+from utils.geocoding import geocode_many
+from utils.rate_limiter import gemini_limiter, is_rate_limit_error, retry_hint, backoff_delay
 
 def safe_invoke(llm, prompt, delay=2, retries=3):
     """
-    Calls LLM with delay and retry logic to avoid hitting rate limits.
+    Calls LLM with retry logic for rate limits.
+    Pacing is handled by the shared rate limiter on the model, so the first
+    attempt goes out immediately. A quota error pauses every Gemini caller for
+    a jittered, exponentially growing delay that honors the server's retry hint.
     """
-    for attempt in range(retries):
-        try:
-            time.sleep(delay)
-            return llm.invoke(prompt)
-        except Exception as e:
-            if "ResourceExhausted" in str(e) and attempt < retries - 1:
-                delay *= 2
-                print(f"[Retrying] Quota hit, retrying in {delay} seconds...")
-                continue
-            raise
+    with tracing.span("llm", "safe_invoke") as span:
+        for attempt in range(retries):
+            try:
+                return llm.invoke(prompt)
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < retries - 1:
+                    wait = backoff_delay(attempt, base=delay, hint=retry_hint(e))
+                    print(f"[Retrying] Quota hit, retrying in {wait:.1f} seconds...")
+                    span.add("retries")
+                    span.add("sleep_s", wait)
+                    gemini_limiter.pause(wait)
+                    continue
+                raise
 
 
 # Define the shape of the workflow state
@@ -50,21 +62,182 @@ class State(TypedDict):
     interests: str
     limit: int
     itinerary: str
+    flight_info: str
+    hotel_info: str
     itinerary_with_flight: str
     interest_with_hotel: str
     improved_itinerary: str
     final_itinerary: str
     sales_pitch: str
+    daily_waypoints: dict
+    known_places: list
+    hotel: str
+    place_hours: dict
+
+
+# Schema for the single-call "fast" pipeline mode
+class TimedActivity(BaseModel):
+    time: str = Field(description="Start time of the activity, e.g. '9:00 AM'")
+    description: str = Field(description="What the traveler does, in one sentence")
+    location: str = Field(description="Name of the place the activity happens at, specific enough to geocode")
+    hours: str = Field(default="", description="Opening days and hours of the place, e.g. 'Tue-Sun 10am-5pm', or empty when unknown or always open")
+
+class DayPlan(BaseModel):
+    day: int = Field(description="Day number, starting at 1")
+    title: str = Field(description="Short theme for the day")
+    locations: list[str] = Field(description="Places visited this day, in visiting order")
+    activities: list[TimedActivity]
+
+class StructuredItinerary(BaseModel):
+    sales_pitch: str = Field(description="Exciting description of the trip, 350 words or less, without the schedule, flight or hotel details")
+    days: list[DayPlan]
+    logistics: list[str] = Field(description="Short notes on travel, flights and lodging")
+    hotel: str = Field(default="", description="Name and city of the hotel the traveler stays at, specific enough to geocode, or empty when there is none")
+
+
+# Structured-output calls before fast mode falls back to the quality steps.
+# Gemini sometimes answers without the tool call, which parses to None.
+STRUCTURED_ATTEMPTS = 2
+
+# Minimum origin → destination distance before a flight search is worthwhile.
+FLIGHT_MIN_DISTANCE_KM = 300
+
+# State keys each graph node reads and writes, in topological order.
+# Used to skip nodes whose output nothing downstream consumes.
+NODE_IO = {
+    "generate_itinerary": ({"destination", "interests", "origin", "date_start", "date_end", "limit"}, {"itinerary", "known_places"}),
+    "search_flights": ({"origin", "destination", "date_start", "date_end"}, {"flight_info"}),
+    "search_hotels": ({"destination", "date_start", "date_end"}, {"hotel_info"}),
+    "generate_itinerary_with_flight": ({"origin", "destination", "flight_info"}, {"itinerary_with_flight"}),
+    "generate_itinerary_with_hotel": ({"hotel_info"}, {"interest_with_hotel"}),
+    "improve_itinerary": ({"itinerary"}, {"improved_itinerary"}),
+    "polish_itinerary": ({"improved_itinerary", "flight_info", "hotel_info"}, {"final_itinerary"}),
+    "generate_sales_pitch": ({"final_itinerary"}, {"sales_pitch"}),
+    "structured_itinerary": ({"itinerary", "flight_info", "hotel_info"}, {"final_itinerary", "sales_pitch", "daily_waypoints", "hotel", "place_hours"}),
+}
+
+# Parallel branches that start together, and the chain that runs after they join.
+GRAPH_BRANCHES = {
+    "documents": ["generate_itinerary"],
+    "flights": ["search_flights", "generate_itinerary_with_flight"],
+    "hotels": ["search_hotels", "generate_itinerary_with_hotel"],
+}
+
+# Chain that runs after the branches join, per pipeline mode.
+# "quality" refines the draft over three calls; "fast" asks once for a
+# schema-constrained itinerary that already includes times, locations and the pitch.
+GRAPH_TAILS = {
+    "quality": ["improve_itinerary", "polish_itinerary", "generate_sales_pitch"],
+    "fast": ["structured_itinerary"],
+}
+
+
+def needs_flight(state) -> bool:
+    """
+    Decide whether a flight search is warranted for this trip.
+    No origin, the same city, or a short distance means no flight.
+    If either city cannot be geocoded, the flight search still runs.
+    """
+    origin = (state.get("origin") or "").strip()
+    destination = (state.get("destination") or "").strip()
+    if not origin or origin.lower() == destination.lower():
+        return False
+
+    places = geocode_many([origin, destination], city=True)
+    if not places[origin] or not places[destination]:
+        Logger.warning(f"Could not geocode {origin} or {destination}")
+        return True
+
+    origin_coords = (places[origin].latitude, places[origin].longitude)
+    destination_coords = (places[destination].latitude, places[destination].longitude)
+    return geodesic(origin_coords, destination_coords).km >= FLIGHT_MIN_DISTANCE_KM
 
+def needs_hotel(state) -> bool:
+    """
+    Hotels are skipped when the traveler is camping.
+    """
+    return "camping" not in (state.get("interests") or "").lower()
+
+def consumed_nodes(outputs, node_io=NODE_IO) -> set[str]:
+    """
+    Walk the nodes backwards from the requested outputs and return the names of
+    the nodes whose writes are read by something downstream.
+
+    Args:
+        outputs (set[str]): state keys the caller needs at the end of the run.
+        node_io (dict): node name → (reads, writes), in topological order.
+    Returns:
+        set[str]: names of the nodes that must run.
+    """
+    needed = set(outputs)
+    kept = set()
+    for name in reversed(list(node_io)):
+        reads, writes = node_io[name]
+        if writes & needed:
+            kept.add(name)
+            needed |= reads
+    return kept
+
+def select_graph_nodes(state, mode="quality", prune_unused=True, outputs=("sales_pitch",)) -> dict:
+    """
+    Choose which branches and nodes run for this request.
+
+    Args:
+        state (State): the request state.
+        mode (str): pipeline mode, a key of GRAPH_TAILS.
+        prune_unused (bool): skip nodes whose output is never consumed.
+        outputs (tuple[str]): state keys the caller reads from the result.
+    Returns:
+        dict: {"branches": list of node chains that start in parallel,
+               "tail": node chain that runs after the branches join}
+    """
+    if mode not in GRAPH_TAILS:
+        raise ValueError(f"Unknown pipeline mode: {mode}")
+
+    tail = GRAPH_TAILS[mode]
+    active = {name for chain in GRAPH_BRANCHES.values() for name in chain} | set(tail)
+    if not needs_flight(state):
+        Logger.info("Skipping flight search: no flight is warranted.")
+        active -= set(GRAPH_BRANCHES["flights"])
+    if not needs_hotel(state):
+        Logger.info("Skipping hotel search: interests include camping.")
+        active -= set(GRAPH_BRANCHES["hotels"])
+    if prune_unused:
+        node_io = {name: io for name, io in NODE_IO.items() if name in active}
+        active &= consumed_nodes(outputs, node_io)
+
+    branches = []
+    for chain in GRAPH_BRANCHES.values():
+        chain = [name for name in chain if name in active]
+        if chain:
+            branches.append(chain)
+
+    return {
+        "branches": branches,
+        "tail": [name for name in tail if name in active],
+    }
+
+
+def render_structured_itinerary(plan: StructuredItinerary) -> str:
+    """
+    Render a StructuredItinerary in the same markdown layout the multi-step
+    pipeline produces (**Day N** headers and "* **time** activity" lines),
+    so PromptScreen.load_steps can display it unchanged.
+    """
+    lines = []
+    for day in sorted(plan.days, key=lambda d: d.day):
+        header = f"Day {day.day}: {day.title}" if day.title else f"Day {day.day}"
+        lines.append(f"**{header}**")
+        for activity in day.activities:
+            lines.append(f"* **{activity.time}** {activity.description}")
+        lines.append("")
+    lines.extend(plan.logistics)
+    return "\n".join(lines).strip()
 
 def get_waypoints_from_itinerary(steps, destination, data):
     """Send the raw itinerary steps to Gemini and return a list of non-empty lines."""
 
-    llm = ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        google_api_key=GEMINI_API_KEY,
-        temperature=0.0,
-    )
+    llm = create_llm(model=GEMINI_MODEL, temperature=0.0)
 
     itinerary_text = "\n".join(steps)
     prompt = (
@@ -82,20 +255,68 @@ def get_waypoints_from_itinerary(steps, destination, data):
 
     return waypoints
 
-def extract_waypoint_schedule_from_gemini_output(steps, destination, data):
+def resolve_places_with_llm(descriptions):
+    """
+    Ask Gemini for the place named in each activity description.
+    Used only for the lines the local extractor could not resolve.
+
+    Args:
+        descriptions (list[str]): activity descriptions.
+    Returns:
+        dict[str, str | None]: description → place name, or None if there is none.
+    """
+    llm = create_llm(model=GEMINI_MODEL, temperature=0.0)
+
+    numbered = "\n".join(f"{i + 1}. {text}" for i, text in enumerate(descriptions))
+    prompt = (
+        "For each numbered itinerary activity below, reply with the same number followed by the name of the "
+        "specific place where it happens, or NONE if there is no specific place. One line per activity.\n\n"
+        f"{numbered}"
+    )
+    msg = safe_invoke(llm, prompt)
+
+    places = {}
+    for line in msg.content.splitlines():
+        match = re.match(r"\s*(\d+)[.)]\s*(.+)", line)
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        place = match.group(2).strip().strip("*").strip()
+        if 0 <= index < len(descriptions) and place.upper() != "NONE":
+            places[descriptions[index]] = place
+    return places
+
+def extract_waypoint_schedule_from_gemini_output(steps, destination, data, known_places=()):
     """
     Turn the Gemini output into a dict of days → list of waypoints.
+
+    The **Day N** / "* **time** activity" layout is parsed locally. Place names
+    come from a gazetteer of known places (the plan's source documents plus
+    `known_places`, e.g. names that already geocoded) or the activity's
+    capitalization. Only unresolved lines are sent to Gemini, and the whole
+    itinerary only when it does not follow that layout.
     
     Args:
         steps (list[str]): your original steps
+        known_places (list[str]): extra place names to recognize
     
     Returns:
         dict[str, list[str]]
     """
-    if(len(data["plans"][destination]["daily_waypoints"]) > 0):
+    plan = data["plans"][destination]
+    if plan.get("daily_waypoints"):
         # if we already have waypoints, return them
         Logger.info(f"Waypoints already exist for {destination}.")
-        return data["plans"][destination]["daily_waypoints"]
+        return plan["daily_waypoints"]
+
+    gazetteer = Gazetteer(plan.get("known_places") or [])
+    gazetteer.add_all(known_places)
+    schedule = extract_waypoint_schedule(
+        steps, gazetteer, context=destination, fallback=resolve_places_with_llm
+    )
+    if schedule:
+        Logger.info(f"Extracted schedule: {schedule}")
+        return schedule
     else:
         lines = get_waypoints_from_itinerary(steps, destination, data)
         schedule = {}
@@ -120,27 +341,53 @@ def extract_waypoint_schedule_from_gemini_output(steps, destination, data):
         Logger.info(f"Extracted schedule: {schedule}")
         return schedule
 
-def get_documents(destination: str, interests: str, limit: int = 10) -> list[Document]:
+def _to_documents(result) -> list[Document]:
     """
-    Fetch documents for the given destination and interests.
-    Currently loads Reddit posts via reddit_data.
+    Wrap a source result as Documents. Sources return either a single string
+    (the output of their summarization chain) or a list of strings.
     """
+    if not result:
+        return []
+    if isinstance(result, str):
+        result = [result]
+    return [Document(page_content=text) for text in result]
 
-    docs = []
-
-    reddit_strings = rd.get_llm_string(destination, interests, limit=limit)
-    reddit_docs = [Document(page_content=text) for text in reddit_strings]
-
-    nps_strings = nps.search_parks_and_interests(destination, interests)
-    
-    nps_docs = [Document(page_content=text) for text in nps_strings]
-
-    wikipedia_strings = wi.get_llm_string(destination, interests, limit=limit)
-    wikipedia_docs = [Document(page_content=text) for text in wikipedia_strings]
+def get_park_documents(destination: str, interests: str):
+    """
+    National parks near the destination that match the interests, written up
+    by one LLM call. Returns None, without calling the LLM, when the interest
+    index finds no matching park, so NPS adds nothing to the prompt.
+    """
+    shortlist = nps.shortlist_parks(destination, interests)
+    if not shortlist:
+        return None
+    return nps.summarize_parks(destination, interests, shortlist)
 
-    docs.extend(reddit_docs)
-    docs.extend(nps_docs)
-    docs.extend(wikipedia_docs)
+def get_documents(destination: str, interests: str, limit: int = 10) -> list[Document]:
+    """
+    Fetch documents for the given destination and interests.
+    Reddit, NPS and Wikipedia are queried concurrently. A source that fails is
+    logged and contributes no documents; the others are still returned.
+    Documents always come back in Reddit, NPS, Wikipedia order.
+    """
+    sources = [
+        ("reddit", lambda: rd.get_llm_string(destination, interests, limit=limit)),
+        ("nps", lambda: get_park_documents(destination, interests)),
+        ("wikipedia", lambda: wi.get_llm_string(destination, interests, limit=limit)),
+    ]
+
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        futures = [
+            (name, executor.submit(tracing.propagate(tracing.traced("source", name)(fetch))))
+            for name, fetch in sources
+        ]
+
+        docs = []
+        for name, future in futures:
+            try:
+                docs.extend(_to_documents(future.result()))
+            except Exception as e:
+                Logger.error(f"Failed to load {name} documents for {destination}: {e}")
 
     return docs
 
@@ -162,22 +409,19 @@ def build_initial_itinerary(
         "Answer the question {question} using the provided documents as a reference. "
         "Return list of places from the documents: {context}"
     ),
-    limit: int = 10
+    limit: int = 10,
+    docs: list[Document] = None
 ) -> str:
     """
     Builds an initial itinerary using LLM over documents from get_documents.
+    Pass `docs` to reuse documents that were already fetched.
     """
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY not set")
 
-    llm = ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        google_api_key=GEMINI_API_KEY,
-        temperature=0.0,
-    )
+    llm = create_llm(model=GEMINI_MODEL, temperature=0.0)
 
     prompt = ChatPromptTemplate.from_template(prompt_template)
-    chain = create_stuff_documents_chain(llm=llm, prompt=prompt)
 
     query = (
         f"Create an itinerary for a trip to {state['destination']}" +
@@ -186,38 +430,70 @@ def build_initial_itinerary(
         f"The dates are from: {state['date_start']} to {state['date_end']}. " +
         "Make sure each itinerary entry ends with \n"
     )
-    docs = get_documents(state["destination"], state["interests"], limit=limit)
-    result = chain.invoke({"context": docs, "question": query})
+    if docs is None:
+        docs = get_documents(state["destination"], state["interests"], limit=limit)
+    # The sources already picked their passages by interest from the raw
+    # documents; their summaries (and the NPS write-up) are used whole
+    result = summarize_documents(llm, prompt, docs, query)
 
     return result
 
 
-def generate_improved_itinerary(state: State) -> str:
+def generate_improved_itinerary(state: State, prune_unused: bool = True, mode: str = "quality") -> str:
     """
     Orchestrates a 3-step LLM workflow to generate, improve, and polish an itinerary.
+    See run_itinerary_pipeline for the arguments.
+    """
+    return run_itinerary_pipeline(state, prune_unused=prune_unused, mode=mode)["sales_pitch"]
+
+
+def run_itinerary_pipeline(state: State, prune_unused: bool = True, mode: str = "quality") -> dict:
+    """
+    Runs the itinerary StateGraph and returns its final state.
+
+    Document retrieval, the flight search and the hotel search run as parallel
+    branches of the graph and join before the itinerary is refined. The flight
+    branch is skipped when no flight is warranted and the hotel branch when the
+    interests include camping.
+
+    Args:
+        state (State): the request state.
+        prune_unused (bool): skip nodes whose output nothing downstream reads.
+        mode (str): "quality" improves, polishes and pitches the draft in three
+            LLM calls. "fast" produces a structured itinerary, per-day
+            locations and the pitch in a single call, and also fills
+            daily_waypoints.
+    Returns:
+        dict: the final state; "sales_pitch" holds the pitch followed by the itinerary.
     """
-    print(state)
+    Logger.debug(f"Itinerary: {mode} pipeline for {state['destination']}")
 
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY not set")
 
-    llm = ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        google_api_key=GEMINI_API_KEY,
-        temperature=0.0,
-    )
-
-    flight_info = get_flight_info(origin = state["origin"], destination = state["destination"], departure_date = state["date_start"], return_date = state["date_end"])
-    hotel_info =  get_hotel_info(city_name = state["destination"], check_in = state["date_start"], check_out = state["date_end"])
+    llm = create_llm(model=GEMINI_MODEL, temperature=0.0)
 
     # Node 1: generate initial itinerary
     def generate_itinerary_node(state: State) -> dict:
+        docs = get_documents(state["destination"], state["interests"], limit=state.get("limit", 10))
         itinerary = build_initial_itinerary(
-            state, limit=state.get("limit", 10)
+            state, limit=state.get("limit", 10), docs=docs
         )
-        
-        return {"itinerary": itinerary}
-    
+        # Place names from the sources, used later to find waypoints without an LLM call
+        known_places = known_places_from_documents([doc.page_content for doc in docs])
+
+        return {"itinerary": itinerary, "known_places": known_places}
+
+    def search_flights_node(state: State) -> dict:
+        flight_info = get_flight_info(origin = state["origin"], destination = state["destination"], departure_date = state["date_start"], return_date = state["date_end"])
+
+        return {"flight_info": flight_info}
+
+    def search_hotels_node(state: State) -> dict:
+        hotel_info = get_hotel_info(city_name = state["destination"], check_in = state["date_start"], check_out = state["date_end"])
+
+        return {"hotel_info": hotel_info}
+
     def generate_itinerary_with_flight(state: State) -> dict:
         """
         Generate flight information.
@@ -225,11 +501,11 @@ def generate_improved_itinerary(state: State) -> str:
         query = (
             f"Decide if a flight is worth it for going from {state['origin']} to {state['destination']}." +
             f"If it is decided to use flights, include the flight information in the itinerary and adjust the itinerary accordingly. " + 
-            flight_info
+            state["flight_info"]
         )
-        result = safe_invoke(llm, query)
+        msg = safe_invoke(llm, query)
 
-        return result
+        return {"itinerary_with_flight": msg.content}
     
     def generate_itinerary_with_hotel(state: State) -> dict:
         """
@@ -237,11 +513,11 @@ def generate_improved_itinerary(state: State) -> str:
         """
         query = (
             f"If the user does not have camping as an interest, incorporate a recommended hotel into the itinerary." + 
-            hotel_info
+            state["hotel_info"]
         )
-        result = safe_invoke(llm, query)
+        msg = safe_invoke(llm, query)
 
-        return result
+        return {"interest_with_hotel": msg.content}
 
     # Node 2: add times to each activity
     def improve_itinerary_node(state: State) -> dict:
@@ -255,7 +531,9 @@ def generate_improved_itinerary(state: State) -> str:
         query = f"Remove any content in the response that is unrelated to times, days, and activities: {state['improved_itinerary']}"
         msg = safe_invoke(llm, query)
 
-        return {"final_itinerary": msg.content + "\n" + flight_info + "\n" + hotel_info}
+        # Skipped flight/hotel branches leave their info empty
+        parts = [msg.content, state["flight_info"], state["hotel_info"]]
+        return {"final_itinerary": "\n".join(part for part in parts if part)}
     
     def sales_pitch_node(state: State) -> dict:
         """
@@ -271,36 +549,103 @@ def generate_improved_itinerary(state: State) -> str:
 
         return {"sales_pitch": msg.content + "\n\n" + state["final_itinerary"]}
 
-    # Build and wire the StateGraph
-    workflow = StateGraph(State)
-    workflow.add_node("generate_itinerary", generate_itinerary_node)
-    workflow.add_node("generate_itinerary_with_flight", generate_itinerary_with_flight)
-    workflow.add_node("generate_itinerary_with_hotel", generate_itinerary_with_hotel)
-    workflow.add_node("improve_itinerary", improve_itinerary_node)
-    workflow.add_node("polish_itinerary", polish_itinerary_node)
-    workflow.add_node("generate_sales_pitch", sales_pitch_node)
-    workflow.add_edge(START, "generate_itinerary")
-    workflow.add_edge("generate_itinerary", "generate_itinerary_with_flight")
-    workflow.add_edge("generate_itinerary_with_flight", "generate_itinerary_with_hotel")
-    workflow.add_edge("generate_itinerary_with_hotel", "improve_itinerary")
-    workflow.add_edge("improve_itinerary", "polish_itinerary")
-    workflow.add_edge("polish_itinerary", "generate_sales_pitch")
-    workflow.add_edge("generate_sales_pitch", END)
-
-    chain = workflow.compile()
-    
-    result_state = chain.invoke({
-        "destination": state["destination"],
-        "prompt": state.get("prompt", ""),
-        "origin": state["origin"],
-        "date_start": state["date_start"],
-        "date_end": state["date_end"],
-        "interests": state["interests"],
-        "limit": state.get("limit", 10),
-        "itinerary": state.get("itinerary", ""),
-        "improved_itinerary": state.get("improved_itinerary", ""),
-        "final_itinerary": state.get("final_itinerary", ""),
-        "sales_pitch": state.get("sales_pitch", "")
-    })
-
-    return result_state["sales_pitch"]
+    def structured_itinerary_node(state: State) -> dict:
+        """
+        Fast mode: one schema-constrained call replaces improve, polish and pitch.
+        """
+        query = (
+            f"You are a travel agent. Turn this draft into a day-by-day itinerary for a trip to {state['destination']} "
+            f"from {state['date_start']} to {state['date_end']} for someone interested in {state['interests']}. "
+            f"Give every activity a start time and the place it happens at, list each day's locations in visiting order, "
+            f"and write an exciting sales pitch for the trip. Draft: {state['itinerary']}\n"
+            f"Flight information: {state['flight_info'] or 'none'}\n"
+            f"Hotel information: {state['hotel_info'] or 'none'}"
+        )
+        for _ in range(STRUCTURED_ATTEMPTS):
+            plan = safe_invoke(llm.with_structured_output(StructuredItinerary), query)
+            if plan is not None:
+                break
+        else:
+            # Keep the retrieval work: finish the trip with the quality tail instead
+            Logger.warning("Itinerary: no structured itinerary from Gemini, using the quality steps")
+            fallback = dict(state)
+            for node in (improve_itinerary_node, polish_itinerary_node, sales_pitch_node):
+                fallback.update(node(fallback))
+            return {key: fallback[key] for key in ("improved_itinerary", "final_itinerary", "sales_pitch")}
+
+        parts = [render_structured_itinerary(plan), state["flight_info"], state["hotel_info"]]
+        final_itinerary = "\n".join(part for part in parts if part)
+        daily_waypoints = {
+            f"Day {day.day}": day.locations or [activity.location for activity in day.activities]
+            for day in sorted(plan.days, key=lambda d: d.day)
+        }
+
+        return {
+            "final_itinerary": final_itinerary,
+            "sales_pitch": plan.sales_pitch + "\n\n" + final_itinerary,
+            "daily_waypoints": daily_waypoints,
+            "hotel": plan.hotel.strip(),
+            # Lets the map's day scheduler keep places off the days they are closed
+            "place_hours": {
+                activity.location: activity.hours
+                for day in plan.days for activity in day.activities if activity.hours
+            },
+        }
+
+    nodes = {
+        "generate_itinerary": generate_itinerary_node,
+        "search_flights": search_flights_node,
+        "search_hotels": search_hotels_node,
+        "generate_itinerary_with_flight": generate_itinerary_with_flight,
+        "generate_itinerary_with_hotel": generate_itinerary_with_hotel,
+        "improve_itinerary": improve_itinerary_node,
+        "polish_itinerary": polish_itinerary_node,
+        "generate_sales_pitch": sales_pitch_node,
+        "structured_itinerary": structured_itinerary_node,
+    }
+
+    with tracing.start_run("itinerary", destination=state["destination"], mode=mode):
+        # Decide once, before building, which branches run. The join below only
+        # waits on branches that are actually wired in.
+        selected = select_graph_nodes(state, mode=mode, prune_unused=prune_unused)
+        branches, tail = selected["branches"], selected["tail"]
+
+        # Build and wire the StateGraph
+        workflow = StateGraph(State)
+        for chain in branches + [tail]:
+            for name in chain:
+                workflow.add_node(name, tracing.traced("node", name)(nodes[name]))
+
+        for chain in branches + [tail]:
+            for current, following in zip(chain, chain[1:]):
+                workflow.add_edge(current, following)
+
+        # Branches start together and tail waits for all of them to finish
+        for chain in branches:
+            workflow.add_edge(START, chain[0])
+        workflow.add_edge([chain[-1] for chain in branches], tail[0])
+        workflow.add_edge(tail[-1], END)
+
+        chain = workflow.compile()
+
+        result_state = chain.invoke({
+            "destination": state["destination"],
+            "prompt": state.get("prompt", ""),
+            "origin": state["origin"],
+            "date_start": state["date_start"],
+            "date_end": state["date_end"],
+            "interests": state["interests"],
+            "limit": state.get("limit", 10),
+            "flight_info": state.get("flight_info", ""),
+            "hotel_info": state.get("hotel_info", ""),
+            "itinerary": state.get("itinerary", ""),
+            "improved_itinerary": state.get("improved_itinerary", ""),
+            "final_itinerary": state.get("final_itinerary", ""),
+            "sales_pitch": state.get("sales_pitch", ""),
+            "daily_waypoints": state.get("daily_waypoints", {}),
+            "known_places": state.get("known_places", []),
+            "hotel": state.get("hotel", ""),
+            "place_hours": state.get("place_hours", {}),
+        })
+
+    return result_state
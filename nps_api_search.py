@@ -1,84 +1,242 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.llm import create_llm
+from utils import http_client, tracing
 from dotenv import load_dotenv
-from langchain.agents import initialize_agent
-from langchain.tools import Tool
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-from langchain.tools import StructuredTool
-from langchain.tools import Tool
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from utils.disk_cache import CACHE_DIR, DiskCache, make_key
+from utils.geocoding import geocode, geocode_many
+from utils.interest_index import InterestIndex, matching_tags
+from utils.retrieval import split_interests
+from park_catalog import get_park_catalog
 import pandas as pd
 
-NPS_API_KEY = os.getenv("NPS_KEY")
 NPS_API_URL = "https://developer.nps.gov/api/v1/parks"
+NPS_API_BASE = "https://developer.nps.gov/api/v1/"
 
 # Load environment variables.
 load_dotenv()
 
+NPS_API_KEY = os.getenv("NPS_KEY")
+# How long fetched park details are reused, in seconds
+NPS_DETAIL_TTL = float(os.getenv("NPS_DETAIL_TTL", str(24 * 3600)))
+# Concurrent requests to the NPS API
+NPS_WORKERS = int(os.getenv("NPS_WORKERS", "6"))
+# Park codes sent in one request, and records asked for per page
+NPS_BATCH_SIZE = 25
+NPS_PAGE_SIZE = 500
+# Endpoints whose records don't name their park, so each park needs its own request.
+# Others found at runtime are added
+UNBATCHED_ENDPOINTS = {"activities", "topics"}
+# Nearest parks looked at per search, and things to do quoted per interest
+NPS_MAX_PARKS = 10
+EXAMPLES_PER_INTEREST = 3
+# Match interests through the prebuilt index in CACHE_DIR rather than per request
+INTEREST_INDEX = os.getenv("INTEREST_INDEX", "1") == "1"
+# Seconds before an index missing some parks' things to do is rebuilt
+INTEREST_INDEX_RETRY = 300
+
 # Set the model name for our LLMs.
 GEMINI_MODEL = "gemini-2.0-flash"
 
 # Store the API key in a variable.
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+SUMMARY_PROMPT = ChatPromptTemplate.from_template(
+    "You are an expert travel blogger that specializes in national parks. Your friends are travelling to "
+    "{city_name} and like: {interests}. Using only the facts below, write up each park: a short summary of "
+    "the park and, for each interest it matches, the specific trails, places or tours listed for it.\n\n{parks}"
+)
+
 
 def get_city_coordinates(city_name):
     """
-        Get the latitude and longitude of a city using Nominatim geocoder.
+        Get the latitude and longitude of a city using the shared geocoder.
         Args:
             city_name (str): The name of the city to geocode.
         Returns:
             tuple: A tuple containing the latitude and longitude of the city.
     """
-    geolocator = Nominatim(user_agent="my_unique_application_name")
-    location = geolocator.geocode(city_name)
+    location = geocode(city_name, city=True)
     if location:
         return (location.latitude, location.longitude)
     return None
 
 def get_parks_near_city(city_name, max_distance_km=100):
     """
-        Get national parks within a certain distance of a city.
+        Get national parks within a certain distance of a city, from the local
+        park catalog.
         Args:
             city_name (str): The name of the city to search near.
             max_distance_km (int): The maximum distance in kilometers to search for parks.
         Returns:
-            list: A list of nearby parks and their distances from the city.
+            list: A list of nearby parks and their distances from the city, nearest first.
     """
 
     city_coords = get_city_coordinates(city_name)
     if not city_coords:
         return f"Could not find coordinates for {city_name}."
 
-    params = {
-        "limit": 1000,  # Fetch a wider range of parks
-        "api_key": NPS_API_KEY
-    }
-    
-    response = requests.get(NPS_API_URL, params=params)
-    if response.status_code == 200:
-        parks = response.json()["data"]
-        nearby_parks = []
+    try:
+        catalog = get_park_catalog()
+    except requests.RequestException as e:
+        return f"Error: {e}"
+
+    nearby_parks = [
+        {"name": park.name, "distance_km": round(distance, 2), "park_code": park.code}
+        for park, distance in catalog.near(city_coords, max_distance_km)
+    ]
+    return nearby_parks if nearby_parks else f"No national parks found within {max_distance_km} km of {city_name}."
+
+def get_parks_near_cities(city_names, max_distance_km=100):
+    """
+        Get national parks near each city of a multi-city trip in one query.
+        Args:
+            city_names (list): The names of the cities to search near.
+            max_distance_km (int): The maximum distance in kilometers to search for parks.
+        Returns:
+            dict: city name → list of nearby parks (as in get_parks_near_city), or an
+            error message for cities that could not be found.
+    """
+    places = geocode_many(city_names, city=True)
+    located = [city for city in city_names if places.get(city)]
+    results = {city: f"Could not find coordinates for {city}." for city in city_names if city not in located}
+    if not located:
+        return results
+
+    try:
+        catalog = get_park_catalog()
+    except requests.RequestException as e:
+        return {city: f"Error: {e}" for city in city_names}
+
+    centers = [(places[city].latitude, places[city].longitude) for city in located]
+    for city, nearby in zip(located, catalog.near_many(centers, max_distance_km)):
+        results[city] = [
+            {"name": park.name, "distance_km": round(distance, 2), "park_code": park.code}
+            for park, distance in nearby
+        ]
+    return {city: results[city] for city in city_names}
+
+
+
+_detail_cache = None
+_detail_cache_lock = threading.Lock()
+
+
+def get_detail_cache():
+    """The persistent cache of NPS responses per (endpoint, park code), opened on first use."""
+    global _detail_cache
+    with _detail_cache_lock:
+        if _detail_cache is None:
+            _detail_cache = DiskCache("nps_details.sqlite", max_entries=20000, ttl=NPS_DETAIL_TTL)
+    return _detail_cache
+
+
+def _record_parks(record):
+    """Park codes an NPS record belongs to, from its parkCode or relatedParks/parks lists."""
+    codes = {code.strip() for code in str(record.get("parkCode") or "").split(",") if code.strip()}
+    for key in ("relatedParks", "parks"):
+        for park in record.get(key) or []:
+            if isinstance(park, dict) and park.get("parkCode"):
+                codes.add(park["parkCode"])
+    return codes
+
+
+def _fetch_pages(request_type, park_codes):
+    """Every record of one endpoint for the given parks, following the API's paging."""
+    records = []
+    while True:
+        params = {
+            "parkCode": ",".join(park_codes),
+            "limit": NPS_PAGE_SIZE,
+            "start": len(records),
+            "api_key": NPS_API_KEY,
+        }
+        response = http_client.get(NPS_API_BASE + request_type, params=params)
+        response.raise_for_status()
+        payload = response.json()
+        data = payload.get("data", [])
+        records.extend(data)
+        if not data or len(records) >= int(payload.get("total") or 0):
+            return records
+
 
-        for park in parks:
-            if "latLong" in park and park["latLong"]:
-                # Extract park coordinates
-                lat_lon = park["latLong"].replace("lat:", "").replace("long:", "").split(",")
-                park_coords = (float(lat_lon[0]), float(lat_lon[1]))
-                distance = geodesic(city_coords, park_coords).km
+def _fetch_batch(request_type, park_codes):
+    """
+    Fetch one endpoint for several parks in one request and split the records
+    by park. Endpoints whose records don't say which park they belong to
+    (e.g. activities) are fetched again one park at a time.
+    Returns:
+        dict: park code → list of records.
+    """
+    records = _fetch_pages(request_type, park_codes)
+    if len(park_codes) == 1:
+        return {park_codes[0]: records}
 
-                if distance <= max_distance_km:
-                    nearby_parks.append({
-                        "name": park["fullName"],
-                        "distance_km": round(distance, 2),
-                        "park_code": park["parkCode"]
-                    })
+    by_park = {code: [] for code in park_codes}
+    for record in records:
+        owners = _record_parks(record) & by_park.keys()
+        if not owners:
+            UNBATCHED_ENDPOINTS.add(request_type)
+            return {code: _fetch_pages(request_type, [code]) for code in park_codes}
+        for code in owners:
+            by_park[code].append(record)
+    return by_park
 
-        return nearby_parks if nearby_parks else f"No national parks found within {max_distance_km} km of {city_name}."
-    else:
-        return f"Error: {response.status_code}"
 
+def fetch_park_details(park_codes, request_types=("thingstodo",), max_workers=NPS_WORKERS):
+    """
+        Fetch NPS details for many parks at once.
+
+        Responses are cached per (endpoint, park code). The misses of each
+        endpoint are requested together, up to NPS_BATCH_SIZE park codes per
+        request (one per request for UNBATCHED_ENDPOINTS), and all requests
+        run concurrently.
+        Args:
+            park_codes (list): The park codes to fetch, e.g. ["arch", "cany"].
+            request_types (list): NPS endpoints such as thingstodo, activities, places, events, tours.
+            max_workers (int): The maximum number of concurrent requests.
+        Returns:
+            dict: request type → {park code → list of records}. Parks whose request
+            failed are left out so the caller can tell them from parks with no records.
+    """
+    park_codes = list(dict.fromkeys(code.strip() for code in park_codes if code and code.strip()))
+    cache = get_detail_cache()
+    results = {request_type: {} for request_type in request_types}
+    batches = []
+    for request_type in request_types:
+        missing = []
+        for code in park_codes:
+            cached = cache.get(make_key("nps", request_type, code))
+            if cached is not None:
+                results[request_type][code] = cached
+            else:
+                missing.append(code)
+        size = 1 if request_type in UNBATCHED_ENDPOINTS else NPS_BATCH_SIZE
+        for i in range(0, len(missing), size):
+            batches.append((request_type, missing[i:i + size]))
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            futures = [
+                executor.submit(tracing.propagate(_fetch_batch), request_type, codes)
+                for request_type, codes in batches
+            ]
+            for (request_type, codes), future in zip(batches, futures):
+                try:
+                    by_park = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    print(f"Error: {request_type} for {','.join(codes)}: {e}")
+                    continue
+                for code, records in by_park.items():
+                    results[request_type][code] = records
+                    cache.set(make_key("nps", request_type, code), records)
+    return results
 
 
 def NPS_API_Request_by_Park(request_type, park_code):
@@ -86,67 +244,256 @@ def NPS_API_Request_by_Park(request_type, park_code):
         Function to make a request to the NPS API based on the request type and park code.
         Args:
             request_type (str): The type of request to make (e.g., parks, activities, places, thingstodo, events, newsreleases, visitorcenters, feespasses, tours, amenities).
-            park_code (str): The park code to search for.
-    """
-    NPS_API_URL = "https://developer.nps.gov/api/v1/" + request_type
-
-    params = {
-        "parkCode": park_code,
-        "api_key": NPS_API_KEY
-    }
-
-    response = requests.get(NPS_API_URL, params=params)
-        
-    if response.status_code == 200:
-        requested_info = response.json()["data"]
-        return pd.DataFrame(requested_info)
-    else:
-        print("Error: {response.status_code}")
+            park_code (str): The park code to search for, or several separated by commas.
+    """
+    park_codes = [code.strip() for code in str(park_code).split(",") if code.strip()]
+    by_park = fetch_park_details(park_codes, [request_type])[request_type]
+    if len(by_park) < len(park_codes):
         return None
 
+    # A record shared by several of the parks is only listed once
+    requested_info = {}
+    for code in park_codes:
+        for record in by_park[code]:
+            requested_info.setdefault(record.get("id") or repr(record), record)
+    return pd.DataFrame(list(requested_info.values()))
 
-def search_parks_and_interests(city_name, interests, max_distance_km=100):
+
+def interest_records(parks, things_to_do):
+    """
+        Records for the interest index: one per park, per activity or topic tag, and per thing to do.
+        Args:
+            parks (list): Parks from the park catalog.
+            things_to_do (dict): park code → records from the NPS thingstodo endpoint.
+        Returns:
+            list: dicts with kind, key, name, tags, text and parks.
+    """
+    records = []
+    tag_parks = {}
+    for park in parks:
+        tags = list(park.activities) + list(park.topics)
+        records.append({"kind": "park", "key": park.code, "name": park.name, "tags": tags,
+                        "text": park.designation, "parks": [park.code]})
+        for tag in tags:
+            tag_parks.setdefault(tag, []).append(park.code)
+    for tag, codes in tag_parks.items():
+        records.append({"kind": "activity", "key": tag, "name": tag, "tags": [tag], "parks": codes})
+
+    seen = set()
+    for code, things in things_to_do.items():
+        for thing in things:
+            key = thing.get("id") or f"{code}:{thing.get('title', '')}"
+            if key in seen:
+                continue
+            seen.add(key)
+            codes = sorted(_record_parks(thing)) or [code]
+            tags = [item.get("name", "") for field in ("activities", "topics") for item in thing.get(field) or []]
+            records.append({"kind": "thingstodo", "key": key, "name": thing.get("title", ""), "tags": tags,
+                            "text": thing.get("shortDescription", ""), "parks": codes})
+    return records
+
+
+def _interest_index_path(fingerprint):
+    # Named after the catalog it was built from, so a rebuild never replaces a mapped file
+    return os.path.join(CACHE_DIR, f"interest_index-{fingerprint[:16]}.bin")
+
+
+def build_interest_index(catalog=None):
+    """
+        Build the interest index over every park in the catalog and its things to do, and save it.
+        When some parks' things to do could not be fetched the index is kept in memory only and
+        its meta lists them under "missing", so get_interest_index builds it again later.
+        Returns:
+            InterestIndex: the new index.
+    """
+    catalog = catalog or get_park_catalog()
+    fingerprint = catalog.meta.get("fingerprint", "")
+    parks = list(catalog.parks)
+    things = fetch_park_details([park.code for park in parks], ["thingstodo"])["thingstodo"]
+    missing = sorted(park.code for park in parks if park.code not in things)
+    meta = {"catalog": fingerprint, "missing": missing, "built_at": time.time()}
+    index = InterestIndex.build(interest_records(parks, things), meta=meta)
+    if missing:
+        print(f"Error: no things to do for {len(missing)} parks; the interest index is not saved")
+        return index
+
+    path = _interest_index_path(fingerprint)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    index.save(path)
+    for name in os.listdir(CACHE_DIR):
+        old = os.path.join(CACHE_DIR, name)
+        if name.startswith("interest_index-") and name.endswith(".bin") and old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return InterestIndex.open(path) or index
+
+
+_interest_index = None
+_interest_index_lock = threading.Lock()
+_interest_index_build = None
+
+
+def _rebuild_interest_index(catalog):
+    global _interest_index, _interest_index_build
+    try:
+        index = build_interest_index(catalog)
+        with _interest_index_lock:
+            _interest_index = index
+    except Exception as e:
+        print(f"Error: building the interest index failed: {e}")
+    finally:
+        with _interest_index_lock:
+            _interest_index_build = None
+
+
+def get_interest_index():
+    """
+        The shared interest index, opened from disk on first use. When it is missing or was built
+        from an older park catalog it is rebuilt in the background, and the old index (or None)
+        is returned meanwhile.
+        Returns:
+            InterestIndex: or None when there is none yet, or INTEREST_INDEX=0.
+    """
+    global _interest_index, _interest_index_build
+    if not INTEREST_INDEX:
+        return None
+    catalog = get_park_catalog()
+    fingerprint = catalog.meta.get("fingerprint", "")
+    with _interest_index_lock:
+        if _interest_index is None:
+            _interest_index = InterestIndex.open(_interest_index_path(fingerprint))
+        current = _interest_index is not None and _interest_index.meta.get("catalog") == fingerprint
+        if current and _interest_index.meta.get("missing"):
+            current = time.time() - _interest_index.meta.get("built_at", 0) < INTEREST_INDEX_RETRY
+        if not current and _interest_index_build is None:
+            _interest_index_build = threading.Thread(
+                target=tracing.propagate(_rebuild_interest_index), args=(catalog,),
+                name="interest-index", daemon=True,
+            )
+            _interest_index_build.start()
+        return _interest_index
+
+
+def _match_parks(index, nearby, interests, examples_per_interest=EXAMPLES_PER_INTEREST):
+    """
+        Look up each interest once in the index and group the hits by nearby park.
+        Returns:
+            list: (park, distance, matches) for the parks that matched, nearest first, where matches
+            maps interest → {"tags": matching park tags, "examples": matching things to do}.
+    """
+    codes = {park.code for park, _ in nearby}
+    hits = {code: {} for code in codes}
+    for interest in interests:
+        for entry_id, score in index.match(interest).items():
+            entry = index.entries[entry_id]
+            if entry["kind"] not in ("park", "thingstodo"):
+                continue
+            for code in codes.intersection(entry["parks"]):
+                hits[code].setdefault(interest, []).append((score, entry))
+
+    shortlist = []
+    for park, distance in nearby:
+        matches = {}
+        for interest, found in hits[park.code].items():
+            tags = matching_tags(interest, list(park.activities) + list(park.topics))
+            things = sorted((pair for pair in found if pair[1]["kind"] == "thingstodo"), key=lambda pair: -pair[0])
+            examples = [{"title": entry["name"], "shortDescription": entry["snippet"]}
+                        for _, entry in things[:examples_per_interest]]
+            if tags or examples:
+                matches[interest] = {"tags": tags, "examples": examples}
+        if matches:
+            shortlist.append((park, distance, matches))
+    return shortlist
+
+
+def shortlist_parks(city_name, interests, max_distance_km=100, max_parks=NPS_MAX_PARKS):
+    """
+        Nearby parks that match the interests, without any LLM call.
+
+        Uses the prebuilt interest index when it is ready. Otherwise the parks' things to do are
+        fetched and indexed on the spot.
+        Args:
+            city_name (str): The name of the city to search near.
+            interests (list): A list of user interests, or a comma-separated string.
+            max_distance_km (int): The maximum distance in kilometers to search for parks.
+            max_parks (int): The number of nearest parks considered.
+        Returns:
+            list: (park, distance_km, matches) as returned by _match_parks, or None when the city
+            or any park near it could not be found.
+    """
+    city_coords = get_city_coordinates(city_name)
+    if not city_coords:
+        return None
+    try:
+        nearby = get_park_catalog().near(city_coords, max_distance_km)[:max_parks]
+    except requests.RequestException as e:
+        print(f"Error: {e}")
+        return None
+    if not nearby:
+        return None
+
+    index = get_interest_index()
+    if index is None:
+        things = fetch_park_details([park.code for park, _ in nearby], ["thingstodo"])["thingstodo"]
+        index = InterestIndex.build(interest_records([park for park, _ in nearby], things))
+    return _match_parks(index, nearby, split_interests(interests))
+
+
+def _park_context(park, distance, matches):
+    """Plain-text facts about one matching park for the summarization prompt."""
+    lines = [f"{park.name} ({park.designation or 'NPS site'}, {', '.join(park.states)}), {round(distance)} km away"]
+    for interest, found in matches.items():
+        lines.append(f"- {interest}: tags {', '.join(found['tags']) or 'none'}")
+        for thing in found["examples"]:
+            description = " ".join(str(thing.get("shortDescription", "")).split())
+            lines.append(f"  * {thing.get('title', '')}: {description}")
+    return "\n".join(lines)
+
+
+def summarize_parks(city_name, interests, shortlist):
+    """
+        Write up shortlisted parks with a single LLM call.
+        Args:
+            city_name (str): The city the parks are near.
+            interests (list): A list of user interests, or a comma-separated string.
+            shortlist (list): The result of shortlist_parks.
+        Returns:
+            str: The write-up.
+    """
+    llm = create_llm(model=GEMINI_MODEL)
+    chain = SUMMARY_PROMPT | llm | StrOutputParser()
+    return chain.invoke({
+        "city_name": city_name,
+        "interests": ", ".join(split_interests(interests)),
+        "parks": "\n\n".join(_park_context(*match) for match in shortlist),
+    })
+
+
+def search_parks_and_interests(city_name, interests, max_distance_km=100, max_parks=NPS_MAX_PARKS):
     """
     Search for national parks near a city and find activities matching user interests.
-    
+
+    Nearby parks come from the local catalog and are matched to the interests
+    through the interest index (activity and topic tags, things to do, and
+    synonyms); a single LLM call then writes up the parks that match.
+
     Args:
         city_name (str): The name of the city to search near.
-        interests (list): A list of user interests.
+        interests (list): A list of user interests, or a comma-separated string.
         max_distance_km (int): The maximum distance in kilometers to search for parks.
-    
+        max_parks (int): The number of nearest parks considered.
+
     Returns:
         str: The result of the search with info about parks and activities.
     """
-    # Define the tool for searching parks near a city with a single input
-    search_parks_tool = StructuredTool.from_function(
-        func=lambda input: get_parks_near_city(**eval(input)),  # Parse the input string as a dictionary
-        name="SearchParksNearCity",
-        description="Search for national parks within a certain distance of a city. Input should be a dictionary with 'city_name' and 'max_distance_km'.",
-        parameters=[
-            {"name": "input", "type": "string", "description": "A dictionary with 'city_name' and 'max_distance_km' as keys."}
-        ]
-    )
-
-    # Define the tool for making additional API requests with a single input
-    nps_request_tool = StructuredTool.from_function(
-        func=lambda input: NPS_API_Request_by_Park(**eval(input)),  # Parse the input string as a dictionary
-        name="NPS_API_Request_by_Park",
-        description="Request additional information from the NPS API for a given park. Input should be a dictionary with 'request_type', and 'park_code'. Example request types include parks, activities, places, thingstodo, events, newsreleases, visitorcenters, feespasses, tours, amenities.",
-        parameters=[
-            {"name": "input", "type": "string", "description": "A dictionary with 'request_type', and 'park_code' as keys."}
-        ]
-    )
-
-    # Initialize the LangChain agent with the tools
-    tools = [search_parks_tool, nps_request_tool]
-
-    llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, api_key=GEMINI_API_KEY)
-
-    agent = initialize_agent(tools, llm, agent_type="zero-shot-react-description", verbose=True)
-
-    # Use the agent to search for parks and activities matching interests
-    result = agent.run(f"You are an expert travel blogger that specializes in national parks. Your goal is to help your friends plan visits to national parks near the location that they are travelling to and based on what they like to do. Find national parks near {city_name} within {max_distance_km} km. Then using requests for thingstodo in the park and their activities find items that match the following interests: {interests}. Then for the all the parks that match the interests and also provide information about the park including a summary of the park and some specific examples of the interests. For example, if the interest is hiking, provide some specific trails or locations within the parks that are great for hiking. If the {city_name} is not in the US or cannot be found, return a message that says 'Sorry, I cannot find any National Parks near {city_name}.")
-    return result
+    shortlist = shortlist_parks(city_name, interests, max_distance_km, max_parks)
+    if shortlist is None:
+        return f"Sorry, I cannot find any National Parks near {city_name}."
+    if not shortlist:
+        return f"Sorry, I cannot find any National Parks near {city_name} that match {', '.join(split_interests(interests))}."
+    return summarize_parks(city_name, interests, shortlist)
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,252 @@
+"""
+Local snapshot of the NPS park list.
+
+The park list barely changes, so it is downloaded once, parsed (coordinates,
+codes, names, states, activity and topic tags) and kept in CACHE_DIR. Radius
+and nearest-park queries run against a spatial index of the snapshot. A
+background thread checks the API on a schedule and only replaces the
+snapshot when the upstream data changed.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from utils import http_client
+from utils.disk_cache import CACHE_DIR
+from utils.spatial_index import SpatialIndex
+
+NPS_PARKS_URL = "https://developer.nps.gov/api/v1/parks"
+# Seconds between checks for upstream changes. 0 disables the background refresh
+NPS_CATALOG_REFRESH = float(os.getenv("NPS_CATALOG_REFRESH", str(24 * 3600)))
+# Wait before retrying after a failed refresh
+NPS_CATALOG_RETRY = 300
+PAGE_SIZE = 500
+CATALOG_VERSION = 1
+
+Park = namedtuple("Park", ["code", "name", "designation", "states", "lat", "lng", "activities", "topics"])
+
+_LAT_LONG = re.compile(r"lat:\s*(-?\d+(?:\.\d+)?)\s*,\s*long:\s*(-?\d+(?:\.\d+)?)")
+
+
+def parse_lat_long(park):
+    """(lat, lng) of an NPS park record, or None when it has no location."""
+    try:
+        if park.get("latitude") and park.get("longitude"):
+            return float(park["latitude"]), float(park["longitude"])
+    except ValueError:
+        pass
+    match = _LAT_LONG.search(park.get("latLong") or "")
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    return None
+
+
+def parse_park(park):
+    """Compact Park from one record of the NPS /parks endpoint."""
+    coords = parse_lat_long(park)
+    return Park(
+        code=park.get("parkCode", ""),
+        name=park.get("fullName") or park.get("name", ""),
+        designation=park.get("designation", ""),
+        states=tuple(state for state in (park.get("states") or "").split(",") if state),
+        lat=coords[0] if coords else None,
+        lng=coords[1] if coords else None,
+        activities=tuple(a["name"] for a in park.get("activities") or [] if a.get("name")),
+        topics=tuple(t["name"] for t in park.get("topics") or [] if t.get("name")),
+    )
+
+
+def fingerprint(parks):
+    """Content hash of parsed parks, used to tell whether a refresh changed anything."""
+    digest = hashlib.sha256(json.dumps(sorted(parks), separators=(",", ":")).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ParkCatalog:
+    """
+    The NPS park list, persisted as JSON and indexed in memory by park code
+    and by coordinates.
+    """
+
+    def __init__(self, path=None, refresh_interval=NPS_CATALOG_REFRESH):
+        self.path = path or os.path.join(CACHE_DIR, "nps_parks.json")
+        self.refresh_interval = refresh_interval
+        self.meta = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._set_parks([])
+
+    def _set_parks(self, parks):
+        by_code = {park.code: park for park in parks}
+        # Parks without a location get NaN, which the index leaves out
+        index = SpatialIndex(
+            [park.lat if park.lat is not None else math.nan for park in parks],
+            [park.lng if park.lng is not None else math.nan for park in parks],
+        )
+        with self.lock:
+            self.parks, self.by_code, self.index = parks, by_code, index
+
+    def __len__(self):
+        return len(self.parks)
+
+    def get(self, code):
+        return self.by_code.get(code)
+
+    @property
+    def checked_at(self):
+        return self.meta.get("checked_at", 0.0)
+
+    def is_stale(self):
+        return time.time() - self.checked_at >= self.refresh_interval
+
+    def load(self):
+        """Read the snapshot from disk. Returns False when there is none."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if saved.get("version") != CATALOG_VERSION:
+            return False
+        parks = [Park(*(tuple(v) if isinstance(v, list) else v for v in row)) for row in saved["parks"]]
+        self.meta = saved["meta"]
+        self._set_parks(parks)
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CATALOG_VERSION, "meta": self.meta, "parks": self.parks}, f)
+        os.replace(tmp, self.path)
+
+    def _fetch_page(self, start, headers=None):
+        params = {"limit": PAGE_SIZE, "start": start, "api_key": os.getenv("NPS_KEY")}
+        return http_client.get(NPS_PARKS_URL, params=params, headers=headers or {})
+
+    def refresh(self):
+        """
+        Check the API for changes and update the snapshot if there are any.
+        The first page is requested conditionally (ETag / Last-Modified) when
+        the API sent validators last time.
+        Returns:
+            bool: True when the park list changed.
+        Raises:
+            requests.RequestException: the API could not be reached or failed.
+        """
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+
+        response = self._fetch_page(0, headers if self.parks else None)
+        if response.status_code == 304:
+            self.meta["checked_at"] = time.time()
+            self.save()
+            return False
+        response.raise_for_status()
+
+        payload = response.json()
+        records = list(payload.get("data", []))
+        total = int(payload.get("total") or len(records))
+        while len(records) < total:
+            page = self._fetch_page(len(records))
+            page.raise_for_status()
+            data = page.json().get("data", [])
+            if not data:
+                break
+            records.extend(data)
+
+        parks = [parse_park(record) for record in records if record.get("parkCode")]
+        digest = fingerprint(parks)
+        changed = digest != self.meta.get("fingerprint")
+        if changed:
+            self._set_parks(parks)
+        self.meta = {
+            "checked_at": time.time(),
+            "fingerprint": digest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        self.save()
+        if changed:
+            print(f"NPS park catalog updated: {len(parks)} parks")
+        return changed
+
+    def near(self, center, max_distance_km, exact=False):
+        """
+        Parks within `max_distance_km` of `center`, nearest first.
+        Args:
+            exact (bool): use geodesic rather than haversine distances.
+        Returns:
+            list[tuple]: (Park, distance in km) pairs.
+        """
+        with self.lock:
+            parks, index = self.parks, self.index
+        ids, distances = index.query_radius(center, max_distance_km, exact=exact)
+        return [(parks[i], float(d)) for i, d in zip(ids, distances)]
+
+    def near_many(self, centers, max_distance_km, exact=False):
+        """near for several centers (e.g. every city of a trip) in one pass."""
+        with self.lock:
+            parks, index = self.parks, self.index
+        return [
+            [(parks[i], float(d)) for i, d in zip(ids, distances)]
+            for ids, distances in index.query_radius_many(centers, max_distance_km, exact=exact)
+        ]
+
+    def nearest(self, center, k=5, max_distance_km=None):
+        """The `k` parks closest to `center` as (Park, distance in km) pairs."""
+        with self.lock:
+            parks, index = self.parks, self.index
+        ids, distances = index.nearest(center, k, max_distance_km)
+        return [(parks[i], float(d)) for i, d in zip(ids, distances)]
+
+    def start_background_refresh(self):
+        """Keep the snapshot fresh from a daemon thread."""
+        if self.refresh_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="nps-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        delay = max(0.0, self.refresh_interval - (time.time() - self.checked_at))
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+                delay = self.refresh_interval
+            except Exception as e:
+                print(f"NPS park catalog refresh failed: {e}")
+                delay = min(self.refresh_interval, NPS_CATALOG_RETRY)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_park_catalog():
+    """
+    The shared park catalog. Loads the snapshot from disk, downloading it on
+    first use, and starts the background refresh.
+    Raises:
+        requests.RequestException: there is no snapshot and the API failed.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            catalog = ParkCatalog()
+            if not catalog.load():
+                catalog.refresh()
+            catalog.start_background_refresh()
+            _catalog = catalog
+    return _catalog
@@ -16,17 +16,18 @@ print(GEMINI_API_KEY,REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT)
 # 2. Document loaders (from the community package)
 from langchain_community.document_loaders import WikipediaLoader, RedditPostsLoader
 
-# 3. Chain constructor and prompt template
-from langchain.chains.combine_documents import create_stuff_documents_chain
+# 3. Map-reduce summarizer and prompt template
 from langchain_core.prompts import ChatPromptTemplate
+from utils.summarize import summarize_documents
+from utils.retrieval import destination_indexes
 
 # 4. Chat models (moved out of core into partner packages)
-from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.llm import create_llm
 # from langchain.chat_models import ChatOpenAI
 
-def get_llm_string(destination, interests, limit=10):
+def load_reddit_docs(destination, limit=10):
     '''
-    Get LLM string from Reddit posts based on destination and interests.
+    Load posts from the subreddits that match the destination.
     '''
 
     reddit = praw.Reddit(
@@ -45,14 +46,6 @@ def get_llm_string(destination, interests, limit=10):
         subs_list.append(s.display_name)
         print(s.display_name)
 
-    #Setup Gemini LLM
-    if GEMINI_API_KEY:
-        llm = ChatGoogleGenerativeAI(
-            model=GEMINI_MODEL,
-            google_api_key=GEMINI_API_KEY,
-            temperature=0.0,
-        )
-
     reddit_docs = []
 
     ##REDDIT LOADER
@@ -78,10 +71,28 @@ def get_llm_string(destination, interests, limit=10):
                 print(f"Error loading subreddit {subreddit}: {e}")
                 tries += 1
 
+    return reddit_docs
+
+def get_llm_string(destination, interests, limit=10):
+    '''
+    Get LLM string from Reddit posts based on destination and interests.
+    Posts are fetched once per destination and indexed; only the passages
+    most relevant to the interests are sent to the LLM.
+    '''
+
+    #Setup Gemini LLM
+    if GEMINI_API_KEY:
+        llm = create_llm(model=GEMINI_MODEL, temperature=0.0)
+
+    index = destination_indexes.get_or_build(
+        ("reddit", destination, limit), lambda: load_reddit_docs(destination, limit=limit)
+    )
+    passages = index.top_k(interests)
+
     prompt = ChatPromptTemplate.from_template("Answer the question {question} using the provided documents as a reference. Return list of places from the documents: {context}")
-    chain = create_stuff_documents_chain(llm=llm, prompt=prompt)
     query  = "What are some interesting places to visit in {destination}? I am interested in " + interests
     
-    result = chain.invoke({"context": reddit_docs, "question": query})
+    # Map-reduce keeps the prompt within budget however many posts were loaded
+    result = summarize_documents(llm, prompt, passages, query)
 
     return result
\ No newline at end of file
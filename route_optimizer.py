@@ -0,0 +1,221 @@
+"""
+Local ordering of each day's waypoints.
+
+Orders the stops of a day to minimize travel distance, optionally starting
+and ending at fixed points such as the hotel, without asking a routing API
+to optimize. Small days are solved exactly; larger ones use nearest neighbor
+followed by 2-opt and Or-opt improvements.
+"""
+import math
+from itertools import permutations
+
+EARTH_RADIUS_KM = 6371.0
+# Stops up to which the order is solved exactly (Held-Karp)
+EXACT_LIMIT = 9
+
+
+def haversine_km(a, b):
+    """Great-circle distance in km between two (lat, lng) points."""
+    lat1, lng1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lng2 = math.radians(b[0]), math.radians(b[1])
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def distance_matrix(points, cost=haversine_km):
+    """
+    Travel cost between every pair of points.
+    Args:
+        points (list[tuple]): (lat, lng) points.
+        cost (callable): cost(a, b) between two points, haversine km by default.
+            Pass a lookup into a cached routing distance matrix for road costs.
+    Returns:
+        list[list[float]]
+    """
+    n = len(points)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                matrix[i][j] = cost(points[i], points[j])
+    return matrix
+
+
+def path_cost(matrix, order, start=None, end=None):
+    """Cost of visiting `order`, from `start` and to `end` when given."""
+    path = ([start] if start is not None else []) + list(order) + ([end] if end is not None else [])
+    return sum(matrix[a][b] for a, b in zip(path, path[1:]))
+
+
+def _exact(matrix, stops, start, end):
+    """Held-Karp over `stops` with optional fixed endpoints."""
+    if start is None and end is None and len(stops) <= 6:
+        return list(min(permutations(stops), key=lambda order: path_cost(matrix, order)))
+
+    n = len(stops)
+    # best[(mask, last)] = (cost, previous) for paths covering `mask`, ending at stops[last]
+    best = {}
+    for i, stop in enumerate(stops):
+        best[(1 << i, i)] = (matrix[start][stop] if start is not None else 0.0, None)
+    for mask in range(1, 1 << n):
+        for last in range(n):
+            entry = best.get((mask, last))
+            if entry is None:
+                continue
+            for nxt in range(n):
+                if mask & (1 << nxt):
+                    continue
+                key = (mask | (1 << nxt), nxt)
+                cost = entry[0] + matrix[stops[last]][stops[nxt]]
+                if key not in best or cost < best[key][0]:
+                    best[key] = (cost, last)
+
+    full = (1 << n) - 1
+    last = min(range(n), key=lambda i: best[(full, i)][0] + (matrix[stops[i]][end] if end is not None else 0.0))
+    order = []
+    mask = full
+    while last is not None:
+        order.append(stops[last])
+        previous = best[(mask, last)][1]
+        mask &= ~(1 << last)
+        last = previous
+    return order[::-1]
+
+
+def _nearest_neighbor(matrix, stops, start):
+    remaining = list(stops)
+    order = []
+    current = start if start is not None else remaining.pop(0)
+    if start is None:
+        order.append(current)
+    while remaining:
+        nxt = min(remaining, key=lambda stop: matrix[current][stop])
+        remaining.remove(nxt)
+        order.append(nxt)
+        current = nxt
+    return order
+
+
+def _two_opt(matrix, order, start, end):
+    """Reverse segments while that shortens the path."""
+    improved = True
+    while improved:
+        improved = False
+        best = path_cost(matrix, order, start, end)
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = path_cost(matrix, candidate, start, end)
+                if cost < best - 1e-9:
+                    order, best, improved = candidate, cost, True
+    return order
+
+
+def _or_opt(matrix, order, start, end):
+    """Move runs of 1-3 consecutive stops elsewhere while that shortens the path."""
+    improved = True
+    while improved:
+        improved = False
+        best = path_cost(matrix, order, start, end)
+        for length in (1, 2, 3):
+            for i in range(len(order) - length + 1):
+                segment = order[i:i + length]
+                rest = order[:i] + order[i + length:]
+                for j in range(len(rest) + 1):
+                    if j == i:
+                        continue
+                    candidate = rest[:j] + segment + rest[j:]
+                    cost = path_cost(matrix, candidate, start, end)
+                    if cost < best - 1e-9:
+                        order, best, improved = candidate, cost, True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return order
+
+
+def solve_order(matrix, stops, start=None, end=None):
+    """
+    Shortest order to visit `stops` (indices into `matrix`).
+    Args:
+        start (int): index every path starts from, e.g. the hotel.
+        end (int): index every path ends at. May equal `start` for a round trip.
+    Returns:
+        list[int]: `stops` reordered.
+    """
+    stops = list(stops)
+    if len(stops) <= 1:
+        return stops
+    if len(stops) <= EXACT_LIMIT:
+        return _exact(matrix, stops, start, end)
+    order = _nearest_neighbor(matrix, stops, start)
+    order = _two_opt(matrix, order, start, end)
+    return _or_opt(matrix, order, start, end)
+
+
+def optimize_day(places, coords, start=None, end=None, cost=haversine_km):
+    """
+    Reorder one day's places to shorten the route.
+    Args:
+        places (list[str]): the day's waypoints, in their current order.
+        coords (list[tuple]): (lat, lng) of each place, or None when unknown.
+        start (tuple): fixed (lat, lng) the day starts from, e.g. the hotel.
+        end (tuple): fixed (lat, lng) the day ends at.
+    Returns:
+        tuple: (reordered places, cost before, cost after). Places without
+        coordinates keep their relative order and go last.
+    """
+    located = [i for i, c in enumerate(coords) if c is not None]
+    unlocated = [places[i] for i, c in enumerate(coords) if c is None]
+
+    points = [coords[i] for i in located]
+    start_index = end_index = None
+    if start is not None:
+        start_index = len(points)
+        points.append(start)
+    if end is not None:
+        if start is not None and tuple(end) == tuple(start):
+            end_index = start_index
+        else:
+            end_index = len(points)
+            points.append(end)
+
+    matrix = distance_matrix(points, cost)
+    stops = list(range(len(located)))
+    before = path_cost(matrix, stops, start_index, end_index)
+    order = solve_order(matrix, stops, start_index, end_index)
+    after = path_cost(matrix, order, start_index, end_index)
+    if after >= before:
+        return list(places), before, before
+    return [places[located[i]] for i in order] + unlocated, before, after
+
+
+def optimize_schedule(daily_waypoints, locate, hotel=None, cost=haversine_km):
+    """
+    Reorder every day of a waypoint schedule.
+    Args:
+        daily_waypoints (dict[str, list[str]]): "Day N" → places.
+        locate (callable): place name → (lat, lng), or None when unknown.
+        hotel (tuple): (lat, lng) each day starts and ends at, if known.
+    Returns:
+        tuple: (new schedule, savings) where savings maps each day to its
+        before/after cost (km with the default cost) plus a "total" entry.
+    """
+    schedule = {}
+    savings = {}
+    total_before = total_after = 0.0
+    for day, places in daily_waypoints.items():
+        coords = [locate(place) for place in places]
+        ordered, before, after = optimize_day(places, coords, start=hotel, end=hotel, cost=cost)
+        schedule[day] = ordered
+        savings[day] = {"before": round(before, 3), "after": round(after, 3), "saved": round(before - after, 3)}
+        total_before += before
+        total_after += after
+    savings["total"] = {
+        "before": round(total_before, 3),
+        "after": round(total_after, 3),
+        "saved": round(total_before - total_after, 3),
+    }
+    return schedule, savings
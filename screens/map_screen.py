@@ -2,7 +2,6 @@ from kivymd.uix.screen import MDScreen
 from kivy_garden.mapview import MapMarkerPopup, MapView
 from kivy.properties import StringProperty
 from kivy.clock import Clock
-from geopy.geocoders import Nominatim
 from kivymd.uix.menu import MDDropdownMenu
 import openrouteservice
 from kivy_garden.mapview import MapLayer
@@ -12,9 +11,15 @@ from dotenv import load_dotenv
 from kivy.logger import Logger
 import math
 from utils.storage import load_data, save_data
+from utils import tracing
+from utils.route_cache import get_route_cache
+from utils.geocoding import geocode, geocode_many
+from route_optimizer import optimize_day
 
 load_dotenv()
 NAV_API_KEY = os.getenv("NAV_API_KEY")
+# Reorder each day's stops into the shortest route before drawing it
+OPTIMIZE_ROUTES = os.getenv("OPTIMIZE_ROUTES", "1") != "0"
 
 class RouteLineLayer(MapLayer):
     def __init__(self, points, **kwargs):
@@ -96,12 +101,12 @@ class Map(MDScreen):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.geolocator = Nominatim(user_agent="travel_planner_v2")
         self.location_cache = {}
         self.route_line = None
         self.ferry_line = None
         self.menu = None
         self.markers = []
+        self.hotel = None
 
 
     def on_kv_post(self, instance):
@@ -167,14 +172,23 @@ class Map(MDScreen):
             self.ids.route_label.text = "No waypoints available."
             return
 
+        self.prefetch_locations(waypoints)
+        located = {}
+        for place in waypoints:
+            location = self.get_or_geocode(place)
+            if location:
+                located[place] = (location.latitude, location.longitude)
+
+        if OPTIMIZE_ROUTES and len(located) > 2:
+            waypoints = self.optimize_day_order(day, waypoints, located)
+
         self.ids.route_label.text = f"Route: {self.waypoint_schedule[day]}"
         points = []
         valid_waypoints = []
 
         for place in waypoints:
-            location = self.get_or_geocode(place)
-            if location:
-                latlon = (location.latitude, location.longitude)
+            if place in located:
+                latlon = located[place]
                 points.append(latlon)
                 valid_waypoints.append(place)
                 marker = MapMarkerPopup(lat=latlon[0], lon=latlon[1], popup_size=("200dp", "100dp"))
@@ -203,11 +217,47 @@ class Map(MDScreen):
                 self.ferry_line = FerryLineLayer(ferry_segments=ferry_segments)
                 Clock.schedule_once(lambda dt: mapview.add_layer(self.ferry_line), 1.6)
 
+    def optimize_day_order(self, day, waypoints, located):
+        """
+        Reorder a day's waypoints into the shortest route, starting and ending
+        at the plan's hotel when it has one, and save the new order.
+        """
+        hotel = None
+        if self.hotel:
+            location = self.get_or_geocode(self.hotel)
+            if location:
+                hotel = (location.latitude, location.longitude)
+
+        ordered, before, after = optimize_day(
+            waypoints, [located.get(place) for place in waypoints], start=hotel, end=hotel
+        )
+        if ordered == list(waypoints):
+            return waypoints
+
+        Logger.info(f"Map: Reordered {day} from {before:.1f} km to {after:.1f} km")
+        self.waypoint_schedule[day] = ordered
+        data = load_data()
+        data["plans"][self.destination]["daily_waypoints"] = self.waypoint_schedule
+        save_data(data)
+        return ordered
+
+    def prefetch_locations(self, places):
+        """Geocode all `places` in one batch so later lookups are instant."""
+        missing = [place for place in places if place not in self.location_cache]
+        for place, location in geocode_many(missing).items():
+            if location:
+                self.location_cache[place] = location
+
+    def locate(self, place):
+        """(lat, lng) of a place, or None when it cannot be geocoded."""
+        location = self.get_or_geocode(place)
+        return (location.latitude, location.longitude) if location else None
+
     def get_or_geocode(self, place):
         if place in self.location_cache:
             return self.location_cache[place]
         try:
-            loc = self.geolocator.geocode(place, timeout=5)
+            loc = geocode(place)
             if loc:
                 self.location_cache[place] = loc
             return loc
@@ -216,6 +266,10 @@ class Map(MDScreen):
             return None
 
     def get_route_polyline(self, waypoints):
+        """
+        Walking route through the waypoints from OpenRouteService, cached on
+        disk by coordinate sequence so reselecting a day does not refetch it.
+        """
         client = openrouteservice.Client(key=NAV_API_KEY)
         coords = []
         for place in waypoints:
@@ -225,18 +279,26 @@ class Map(MDScreen):
         if len(coords) < 2:
             return [], []
 
+        route_cache = get_route_cache()
+        cached = route_cache.get_points("openrouteservice", "foot-walking", [(lat, lon) for lon, lat in coords])
+        if cached is not None:
+            route_points = list(zip(cached[0::2], cached[1::2]))
+            return route_points, self._detect_ferry_segments(route_points)
+
         try:
-            route = client.directions(
-                coordinates=coords,
-                profile='foot-walking',
-                format='geojson',
-            )
+            with tracing.span("http", "api.openrouteservice.org", method="POST", profile="foot-walking"):
+                route = client.directions(
+                    coordinates=coords,
+                    profile='foot-walking',
+                    format='geojson',
+                )
         except Exception as e:
             Logger.warning(f"Routing failed, fallback: {e}")
             return self._create_simple_route(coords), []
 
         route_coords = route['features'][0]['geometry']['coordinates']
         route_points = [(coord[1], coord[0]) for coord in route_coords]
+        route_cache.set_points("openrouteservice", "foot-walking", [(lat, lon) for lon, lat in coords], route_points)
         ferry_segments = self._detect_ferry_segments(route_points)
         return route_points, ferry_segments
 
@@ -279,4 +341,5 @@ class Map(MDScreen):
         """Set the destination for the map"""
         self.destination = destination
         data = load_data()
-        self.waypoint_schedule = data["plans"][self.destination]["daily_waypoints"]
\ No newline at end of file
+        self.waypoint_schedule = data["plans"][self.destination]["daily_waypoints"]
+        self.hotel = data["plans"][self.destination].get("hotel")
\ No newline at end of file
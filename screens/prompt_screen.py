@@ -17,17 +17,21 @@ import textwrap
 from kivy.uix.screenmanager import SlideTransition
 from numpy import pad
 
-from utils.storage import load_data, save_data
+from utils.storage import load_data, save_data, update_plan
 from datetime import datetime
 from dotenv import load_dotenv
 import os
 from kivymd.uix.pickers import MDModalDatePicker
 from datetime import date, timedelta  # This gives you the 'date' type
 from itinerary_generator import extract_waypoint_schedule_from_gemini_output
+from day_scheduler import rebalance_schedule
 #Local imports
 from google_directions import get_directions_via_waypoints
 import itinerary_generator as ig
 
+# Split the itinerary's attractions into days by location instead of keeping the model's days
+CLUSTER_DAYS = os.getenv("CLUSTER_DAYS", "1") != "0"
+
 class PromptScreen(Screen):
     # On Enter is called when the screen is entered
     def on_enter(self, *args):
@@ -180,17 +184,64 @@ class PromptScreen(Screen):
         self.load_steps()
 
     def open_google_maps_screen(self, destination):
-        map_screen = self.manager.get_screen('map')
-        map_screen.set_destination(self.destination)
+        if getattr(self, "_preparing_map", False):
+            return
+        self._preparing_map = True
+        MDSnackbar(
+            MDSnackbarText(text="Preparing the map…"),
+            y=dp(24), pos_hint={"center_x": 0.5}, size_hint_x=0.8,
+        ).open()
+
+        # Extracting and geocoding the waypoints can take seconds (Nominatim
+        # allows one request per second), so it runs off the UI thread
+        Thread(
+            target=self._prepare_map,
+            args=(self.manager.get_screen('map'),),
+            daemon=True
+        ).start()
 
-        data = load_data()
-        daily_waypoints = extract_waypoint_schedule_from_gemini_output(data["plans"][self.destination]["steps"], self.destination, data)
-        data["plans"][self.destination]["daily_waypoints"] = daily_waypoints
-        save_data(data)
+    def _prepare_map(self, map_screen):
+        try:
+            data = load_data()
+            plan = data["plans"][self.destination]
+            # Plans saved before "scheduled" existed keep the days they have
+            needs_schedule = not plan.get("daily_waypoints") or plan.get("scheduled") is False
+            # Names the map already geocoded are known places too
+            daily_waypoints = extract_waypoint_schedule_from_gemini_output(
+                plan["steps"], self.destination, data,
+                known_places=list(map_screen.location_cache),
+            )
+            if needs_schedule and daily_waypoints and CLUSTER_DAYS:
+                # Regroup the model's days so each one stays in one part of town,
+                # off the days a place is closed
+                map_screen.prefetch_locations([place for day in daily_waypoints.values() for place in day])
+                hotel = map_screen.locate(plan["hotel"]) if plan.get("hotel") else None
+                daily_waypoints = rebalance_schedule(
+                    daily_waypoints, map_screen.locate,
+                    plan.get("date_start"), plan.get("date_end"),
+                    hours=plan.get("hours"), hotel=hotel,
+                )
+            update_plan(data, self.destination, daily_waypoints=daily_waypoints, scheduled=True)
+            save_data(data)
+
+            # Schedule the UI update back on the main thread
+            Clock.schedule_once(lambda dt: self._on_map_ready(map_screen), 0)
+
+        except Exception as e:
+            Clock.schedule_once(lambda dt, error=e: self._on_map_failed(error), 0)
+
+    def _on_map_ready(self, map_screen):
+        self._preparing_map = False
+        # Load the schedule into the map only once it has been saved
+        map_screen.set_destination(self.destination)
 
         self.manager.transition = SlideTransition(direction='left')
         self.manager.current = 'map'
 
+    def _on_map_failed(self, error):
+        self._preparing_map = False
+        self._display_message(f"Error: {error}")
+
 
     def clear_itinerary(self):
         self.ids.output_box.clear_widgets()
@@ -206,7 +257,8 @@ class PromptScreen(Screen):
         self.origin = origin
 
         data = load_data()
-        data["plans"][self.destination]["origin"] = origin
+        update_plan(data, self.destination, origin=origin)
+        save_data(data)
 
         if not prompt_text:
             self._display_message("Prompt is empty.")
@@ -224,13 +276,15 @@ class PromptScreen(Screen):
     def _fetch_itinerary(self, prompt_text):
         try:
             data = load_data()
+            plan = data["plans"].get(self.destination, {})
 
             state = ig.State(
                 destination=self.destination,
                 prompt=prompt_text,
                 origin = self.origin,
-                date_start = str(self.date_start),
-                date_end = str(self.date_end),
+                # on_ok saved the picked dates with the plan
+                date_start = str(plan.get("date_start") or ""),
+                date_end = str(plan.get("date_end") or ""),
                 interests=prompt_text,
                 limit=10,
                 itinerary="",
@@ -238,16 +292,26 @@ class PromptScreen(Screen):
                 final_itinerary=""
             )
 
-            itinerary = ig.generate_improved_itinerary(state)
+            result = ig.run_itinerary_pipeline(state, mode=os.getenv("ITINERARY_MODE", "quality"))
 
-            steps = itinerary.split("\n")
+            steps = result["sales_pitch"].split("\n")
             
-            data["plans"][self.destination] = {
-                "destination": self.destination,
-                "prompt": prompt_text,
-                "steps": steps,
-                "daily_waypoints": "",
-            }
+            # Merged into the plan so the dates and origin saved earlier are kept
+            update_plan(
+                data, self.destination,
+                destination=self.destination,
+                prompt=prompt_text,
+                steps=steps,
+                # Fast mode already knows each day's locations
+                daily_waypoints=result.get("daily_waypoints") or "",
+                known_places=result.get("known_places", []),
+                # Fast mode names the hotel, so each day's route can start and end there
+                hotel=result.get("hotel") or None,
+                # Fast mode knows opening hours per place
+                hours=result.get("place_hours") or {},
+                # The model's days are regrouped once, when the map first opens
+                scheduled=False,
+            )
             
             save_data(data)
 
@@ -296,8 +360,12 @@ class PromptScreen(Screen):
     def on_ok(self, instance_date_picker):
             self.ids.date_field.text = str(instance_date_picker.min_date) + "-" + str(instance_date_picker.max_date)
             data = load_data()
-            data["plans"][self.destination]["date_start"] = instance_date_picker.min_date
-            data["plans"][self.destination]["date_end"] = instance_date_picker.max_date
+            update_plan(
+                data, self.destination,
+                date_start=str(instance_date_picker.min_date),
+                date_end=str(instance_date_picker.max_date),
+            )
+            save_data(data)
             self.date_start = instance_date_picker.min_date
             self.date_end = instance_date_picker.max_date
             
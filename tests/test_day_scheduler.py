@@ -0,0 +1,31 @@
+from day_scheduler import open_weekdays, rebalance_schedule
+
+PLACES = {
+    "Maritime Museum": (32.72, -117.17),
+    "Balboa Park": (32.73, -117.15),
+    "Old Town": (32.75, -117.2),
+    "La Jolla Cove": (32.85, -117.27),
+}
+
+
+def test_open_weekdays():
+    assert open_weekdays("Tue-Sun 10am-5pm") == {1, 2, 3, 4, 5, 6}
+    assert open_weekdays("Open daily, closed Mondays") == {1, 2, 3, 4, 5, 6}
+    assert open_weekdays("") == set(range(7))
+
+
+def test_rebalance_keeps_places_off_closed_days():
+    schedule = {"Day 1": ["Maritime Museum", "Balboa Park"], "Day 2": ["Old Town", "La Jolla Cove"]}
+    # 2025-05-26 is a Monday; the hours are keyed by the model's spelling of the place
+    rebalanced = rebalance_schedule(
+        schedule, PLACES.get, "2025-05-26", "2025-05-27",
+        hours={"the Maritime Museum": "Tue-Sun 10am-5pm"},
+    )
+    assert "Maritime Museum" in rebalanced["Day 2"]
+    assert sorted(p for day in rebalanced.values() for p in day) == sorted(PLACES)
+
+
+def test_rebalance_uses_one_day_per_date():
+    schedule = {"Day 1": list(PLACES)}
+    rebalanced = rebalance_schedule(schedule, PLACES.get, "2025-05-26", "2025-05-27")
+    assert len(rebalanced) == 2
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from utils.gazetteer import AIRPORTS_CSV, OfflineGazetteer
+
+pytestmark = pytest.mark.skipif(not os.path.exists(AIRPORTS_CSV), reason="no airports.csv")
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return OfflineGazetteer.from_csv()
+
+
+def near(found, lat, lng, tolerance=0.5):
+    return found is not None and abs(found[0] - lat) <= tolerance and abs(found[1] - lng) <= tolerance
+
+
+@pytest.mark.parametrize("query, lat, lng", [
+    ("Portland, ME", 43.65, -70.31),
+    ("Portland, OR", 45.56, -122.64),
+    ("Columbus, GA", 32.52, -84.94),
+    ("Columbus, Ohio", 40.0, -82.93),
+    ("Salem, OR", 44.91, -123.0),
+    ("Moab, UT", 38.76, -109.75),
+    ("St George, UT", 37.09, -113.59),
+    ("San Diego, California", 32.72, -117.19),
+    ("London", 51.5, -0.13),
+    ("Cambridge, UK", 52.2, 0.18),
+    ("SLC", 40.79, -111.98),
+])
+def test_lookup(gazetteer, query, lat, lng):
+    assert near(gazetteer.lookup(query), lat, lng)
+
+
+@pytest.mark.parametrize("query", [
+    # No airport in the named state: the only "Salem" and "Cambridge" airports are elsewhere
+    "Salem, MA",
+    "Cambridge, MA",
+    # Known to be ambiguous, so not completed to "Cambridge Bay" or guessed
+    "Cambridge",
+    "Springfield",
+    # A place inside a city, not a city
+    "Old Town, San Diego",
+])
+def test_lookup_leaves_ambiguous_queries_to_the_network(gazetteer, query):
+    assert gazetteer.lookup(query) is None
+
+
+def test_added_places_are_matched_exactly(gazetteer):
+    gazetteer.add("Salem, MA", 42.52, -70.9, "united states")
+    assert gazetteer.lookup("salem, ma") == (42.52, -70.9)
+    assert gazetteer.lookup("Salem, NH") is None
+
+
+def test_load_caches_the_index(tmp_path):
+    built = OfflineGazetteer.load(cache_dir=str(tmp_path))
+    loaded = OfflineGazetteer.load(cache_dir=str(tmp_path))
+    assert loaded.names == built.names
+    assert loaded.lookup("Portland, ME") == built.lookup("Portland, ME")
@@ -0,0 +1,72 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from utils.interest_index import InterestIndex, expand_interest, interest_terms, matching_tags
+
+RECORDS = [
+    {"kind": "park", "key": "arch", "name": "Arches National Park", "tags": ["Hiking", "Geology"],
+     "parks": ["arch"]},
+    {"kind": "park", "key": "brca", "name": "Bryce Canyon National Park", "tags": ["Stargazing", "Astronomy"],
+     "parks": ["brca"]},
+    {"kind": "park", "key": "cany", "name": "Canyonlands National Park", "tags": ["Paddling", "Camping"],
+     "parks": ["cany"]},
+    {"kind": "thingstodo", "key": "1", "name": "Hike to Delicate Arch", "tags": ["Hiking"],
+     "text": "A 3 mile round trip hike.", "parks": ["arch"]},
+    {"kind": "thingstodo", "key": "2", "name": "Night sky program", "tags": ["Astronomy"],
+     "text": "Rangers point out planets and stars.", "parks": ["brca"]},
+]
+
+
+@pytest.fixture
+def index():
+    return InterestIndex.build(RECORDS)
+
+
+def keys(index, matched):
+    return {index.entries[entry_id]["key"] for entry_id in matched}
+
+
+def test_free_text_prompt_matches_each_interest(index):
+    results = index.search("I want to go hiking and see the night sky")
+    matched = {entry["key"] for entry, _, _ in results}
+    assert {"arch", "1", "brca", "2"} <= matched
+    assert "cany" not in matched
+
+
+def test_filler_words_are_not_keywords():
+    assert interest_terms("I want to go hiking") == ["hik"]
+    assert interest_terms("see the night sky") == ["night", "sky"]
+
+
+def test_synonyms_expand_from_any_keyword(index):
+    assert keys(index, index.match("kayaking")) == {"cany"}
+    assert keys(index, index.match("we love stargazing")) >= {"brca", "2"}
+    phrases = dict(expand_interest("night sky"))
+    assert ("stargaz",) in phrases
+
+
+def test_matching_tags_for_free_text():
+    tags = ["Hiking", "Stargazing", "Paddling"]
+    assert matching_tags("I want to go hiking", tags) == ["Hiking"]
+    assert matching_tags("see the night sky", tags) == ["Stargazing"]
+
+
+def test_more_keywords_rank_higher(index):
+    matched = index.match("hiking geology")
+    assert max(matched, key=matched.get) == 0
+
+
+def test_unrelated_prompt_matches_nothing(index):
+    assert index.search("I want to go shopping") == []
+
+
+def test_saved_index_is_memory_mapped(index, tmp_path):
+    path = tmp_path / "interest.bin"
+    index.save(str(path))
+    opened = InterestIndex.open(str(path))
+    try:
+        assert isinstance(opened.ids, memoryview)
+        assert opened.match("hiking") == pytest.approx(index.match("hiking"))
+    finally:
+        opened.close()
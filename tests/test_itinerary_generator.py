@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+ig = pytest.importorskip("itinerary_generator")
+
+REQUEST = {
+    "destination": "Moab, UT",
+    "origin": "Moab, UT",
+    "date_start": "2025-05-26",
+    "date_end": "2025-05-27",
+    "interests": "hiking",
+}
+
+
+class NoToolCallLLM:
+    """Answers plain prompts, but its structured output is always None, like a reply without a tool call."""
+
+    def __init__(self):
+        self.structured_calls = 0
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=f"answer {len(self.prompts)}")
+
+    def with_structured_output(self, schema):
+        llm = self
+
+        class Structured:
+            def invoke(self, prompt):
+                llm.structured_calls += 1
+                return None
+        return Structured()
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = NoToolCallLLM()
+    monkeypatch.setattr(ig, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(ig, "create_llm", lambda **kwargs: fake)
+    monkeypatch.setattr(ig, "get_documents", lambda *args, **kwargs: [])
+    monkeypatch.setattr(ig, "build_initial_itinerary", lambda *args, **kwargs: "draft")
+    monkeypatch.setattr(ig, "get_flight_info", lambda *args, **kwargs: "")
+    monkeypatch.setattr(ig, "get_hotel_info", lambda *args, **kwargs: "")
+    return fake
+
+
+def test_fast_mode_falls_back_when_there_is_no_structured_output(llm):
+    result = ig.run_itinerary_pipeline(dict(REQUEST), mode="fast")
+    assert llm.structured_calls == ig.STRUCTURED_ATTEMPTS
+    assert result["final_itinerary"]
+    assert result["sales_pitch"].endswith(result["final_itinerary"])
+    assert not result["daily_waypoints"]
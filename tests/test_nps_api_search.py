@@ -0,0 +1,90 @@
+import pytest
+
+nps = pytest.importorskip("nps_api_search")
+
+from park_catalog import Park
+from utils.retrieval import tokenize
+
+ARCHES = Park("arch", "Arches National Park", "National Park", ("UT",), 38.72, -109.59,
+              ("Hiking", "Stargazing"), ("Geology",))
+CANYONLANDS = Park("cany", "Canyonlands National Park", "National Park", ("UT",), 38.2, -109.93,
+                   ("Paddling", "Swimming", "Camping"), ("Rivers",))
+THINGS = {
+    "arch": [{"id": "1", "title": "Hike to Delicate Arch", "shortDescription": "A 3 mile hike.",
+              "activities": [{"name": "Hiking"}], "relatedParks": [{"parkCode": "arch"}]}],
+    "cany": [{"id": "2", "title": "Float the Green River", "shortDescription": "Multi-day canoe trip.",
+              "activities": [{"name": "Paddling"}], "relatedParks": [{"parkCode": "cany"}]}],
+}
+
+
+class FakeCatalog:
+    def near(self, center, max_distance_km):
+        return [(ARCHES, 17.0), (CANYONLANDS, 40.0)]
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Nearby parks and their things to do without the network, and no prebuilt index."""
+    monkeypatch.setattr(nps, "get_city_coordinates", lambda city: (38.57, -109.55))
+    monkeypatch.setattr(nps, "get_park_catalog", lambda: FakeCatalog())
+    monkeypatch.setattr(nps, "get_interest_index", lambda: None)
+    monkeypatch.setattr(nps, "fetch_park_details",
+                        lambda codes, types: {"thingstodo": {code: THINGS[code] for code in codes}})
+    summaries = []
+    monkeypatch.setattr(nps, "summarize_parks",
+                        lambda city, interests, shortlist: summaries.append(shortlist) or "write-up")
+    return summaries
+
+
+def test_tokenize_stems_common_forms_together():
+    assert tokenize("swimming") == tokenize("swim")
+    assert tokenize("hiking") == tokenize("hikes") == tokenize("hike")
+    assert tokenize("camping") == tokenize("camp")
+
+
+def test_free_text_prompt_finds_parks(offline):
+    result = nps.search_parks_and_interests("Moab, UT", "I want to go hiking and see the night sky")
+    assert result == "write-up"
+    (shortlist,) = offline
+    parks = {park.code: matches for park, _, matches in shortlist}
+    assert set(parks) == {"arch"}
+    assert parks["arch"]["I want to go hiking"]["tags"] == ["Hiking"]
+    assert parks["arch"]["see the night sky"]["tags"] == ["Stargazing"]
+
+
+def test_synonyms_and_stems_match_tags(offline):
+    shortlist = nps.shortlist_parks("Moab, UT", "we'd like to swim, camp and go kayaking")
+    (park, _, matches), = shortlist
+    assert park.code == "cany"
+    assert matches["we'd like to swim"]["tags"] == ["Swimming"]
+    assert matches["camp"]["tags"] == ["Camping"]
+    assert matches["go kayaking"]["examples"][0]["title"] == "Float the Green River"
+
+
+def test_no_match_skips_the_summary(offline):
+    result = nps.search_parks_and_interests("Moab, UT", "shopping malls")
+    assert result.startswith("Sorry")
+    assert offline == []
+
+
+class BuildCatalog:
+    meta = {"fingerprint": "f" * 64}
+    parks = [ARCHES, CANYONLANDS]
+
+
+def test_partial_interest_index_is_not_saved(monkeypatch, tmp_path):
+    monkeypatch.setattr(nps, "CACHE_DIR", str(tmp_path))
+    # The thingstodo request for Canyonlands failed
+    monkeypatch.setattr(nps, "fetch_park_details", lambda codes, types: {"thingstodo": {"arch": THINGS["arch"]}})
+    index = nps.build_interest_index(BuildCatalog())
+    assert index.meta["missing"] == ["cany"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_complete_interest_index_is_saved(monkeypatch, tmp_path):
+    monkeypatch.setattr(nps, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(nps, "fetch_park_details", lambda codes, types: {"thingstodo": dict(THINGS)})
+    index = nps.build_interest_index(BuildCatalog())
+    assert index.meta["missing"] == []
+    assert [path.name for path in tmp_path.iterdir()] == ["interest_index-ffffffffffffffff.bin"]
+    index.close()
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.rate_limiter import is_rate_limit_error
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = SimpleNamespace(status_code=status_code)
+
+
+def test_throttling_errors_are_rate_limits():
+    exceptions = pytest.importorskip("google.api_core.exceptions")
+    assert is_rate_limit_error(exceptions.ResourceExhausted("slow down"))
+    assert is_rate_limit_error(HTTPError(429))
+    assert is_rate_limit_error(RuntimeError("429 RESOURCE_EXHAUSTED: retry in 7s"))
+
+
+def test_wrapped_throttling_error_is_a_rate_limit():
+    try:
+        try:
+            raise HTTPError(429)
+        except HTTPError as e:
+            raise RuntimeError("generation failed") from e
+    except RuntimeError as e:
+        assert is_rate_limit_error(e)
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("Invalid prompt: the flight number was 429"),
+    RuntimeError("Billing quota exceeded for this project"),
+    RuntimeError("hit the rate limit of my patience"),
+    HTTPError(500),
+])
+def test_other_errors_are_not_rate_limits(error):
+    assert not is_rate_limit_error(error)
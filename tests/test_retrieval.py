@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from utils import retrieval
+from utils.retrieval import IndexCache, tokenize
+
+
+class Clock:
+    now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retrieval.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_tokenize_stems_and_drops_stopwords():
+    assert tokenize("The hikes and swimming") == ["hik", "swim"]
+
+
+def test_index_cache_reuses_fetched_documents(clock):
+    cache = IndexCache(ttl=3600, empty_ttl=60)
+    fetches = []
+    fetch = lambda: fetches.append(1) or [Document(page_content="Hiking trails near Moab")]
+    cache.get_or_build("moab", fetch)
+    clock.now += 600
+    assert cache.get_or_build("moab", fetch).top_k("hiking")
+    assert len(fetches) == 1
+
+
+def test_index_cache_retries_empty_fetches_soon(clock):
+    cache = IndexCache(ttl=3600, empty_ttl=60)
+    results = [[], [Document(page_content="Hiking trails near Moab")]]
+    fetch = lambda: results.pop(0)
+    assert not cache.get_or_build("moab", fetch).passages
+    clock.now += 61
+    assert cache.get_or_build("moab", fetch).passages
@@ -0,0 +1,56 @@
+import random
+from itertools import permutations
+
+import pytest
+
+from route_optimizer import EXACT_LIMIT, distance_matrix, optimize_day, optimize_schedule, path_cost, solve_order
+
+
+def random_points(count, seed):
+    rng = random.Random(seed)
+    return [(rng.uniform(37.0, 39.0), rng.uniform(-110.0, -108.0)) for _ in range(count)]
+
+
+def brute_force(matrix, stops, start=None, end=None):
+    return min(path_cost(matrix, order, start, end) for order in permutations(stops))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("round_trip", [False, True])
+def test_exact_order_matches_brute_force(seed, round_trip):
+    points = random_points(8, seed)
+    matrix = distance_matrix(points)
+    # The last point plays the hotel on round trips
+    stops = list(range(7)) if round_trip else list(range(8))
+    start = end = 7 if round_trip else None
+
+    order = solve_order(matrix, stops, start, end)
+    assert sorted(order) == stops
+    assert path_cost(matrix, order, start, end) == pytest.approx(brute_force(matrix, stops, start, end))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_heuristic_returns_a_shorter_permutation(seed):
+    count = EXACT_LIMIT + 6
+    points = random_points(count + 1, seed)
+    matrix = distance_matrix(points)
+    stops = list(range(count))
+
+    order = solve_order(matrix, stops, start=count, end=count)
+    assert sorted(order) == stops
+    assert path_cost(matrix, order, count, count) <= path_cost(matrix, stops, count, count)
+
+
+def test_optimize_day_keeps_unlocated_places_last():
+    places = ["Far", "Unknown", "Near", "Middle"]
+    coords = [(38.0, -108.0), None, (38.0, -109.9), (38.0, -109.0)]
+    ordered, before, after = optimize_day(places, coords, start=(38.0, -110.0))
+    assert ordered == ["Near", "Middle", "Far", "Unknown"]
+    assert after < before
+
+
+def test_optimize_schedule_reports_savings_per_day():
+    located = {"A": (38.0, -109.9), "B": (38.0, -108.0), "C": (38.0, -109.0)}
+    schedule, savings = optimize_schedule({"Day 1": ["B", "A", "C"]}, located.get, hotel=(38.0, -110.0))
+    assert schedule == {"Day 1": ["A", "C", "B"]}
+    assert savings["total"]["saved"] == savings["Day 1"]["saved"] > 0
@@ -0,0 +1,26 @@
+from utils import storage
+
+
+def test_plan_keeps_its_dates_after_an_itinerary_is_fetched(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "DATA_FILE", str(tmp_path / "travel_data.json"))
+    data = storage.load_data()
+    data["plans"]["Moab, UT"] = {"destination": "Moab, UT", "steps": "", "date_start": None, "date_end": None}
+    storage.update_plan(data, "Moab, UT", origin="Denver")
+    # The date picker
+    storage.update_plan(data, "Moab, UT", date_start="2025-05-25", date_end="2025-05-28")
+    storage.save_data(data)
+
+    # The fetched itinerary
+    data = storage.load_data()
+    storage.update_plan(data, "Moab, UT", prompt="hiking", steps=["**Day 1**"], daily_waypoints={"Day 1": ["Arches"]})
+    storage.save_data(data)
+
+    plan = storage.load_data()["plans"]["Moab, UT"]
+    assert (plan["date_start"], plan["date_end"], plan["origin"]) == ("2025-05-25", "2025-05-28", "Denver")
+    assert plan["daily_waypoints"] == {"Day 1": ["Arches"]}
+
+
+def test_update_plan_creates_a_missing_plan():
+    data = {"destinations": []}
+    assert storage.update_plan(data, "Moab, UT", origin="Denver") == {"origin": "Denver"}
+    assert data["plans"] == {"Moab, UT": {"origin": "Denver"}}
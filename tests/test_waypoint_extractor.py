@@ -0,0 +1,44 @@
+import pytest
+
+from waypoint_extractor import Gazetteer, extract_waypoint_schedule, guess_place
+
+
+@pytest.mark.parametrize("description, place", [
+    ("9:00 AM Arrive at SLC Airport", "SLC Airport"),
+    ("Visit the USS Midway Museum", "USS Midway Museum"),
+    ("Dinner at 7:30 PM at the Gaslamp Quarter", "Gaslamp Quarter"),
+    ("10am - 12pm: Explore Balboa Park", "Balboa Park"),
+    ("Catch a train from 30th Street Station", "30th Street Station"),
+    # Activity words joined to the place by "at"
+    ("Picnic at Balboa Park.", "Balboa Park"),
+    ("Sunset at Dead Horse Point State Park.", "Dead Horse Point State Park"),
+    ("Delicate Arch Trail at Arches National Park", "Arches National Park"),
+    ("Hike the Delicate Arch Trail at Arches National Park.", "Arches National Park"),
+])
+def test_guess_place(description, place):
+    assert guess_place(description) == place
+
+
+@pytest.mark.parametrize("description", ["8:00 AM Breakfast", "Relax at the hotel", "Free time"])
+def test_guess_place_without_a_place(description):
+    assert guess_place(description) is None
+
+
+def test_guess_place_prefers_known_places():
+    gazetteer = Gazetteer(["Delicate Arch Trail"])
+    assert guess_place("Hike the Delicate Arch Trail at Arches National Park", gazetteer) == "Delicate Arch Trail"
+
+
+def test_extract_waypoint_schedule_from_canned_itinerary():
+    steps = [
+        "**Day 1: Trails and Views**",
+        "* **8:00 AM** Hike the Delicate Arch Trail at Arches National Park.",
+        "* **12:00 PM** Picnic at Balboa Park.",
+        "* **3:00 PM** Sunset at Dead Horse Point State Park.",
+    ]
+    schedule = extract_waypoint_schedule(steps, Gazetteer(), context="Moab, UT")
+    assert schedule == {"Day 1": [
+        "Arches National Park, Moab, UT",
+        "Balboa Park, Moab, UT",
+        "Dead Horse Point State Park, Moab, UT",
+    ]}
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+
+def make_key(*parts):
+    """Stable content hash of the given parts, used as a cache key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, default=str)
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent key/value cache backed by a SQLite file.
+
+    Entries can expire after a TTL, and the least recently used entries are
+    evicted once the cache holds more than `max_entries`. Values may be bytes
+    or anything JSON-serializable. Safe to share between threads.
+    """
+
+    def __init__(self, name, max_entries=10000, ttl=None, directory=None):
+        """
+        Args:
+            name (str): file name of the cache inside `directory`.
+            max_entries (int): entries kept before LRU eviction kicks in.
+            ttl (float): default time to live in seconds. None means never expire.
+            directory (str): where to keep the file. Defaults to CACHE_DIR.
+        """
+        directory = directory or CACHE_DIR
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, name)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB, is_json INTEGER, "
+            "accessed REAL, expires REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self.conn.commit()
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` on a miss or expiry."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, is_json, expires FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[2] is not None and row[2] < now):
+                if row is not None:
+                    self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return default
+
+            self.conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+
+        value, is_json, _ = row
+        return json.loads(value) if is_json else bytes(value)
+
+    def set(self, key, value, ttl=None):
+        """
+        Store `value` under `key`.
+        Args:
+            ttl (float): time to live in seconds. Defaults to the cache's TTL.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires = now + ttl if ttl is not None else None
+        is_json = not isinstance(value, (bytes, bytearray, memoryview))
+        stored = json.dumps(value) if is_json else bytes(value)
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, is_json, accessed, expires) VALUES (?, ?, ?, ?, ?)",
+                (key, stored, int(is_json), now, expires),
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (now,))
+        count = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def delete(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss/eviction counters since this cache was opened."""
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,345 @@
+import bisect
+import csv
+import difflib
+import math
+import os
+import pickle
+import statistics
+import threading
+from array import array
+
+from utils.disk_cache import CACHE_DIR
+
+AIRPORTS_CSV = os.path.join("Resources", "airports.csv")
+# Airports further than this from their city's main group are treated as data errors
+CITY_RADIUS_DEG = 0.6
+FUZZY_CUTOFF = 0.88
+INDEX_VERSION = 3
+# Margin around a state's bounding box, in degrees, for airports on its border
+STATE_MARGIN_DEG = 0.25
+
+US_STATES = {
+    "al": "alabama", "ak": "alaska", "az": "arizona", "ar": "arkansas", "ca": "california",
+    "co": "colorado", "ct": "connecticut", "de": "delaware", "fl": "florida", "ga": "georgia",
+    "hi": "hawaii", "id": "idaho", "il": "illinois", "in": "indiana", "ia": "iowa",
+    "ks": "kansas", "ky": "kentucky", "la": "louisiana", "me": "maine", "md": "maryland",
+    "ma": "massachusetts", "mi": "michigan", "mn": "minnesota", "ms": "mississippi",
+    "mo": "missouri", "mt": "montana", "ne": "nebraska", "nv": "nevada", "nh": "new hampshire",
+    "nj": "new jersey", "nm": "new mexico", "ny": "new york", "nc": "north carolina",
+    "nd": "north dakota", "oh": "ohio", "ok": "oklahoma", "or": "oregon", "pa": "pennsylvania",
+    "ri": "rhode island", "sc": "south carolina", "sd": "south dakota", "tn": "tennessee",
+    "tx": "texas", "ut": "utah", "vt": "vermont", "va": "virginia", "wa": "washington",
+    "wv": "west virginia", "wi": "wisconsin", "wy": "wyoming", "dc": "district of columbia",
+}
+# Rough (south, north, west, east) bounding boxes, used to tell which state a
+# US airport group is in. The CSV only records the country.
+US_STATE_BOUNDS = {
+    "alabama": (30.14, 35.01, -88.47, -84.89), "alaska": (51.2, 71.4, -179.15, -129.98),
+    "arizona": (31.33, 37.0, -114.82, -109.05), "arkansas": (33.0, 36.5, -94.62, -89.64),
+    "california": (32.53, 42.01, -124.41, -114.13), "colorado": (36.99, 41.0, -109.06, -102.04),
+    "connecticut": (40.98, 42.05, -73.73, -71.79), "delaware": (38.45, 39.84, -75.79, -75.05),
+    "florida": (24.4, 31.0, -87.63, -80.03), "georgia": (30.36, 35.0, -85.61, -80.84),
+    "hawaii": (18.9, 22.24, -160.25, -154.81), "idaho": (42.0, 49.0, -117.24, -111.04),
+    "illinois": (36.97, 42.51, -91.51, -87.5), "indiana": (37.77, 41.76, -88.1, -84.78),
+    "iowa": (40.38, 43.5, -96.64, -90.14), "kansas": (36.99, 40.0, -102.05, -94.59),
+    "kentucky": (36.5, 39.15, -89.57, -81.96), "louisiana": (28.93, 33.02, -94.04, -88.82),
+    "maine": (43.06, 47.46, -71.08, -66.95), "maryland": (37.91, 39.72, -79.49, -75.05),
+    "massachusetts": (41.24, 42.89, -73.51, -69.93), "michigan": (41.7, 48.31, -90.42, -82.41),
+    "minnesota": (43.5, 49.38, -97.24, -89.49), "mississippi": (30.17, 35.0, -91.66, -88.1),
+    "missouri": (35.99, 40.61, -95.77, -89.1), "montana": (44.36, 49.0, -116.05, -104.04),
+    "nebraska": (40.0, 43.0, -104.05, -95.31), "nevada": (35.0, 42.0, -120.01, -114.04),
+    "new hampshire": (42.7, 45.31, -72.56, -70.61), "new jersey": (38.93, 41.36, -75.56, -73.89),
+    "new mexico": (31.33, 37.0, -109.05, -103.0), "new york": (40.5, 45.02, -79.76, -71.86),
+    "north carolina": (33.84, 36.59, -84.32, -75.46), "north dakota": (45.94, 49.0, -104.05, -96.55),
+    "ohio": (38.4, 41.98, -84.82, -80.52), "oklahoma": (33.62, 37.0, -103.0, -94.43),
+    "oregon": (41.99, 46.29, -124.57, -116.46), "pennsylvania": (39.72, 42.27, -80.52, -74.69),
+    "rhode island": (41.15, 42.02, -71.86, -71.12), "south carolina": (32.03, 35.22, -83.35, -78.54),
+    "south dakota": (42.48, 45.95, -104.06, -96.44), "tennessee": (34.98, 36.68, -90.31, -81.65),
+    "texas": (25.84, 36.5, -106.65, -93.51), "utah": (37.0, 42.0, -114.05, -109.04),
+    "vermont": (42.73, 45.02, -73.44, -71.46), "virginia": (36.54, 39.47, -83.68, -75.24),
+    "washington": (45.54, 49.0, -124.85, -116.92), "west virginia": (37.2, 40.64, -82.64, -77.72),
+    "wisconsin": (42.49, 47.31, -92.89, -86.25), "wyoming": (41.0, 45.01, -111.06, -104.05),
+    "district of columbia": (38.79, 38.99, -77.12, -76.91),
+}
+COUNTRY_ALIASES = {"usa": "united states", "us": "united states", "uk": "united kingdom"}
+
+
+def _norm(text):
+    return " ".join(str(text).lower().replace(".", "").split())
+
+
+def _qualifier_state(qualifier):
+    """US state named by a query qualifier like "UT" or "California", or None."""
+    qualifier = _norm(qualifier)
+    if qualifier in US_STATES.values():
+        return qualifier
+    return US_STATES.get(qualifier)
+
+
+def _qualifier_country(qualifier):
+    """Country named by a query qualifier like "UT", "California" or "France"."""
+    if _qualifier_state(qualifier):
+        return "united states"
+    qualifier = _norm(qualifier)
+    return COUNTRY_ALIASES.get(qualifier, qualifier)
+
+
+def _states_at(lat, lng):
+    """US states whose (padded) bounding box holds a point; several near borders."""
+    return [
+        state for state, (south, north, west, east) in US_STATE_BOUNDS.items()
+        if south - STATE_MARGIN_DEG <= lat <= north + STATE_MARGIN_DEG
+        and west - STATE_MARGIN_DEG <= lng <= east + STATE_MARGIN_DEG
+    ]
+
+
+class OfflineGazetteer:
+    """
+    City and airport lookups from Resources/airports.csv with no network.
+
+    Cities are indexed by name, by (name, country) and, in the US, by (name,
+    state), with coordinates taken from the median of the city's airports;
+    airports by name and IATA code. Lookups match exactly, then by a unique
+    prefix, then fuzzily; a name the index knows to be ambiguous is never
+    completed into another one. Only bare names or names qualified by a
+    country or US state are answered, and "City, ST" only by airports inside
+    that state. Names shared by several far-apart places (e.g. Springfield)
+    are left to the network geocoder. Geocoder results can be added at runtime.
+    """
+
+    def __init__(self, names, coords, countries):
+        """
+        Args:
+            names (list[str]): sorted, normalized names.
+            coords (array): flat lat, lng per name.
+            countries (list[str]): normalized country per name, "" when ambiguous.
+                Ambiguous names are kept, with NaN coordinates, so they are
+                known but never resolved.
+        """
+        self.names = names
+        self.coords = coords
+        self.countries = countries
+        self.known_countries = set(countries)
+        self.extra = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path=AIRPORTS_CSV):
+        groups = {}
+        airports = {}
+        with open(path, encoding="latin1", newline="") as f:
+            for row in csv.reader(f):
+                if len(row) < 8:
+                    continue
+                try:
+                    lat, lng = float(row[6]), float(row[7])
+                except ValueError:
+                    continue
+                name, city, country, iata = row[1], row[2], row[3], row[4]
+                if city:
+                    groups.setdefault(_norm(city), {}).setdefault(_norm(country), []).append((lat, lng))
+                if iata and len(iata) == 3:
+                    airports[iata.lower()] = (lat, lng, _norm(country))
+                if name:
+                    airports.setdefault(_norm(name), (lat, lng, _norm(country)))
+
+        ambiguous = (math.nan, math.nan, "")
+        entries = {}
+        for city, by_country in groups.items():
+            places = []
+            for country, points in by_country.items():
+                place = cls._city_location(points)
+                if place:
+                    places.append((len(points), (place[0], place[1], country)))
+                    entries[f"{city}, {country}"] = (place[0], place[1], country)
+                else:
+                    entries[f"{city}, {country}"] = ambiguous
+                if country == "united states":
+                    entries.update(cls._state_entries(city, points))
+            # A bare city name resolves to the place that clearly dominates it
+            # (London, England over London, Ontario), and not at all when it is
+            # shared by comparable places
+            places.sort(key=lambda place: place[0], reverse=True)
+            total = sum(len(points) for points in by_country.values())
+            if places and places[0][0] * 3 > total * 2:
+                entries[city] = places[0][1]
+            else:
+                entries[city] = ambiguous
+        for key, value in airports.items():
+            # Airport names never shadow a city name, even an ambiguous one
+            if key not in groups:
+                entries.setdefault(key, value)
+
+        names = sorted(entries)
+        coords = array("d", (value for name in names for value in entries[name][:2]))
+        return cls(names, coords, [entries[name][2] for name in names])
+
+    @staticmethod
+    def _groups(points):
+        """Airports split into groups of nearby ones (one per town), largest first."""
+        groups = []
+        points = list(points)
+        while points:
+            best = []
+            for lat, lng in points:
+                near = [p for p in points if abs(p[0] - lat) <= CITY_RADIUS_DEG and abs(p[1] - lng) <= CITY_RADIUS_DEG]
+                if len(near) > len(best):
+                    best = near
+            groups.append(best)
+            points = [p for p in points if p not in best]
+        return groups
+
+    @staticmethod
+    def _median(points):
+        return statistics.median(p[0] for p in points), statistics.median(p[1] for p in points)
+
+    @classmethod
+    def _city_location(cls, points):
+        """
+        Median of the largest group of nearby airports, or None when no group
+        holds most of them (the name covers several towns).
+        """
+        best = cls._groups(points)[0]
+        if len(best) * 2 <= len(points) and len(points) > 1:
+            return None
+        return cls._median(best)
+
+    @classmethod
+    def _state_entries(cls, city, points):
+        """
+        "city, state" entries for each group of a US city's airports
+        (Portland, Oregon and Portland, Maine). A state holding two groups
+        of the same name is marked ambiguous.
+        """
+        entries = {}
+        for group in cls._groups(points):
+            lat, lng = cls._median(group)
+            for state in _states_at(lat, lng):
+                key = f"{city}, {state}"
+                entries[key] = (math.nan, math.nan, "") if key in entries else (lat, lng, "united states")
+        return entries
+
+    @classmethod
+    def load(cls, path=AIRPORTS_CSV, cache_dir=None):
+        """Load the prebuilt index from the cache directory, rebuilding it when the CSV changed."""
+        cache_dir = cache_dir or CACHE_DIR
+        stat = os.stat(path)
+        stamp = (INDEX_VERSION, stat.st_size, int(stat.st_mtime))
+        index_path = os.path.join(cache_dir, "gazetteer.pickle")
+        try:
+            with open(index_path, "rb") as f:
+                saved_stamp, names, coords, countries = pickle.load(f)
+            if saved_stamp == stamp:
+                return cls(names, coords, countries)
+        except (OSError, pickle.PickleError, ValueError, EOFError):
+            pass
+
+        gazetteer = cls.from_csv(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(index_path, "wb") as f:
+            pickle.dump((stamp, gazetteer.names, gazetteer.coords, gazetteer.countries), f)
+        return gazetteer
+
+    def add(self, name, lat, lng, country=""):
+        """Remember a place resolved elsewhere, e.g. by the network geocoder. Matched exactly."""
+        with self.lock:
+            self.extra[_norm(name)] = (lat, lng, _norm(country))
+
+    def _index_of(self, key):
+        i = bisect.bisect_left(self.names, key)
+        return i if i < len(self.names) and self.names[i] == key else None
+
+    def _get(self, key):
+        extra = self.extra.get(key)
+        if extra:
+            return extra
+        i = self._index_of(key)
+        if i is None or math.isnan(self.coords[2 * i]):
+            return None
+        return self.coords[2 * i], self.coords[2 * i + 1], self.countries[i]
+
+    def complete(self, prefix, limit=10):
+        """Names starting with `prefix`, for autocomplete."""
+        prefix = _norm(prefix)
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for name in self.names[start:]:
+            if not name.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(name)
+        return matches
+
+    def _candidates(self, key):
+        """Exact, then unique-prefix, then fuzzy matches for one normalized name."""
+        if self._get(key):
+            return [key]
+        # "Cambridge" is known to be ambiguous, not a misspelled "Cambridge Bay"
+        if self._index_of(key) is not None:
+            return []
+        if len(key) >= 4:
+            completions = [n for n in self.complete(key, limit=2) if "," not in n]
+            if len(completions) == 1:
+                return completions
+        pool = [n for n in self.names if n[:1] == key[:1] and abs(len(n) - len(key)) <= 2]
+        return difflib.get_close_matches(key, pool, n=2, cutoff=FUZZY_CUTOFF)
+
+    def lookup(self, query):
+        """
+        Coordinates of a city or airport query such as "Moab, UT",
+        "San Diego, California", "Paris" or "SLC".
+        Returns:
+            tuple: (lat, lng), or None when the gazetteer can't answer confidently.
+        """
+        key = _norm(query)
+        if not key:
+            return None
+        found = self._get(key)
+        if found:
+            return found[0], found[1]
+
+        parts = [part.strip() for part in key.split(",") if part.strip()]
+        if len(parts) > 2:
+            return None
+        city = parts[0]
+        country = None
+        if len(parts) == 2 and _qualifier_state(parts[1]):
+            # Only airports inside the state answer "Portland, ME"
+            state = _qualifier_state(parts[1])
+            names = [city, "saint " + city[3:]] if city.startswith("st ") else [city]
+            for name in names:
+                found = self._get(f"{name}, {state}")
+                if found:
+                    return found[0], found[1]
+            return None
+        if len(parts) == 2:
+            country = _qualifier_country(parts[1])
+            # "Old Town, San Diego" names a place inside a city, not a city
+            if country not in self.known_countries:
+                return None
+            found = self._get(f"{city}, {country}")
+            if found:
+                return found[0], found[1]
+
+        candidates = self._candidates(city)
+        if len(candidates) != 1:
+            return None
+        found = self._get(candidates[0])
+        if found is None:
+            return None
+        # A qualifier naming another country means a different place
+        if country and found[2] and country != found[2]:
+            return None
+        return found[0], found[1]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """The shared gazetteer, built or loaded on first use. None if the CSV is missing."""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None and os.path.exists(AIRPORTS_CSV):
+            _gazetteer = OfflineGazetteer.load()
+    return _gazetteer
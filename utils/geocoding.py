@@ -0,0 +1,210 @@
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+
+from geopy.geocoders import Nominatim
+
+from utils.disk_cache import DiskCache
+from utils.gazetteer import get_gazetteer
+from utils.rate_limiter import TokenBucket
+from utils import tracing
+
+# Nominatim's usage policy allows at most one request per second
+NOMINATIM_RPS = float(os.getenv("NOMINATIM_RPS", "1"))
+NOMINATIM_USER_AGENT = os.getenv("NOMINATIM_USER_AGENT", "travel_planner_v2")
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "5"))
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(90 * 24 * 3600)))
+# Queries that found nothing are retried after this long
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", str(24 * 3600)))
+# Resolve city and airport queries from Resources/airports.csv before the network
+GAZETTEER = os.getenv("GAZETTEER", "1") == "1"
+
+# Same attributes as geopy's Location, so results can replace it
+Place = namedtuple("Place", ["latitude", "longitude", "address"])
+
+
+def normalize_query(query):
+    """Lowercase, collapse whitespace and trim punctuation so equivalent queries share a cache entry."""
+    query = " ".join(str(query).lower().split())
+    query = re.sub(r"\s*,\s*", ", ", query)
+    return query.strip(" ,.;")
+
+
+class Geocoder:
+    """
+    Forward geocoding shared by every module that resolves place names.
+
+    Results, including "not found", are kept in a SQLite cache keyed by the
+    normalized query. Requests to Nominatim go through one process-wide
+    1 request/second limiter, and concurrent lookups of the same query share
+    a single request. City-level queries are answered by the offline
+    gazetteer when it knows them.
+    """
+
+    def __init__(self, store, limiter, client_factory=None, gazetteer=None):
+        self.store = store
+        self.limiter = limiter
+        self.gazetteer = gazetteer
+        self.client_factory = client_factory or (lambda: Nominatim(user_agent=NOMINATIM_USER_AGENT))
+        self._client = None
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self.lock:
+            if self._client is None:
+                self._client = self.client_factory()
+        return self._client
+
+    def cached(self, query):
+        """
+        Look up `query` in the cache only.
+        Returns:
+            tuple: (hit, place) where place is None for a cached "not found".
+        """
+        entry = self.store.get(normalize_query(query))
+        if entry is None:
+            return False, None
+        if entry.get("missing"):
+            return True, None
+        return True, Place(entry["lat"], entry["lng"], entry.get("address", ""))
+
+    def offline(self, query):
+        """The gazetteer's answer for a city or airport query, or None."""
+        if self.gazetteer is None:
+            return None
+        found = self.gazetteer.lookup(query)
+        if found is None:
+            return None
+        tracing.add("gazetteer_hits")
+        return Place(found[0], found[1], str(query))
+
+    def geocode(self, query, city=False):
+        """
+        Coordinates of `query`.
+        Args:
+            query (str): place name or address.
+            city (bool): the query names a city or airport, so the offline
+                gazetteer is tried first and learns the network's answer.
+        Returns:
+            Place: (latitude, longitude, address), or None when not found.
+        """
+        if not query or not str(query).strip():
+            return None
+        if city:
+            place = self.offline(query)
+            if place:
+                return place
+        hit, place = self.cached(query)
+        if hit:
+            tracing.add("cache_hits")
+            if city and place and self.gazetteer is not None:
+                self.gazetteer.add(query, place.latitude, place.longitude)
+            return place
+        tracing.add("cache_misses")
+
+        key = normalize_query(query)
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            place = self._fetch(query)
+            if city and place and self.gazetteer is not None:
+                self.gazetteer.add(query, place.latitude, place.longitude)
+            future.set_result(place)
+            return place
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def _fetch(self, query):
+        waited = self.limiter.acquire()
+        with tracing.span("http", "nominatim.openstreetmap.org", method="GET", query=query) as span:
+            span.set(queue_s=waited)
+            location = self.client.geocode(query, timeout=GEOCODE_TIMEOUT)
+
+        key = normalize_query(query)
+        if location is None:
+            self.store.set(key, {"missing": True}, ttl=GEOCODE_NEGATIVE_TTL)
+            return None
+        place = Place(location.latitude, location.longitude, getattr(location, "address", "") or "")
+        self.store.set(key, {"lat": place.latitude, "lng": place.longitude, "address": place.address})
+        return place
+
+    def geocode_many(self, queries, city=False):
+        """
+        Geocode several queries. Duplicates (after normalization) are looked up
+        once and cache hits return without waiting on the rate limit. Failed
+        lookups map to None. `city` is as for geocode.
+        Returns:
+            dict: query → Place or None, for every query given.
+        """
+        results = {}
+        by_key = {}
+        for query in queries:
+            by_key.setdefault(normalize_query(query), []).append(query)
+
+        misses = []
+        for key, originals in by_key.items():
+            place = self.offline(originals[0]) if city else None
+            hit = place is not None
+            if not hit:
+                hit, place = self.cached(originals[0])
+            if hit:
+                for query in originals:
+                    results[query] = place
+            else:
+                misses.append(originals)
+
+        # The rate limit serializes misses anyway, so fetch them in order
+        for originals in misses:
+            try:
+                place = self.geocode(originals[0], city=city)
+            except Exception as e:
+                tracing.add("errors")
+                print(f"Geocoding failed for {originals[0]!r}: {e}")
+                place = None
+            for query in originals:
+                results[query] = place
+        return results
+
+    def stats(self):
+        return self.store.stats()
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    """The process-wide geocoder, opened on first use."""
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = Geocoder(
+                DiskCache("geocode.sqlite", max_entries=100000, ttl=GEOCODE_CACHE_TTL),
+                TokenBucket(capacity=1, rate=NOMINATIM_RPS),
+                gazetteer=get_gazetteer() if GAZETTEER else None,
+            )
+    return _geocoder
+
+
+def geocode(query, city=False):
+    """See Geocoder.geocode."""
+    return get_geocoder().geocode(query, city=city)
+
+
+def geocode_many(queries, city=False):
+    """See Geocoder.geocode_many."""
+    return get_geocoder().geocode_many(queries, city=city)
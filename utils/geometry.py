@@ -0,0 +1,125 @@
+from array import array
+
+
+def decode_polyline(encoded, out=None, precision=5, skip_first=False):
+    """
+    Decode a Google encoded polyline into a flat array of lat, lng pairs.
+
+    Args:
+        encoded (str): the encoded polyline.
+        out (array): array('d') to append to. A new one is created if None.
+        precision (int): decimal places encoded; 5 for Google and ORS.
+        skip_first (bool): drop the first point, e.g. when it repeats the
+            last point of the previous segment.
+    Returns:
+        array: `out`, with [lat0, lng0, lat1, lng1, ...] appended.
+    """
+    if out is None:
+        out = array("d")
+    factor = 10 ** precision
+    index = lat = lng = 0
+    length = len(encoded)
+    first = True
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        if not (first and skip_first):
+            out.append(lat / factor)
+            out.append(lng / factor)
+        first = False
+    return out
+
+
+class RouteGeometry:
+    """
+    Full geometry of a Directions route in compact arrays.
+
+    `coords` holds every point of the route as [lat0, lng0, lat1, lng1, ...]
+    in an array('d'), built from the per-step polylines. Leg i covers points
+    leg_offsets[i] to leg_offsets[i + 1] (exclusive); legs are the stretches
+    between origin, waypoints and destination.
+    """
+
+    def __init__(self, coords, leg_offsets, leg_distance_m, leg_duration_s, overview=None, waypoint_order=None):
+        self.coords = coords
+        self.leg_offsets = leg_offsets
+        self.leg_distance_m = leg_distance_m
+        self.leg_duration_s = leg_duration_s
+        self.overview = overview if overview is not None else array("d")
+        self.waypoint_order = list(waypoint_order or [])
+
+    @classmethod
+    def from_route(cls, route):
+        """
+        Build the geometry of one entry of a Directions response's "routes".
+        Falls back to the overview polyline, as a single leg, when steps
+        carry no polylines.
+        """
+        coords = array("d")
+        leg_offsets = array("q", [0])
+        leg_distance_m = array("d")
+        leg_duration_s = array("d")
+
+        for leg in route.get("legs", []):
+            leg_start = len(coords)
+            for step in leg.get("steps", []):
+                encoded = (step.get("polyline") or {}).get("points")
+                if encoded:
+                    # Each step starts where the previous one ended
+                    decode_polyline(encoded, coords, skip_first=len(coords) > leg_start)
+            leg_offsets.append(len(coords) // 2)
+            leg_distance_m.append(float((leg.get("distance") or {}).get("value", 0)))
+            leg_duration_s.append(float((leg.get("duration") or {}).get("value", 0)))
+
+        overview = decode_polyline((route.get("overview_polyline") or {}).get("points", ""))
+        if not coords and overview:
+            coords = array("d", overview)
+            leg_offsets = array("q", [0, len(coords) // 2])
+            leg_distance_m = array("d", [sum(leg_distance_m)])
+            leg_duration_s = array("d", [sum(leg_duration_s)])
+        return cls(coords, leg_offsets, leg_distance_m, leg_duration_s, overview, route.get("waypoint_order"))
+
+    def __len__(self):
+        """Number of points."""
+        return len(self.coords) // 2
+
+    @property
+    def leg_count(self):
+        return len(self.leg_offsets) - 1
+
+    @property
+    def distance_m(self):
+        return sum(self.leg_distance_m)
+
+    @property
+    def duration_s(self):
+        return sum(self.leg_duration_s)
+
+    def leg_coords(self, leg):
+        """Flat lat, lng view of one leg's points, without copying."""
+        start, end = self.leg_offsets[leg], self.leg_offsets[leg + 1]
+        return memoryview(self.coords)[2 * start:2 * end]
+
+    def points(self, leg=None):
+        """
+        (lat, lng) tuples of the whole route or one leg, for code that wants
+        tuples (e.g. map markers).
+        """
+        flat = self.coords if leg is None else self.leg_coords(leg)
+        return list(zip(flat[0::2], flat[1::2]))
+
+    def as_numpy(self):
+        """The points as an (n, 2) NumPy array sharing this object's buffer."""
+        import numpy as np
+        return np.frombuffer(self.coords, dtype=np.float64).reshape(-1, 2)
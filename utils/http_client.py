@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import tracing
+
+# Seconds to wait for a connection and for the response
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+# Connections kept alive per host
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+# Consecutive failures that open a host's circuit, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("HTTP_BREAKER_COOLDOWN", "30"))
+# Hedge idempotent GETs: send a second request if the first is slower than the host's p95
+HTTP_HEDGE = os.getenv("HTTP_HEDGE", "0") == "1"
+HTTP_HEDGE_MIN_DELAY = float(os.getenv("HTTP_HEDGE_MIN_DELAY", "0.5"))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without calling the host while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-host failure isolation. After `failures` consecutive errors the
+    circuit opens and calls fail immediately for `cooldown` seconds; then a
+    single probe is let through, and its result closes or reopens the circuit.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Whether a request may be sent now."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record(self, success):
+        with self.lock:
+            self.probing = False
+            if success:
+                self.consecutive = 0
+                self.opened_at = None
+                return
+            self.consecutive += 1
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+
+
+class HostMetrics:
+    """Counters and recent latencies for one host."""
+
+    def __init__(self, window=200):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.latencies = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds, error=False, timeout=False):
+        with self.lock:
+            self.requests += 1
+            self.errors += bool(error)
+            self.timeouts += bool(timeout)
+            self.latencies.append(seconds)
+
+    def add(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def percentile(self, fraction):
+        with self.lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def snapshot(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "short_circuited": self.short_circuited,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "p50_s": round(p50, 3) if p50 is not None else None,
+                "p95_s": round(p95, 3) if p95 is not None else None,
+            }
+
+
+class HTTPClient:
+    """
+    Shared HTTP client for the API modules: one keep-alive session per host,
+    default timeouts, a circuit breaker per host, optional hedged GETs and
+    per-host metrics. Safe to use from several threads.
+    """
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), pool_size=HTTP_POOL_SIZE,
+                 hedge=HTTP_HEDGE):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.hedge = hedge
+        self.sessions = {}
+        self.breakers = defaultdict(CircuitBreaker)
+        self.metrics = defaultdict(HostMetrics)
+        self.lock = threading.Lock()
+        self._hedge_pool = None
+
+    def session(self, host):
+        """The pooled session for `host`, created on first use."""
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self.sessions[host] = session
+        return session
+
+    def get(self, url, hedge=None, **kwargs):
+        """
+        GET `url`. With hedging on (HTTP_HEDGE=1 or hedge=True), a second
+        request is sent if the first takes longer than the host's recent p95,
+        and whichever answers first is returned.
+        """
+        if hedge if hedge is not None else self.hedge:
+            return self._hedged_get(url, **kwargs)
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+        Send one request through the host's session and circuit breaker.
+        Raises:
+            CircuitOpenError: the host has been failing and is cooling down.
+            requests.RequestException: connection errors and timeouts.
+        """
+        host = urlparse(url).netloc
+        breaker = self.breakers[host]
+        metrics = self.metrics[host]
+        if not breaker.allow():
+            metrics.add("short_circuited")
+            raise CircuitOpenError(f"Circuit open for {host}; skipping {method} {url.split('?')[0]}")
+
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        with tracing.http_span(method, url) as span:
+            try:
+                response = self.session(host).request(method, url, **kwargs)
+            except Exception as e:
+                metrics.observe(time.perf_counter() - started, error=True,
+                                timeout=isinstance(e, requests.Timeout))
+                breaker.record(success=False)
+                raise
+            span.set(status=response.status_code)
+
+        # Client errors mean the host is up; only 5xx and 429 count against it
+        failed = response.status_code >= 500 or response.status_code == 429
+        metrics.observe(time.perf_counter() - started, error=failed)
+        breaker.record(success=not failed)
+        return response
+
+    def _hedged_get(self, url, **kwargs):
+        host = urlparse(url).netloc
+        metrics = self.metrics[host]
+        delay = max(HTTP_HEDGE_MIN_DELAY, metrics.percentile(0.95) or 0.0)
+
+        with self.lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="http-hedge")
+        pool = self._hedge_pool
+
+        primary = pool.submit(tracing.propagate(self.request), "GET", url, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        metrics.add("hedged")
+        backup = pool.submit(tracing.propagate(self.request), "GET", url, **kwargs)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.RequestException as e:
+                    error = e
+                    continue
+                if future is backup:
+                    metrics.add("hedge_wins")
+                return response
+        raise error
+
+    def stats(self):
+        """Per-host metrics and breaker state."""
+        return {
+            host: {**metrics.snapshot(), "circuit": self.breakers[host].state}
+            for host, metrics in list(self.metrics.items())
+        }
+
+
+# Shared by nps_api_search, flight_info, hotel_info and google_directions
+http = HTTPClient()
+
+
+def get(url, **kwargs):
+    return http.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return http.post(url, **kwargs)
@@ -0,0 +1,305 @@
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter
+
+from utils.retrieval import split_interests, tokenize
+
+MAGIC = b"IIX1"
+INDEX_VERSION = 1
+# Weight of a term by the field it appears in
+FIELD_WEIGHTS = {"name": 2.0, "tags": 3.0, "text": 1.0}
+# A synonym's match counts for this much of a match on the interest itself
+SYNONYM_WEIGHT = 0.6
+# Longest text kept per entry for prompts
+SNIPPET_CHARS = 300
+
+SYNONYMS = {
+    "hiking": ["hike", "trail", "trails", "backpacking", "walking"],
+    "walking": ["walk", "hiking", "stroll"],
+    "backpacking": ["backcountry", "hiking", "camping"],
+    "camping": ["campground", "backcountry camping", "rv camping", "car or front country camping"],
+    "fishing": ["fish", "angling", "fly fishing"],
+    "biking": ["bike", "cycling", "mountain biking", "road biking"],
+    "mountain biking": ["biking", "cycling"],
+    "climbing": ["rock climbing", "bouldering", "mountaineering", "canyoneering"],
+    "rock climbing": ["climbing", "bouldering"],
+    "kayaking": ["paddling", "canoeing", "boating", "kayak"],
+    "canoeing": ["paddling", "kayaking", "boating"],
+    "boating": ["paddling", "kayaking", "canoeing", "sailing", "motorized boating"],
+    "swimming": ["swim", "beach", "snorkeling"],
+    "snorkeling": ["scuba diving", "swimming"],
+    "wildlife": ["wildlife watching", "birdwatching", "animals", "birds"],
+    "wildlife watching": ["wildlife", "birdwatching", "animals"],
+    "birdwatching": ["birding", "birds", "wildlife watching"],
+    "stargazing": ["astronomy", "night sky", "dark sky"],
+    "astronomy": ["stargazing", "night sky"],
+    "history": ["historic", "heritage", "historical", "museum", "civil war", "archeology"],
+    "museums": ["museum", "exhibits", "history"],
+    "architecture": ["historic buildings", "buildings", "monuments"],
+    "scenic views": ["scenic driving", "viewpoint", "overlook", "vista", "scenic"],
+    "scenic driving": ["scenic drive", "auto touring", "scenic views"],
+    "photography": ["scenic views", "viewpoint", "sunrise", "sunset"],
+    "tours": ["guided tours", "ranger programs", "self-guided tours"],
+    "skiing": ["cross-country skiing", "downhill skiing", "snowshoeing"],
+    "snow": ["skiing", "snowshoeing", "snowmobiling", "winter sports"],
+    "horseback riding": ["horse", "stock animals", "trail rides"],
+    "geology": ["rock formations", "geologic", "volcanoes", "caves", "arches", "canyons"],
+    "caves": ["cave", "caving", "spelunking"],
+    "kids": ["junior ranger", "families", "children"],
+    "food": ["dining", "restaurants"],
+    "shopping": ["gift shop", "bookstore"],
+}
+
+
+# Words of a free-text request ("I want to go hiking and see the night sky")
+# that say nothing about what the traveller wants to do
+FILLER_WORDS = (
+    "want would like love enjoy prefer interested interest go going get see seeing visit visiting "
+    "trip travel vacation holiday plan planning do doing thing things place places stuff some any "
+    "lot lots really very much more most just also maybe please me my us let take check try around "
+    "good great nice fun best cool near nearby park parks national day days time week weekend"
+)
+FILLER_TERMS = set(FILLER_WORDS.split()) | {term for word in FILLER_WORDS.split() for term in tokenize(word)}
+
+
+def interest_terms(interest):
+    """Stemmed keywords of one interest, with stopwords and filler words removed."""
+    return [term for term in tokenize(interest) if term not in FILLER_TERMS and len(term) > 1]
+
+
+def _stem_phrase(phrase):
+    return tuple(tokenize(phrase))
+
+
+# Each interest followed by its synonyms, as stemmed phrases
+_SYNONYM_GROUPS = [
+    [phrase for phrase in map(_stem_phrase, [interest] + synonyms) if phrase]
+    for interest, synonyms in SYNONYMS.items()
+]
+
+
+def expand_interest(interest):
+    """
+    The term phrases an interest matches, with their weights: each of its
+    keywords (1.0); the synonyms of every SYNONYMS interest it contains; and
+    the interest a synonym it contains stands for (both SYNONYM_WEIGHT).
+    Matching per keyword lets free-text requests match as well as short tags.
+    Returns:
+        list[tuple]: (tuple of stemmed terms, weight) pairs.
+    """
+    terms = interest_terms(interest)
+    phrases = {(term,): 1.0 for term in terms}
+    present = set(terms)
+    for key, *synonyms in _SYNONYM_GROUPS:
+        if set(key) <= present:
+            for phrase in synonyms:
+                phrases.setdefault(phrase, SYNONYM_WEIGHT)
+        # One step back only, so "hiking" doesn't drift to backpacking's camping
+        elif any(set(phrase) <= present for phrase in synonyms):
+            phrases.setdefault(key, SYNONYM_WEIGHT)
+    return list(phrases.items())
+
+
+def matching_tags(interest, tags):
+    """The tags that an interest's keywords or synonyms match."""
+    phrases = [set(phrase) for phrase, _ in expand_interest(interest)]
+    return [tag for tag in tags if any(phrase <= set(tokenize(tag)) for phrase in phrases)]
+
+
+class InterestIndex:
+    """
+    Inverted index from interest terms to places: parks, things to do,
+    activities, or any other record with a name, tags and text.
+
+    Each posting holds a BM25 score computed at build time, with tags and
+    names weighted above free text, and each term's postings are sorted best
+    first. The index is saved as one file: a JSON header (term table and
+    entries) followed by the postings as raw uint32 entry ids and float32
+    scores. Those postings are memory-mapped rather than read when the
+    index is opened.
+    """
+
+    def __init__(self, terms, entries, ids, scores, meta=None, mapped=None):
+        """
+        Args:
+            terms (dict): term → (first posting, posting count).
+            entries (list[dict]): kind, key, name, parks and snippet per entry.
+            ids, scores: the postings, as sequences of entry ids and scores.
+        """
+        self.terms = terms
+        self.entries = entries
+        self.ids = ids
+        self.scores = scores
+        self.meta = meta or {}
+        self._mapped = mapped
+
+    @classmethod
+    def build(cls, records, k1=1.2, b=0.75, meta=None):
+        """
+        Args:
+            records (iterable[dict]): with "kind", "key", "name", optional
+                "tags" (list), "text" and "parks" (park codes it belongs to).
+        """
+        entries = []
+        weighted = []
+        for record in records:
+            counts = Counter()
+            for field in ("name", "text"):
+                for term, count in Counter(tokenize(str(record.get(field, "")))).items():
+                    counts[term] += count * FIELD_WEIGHTS[field]
+            for tag in record.get("tags") or []:
+                for term in set(tokenize(tag)):
+                    counts[term] += FIELD_WEIGHTS["tags"]
+            text = " ".join(str(record.get("text", "")).split())
+            entries.append({
+                "kind": record["kind"],
+                "key": record["key"],
+                "name": record.get("name", ""),
+                "parks": list(record.get("parks") or []),
+                "tags": list(record.get("tags") or []),
+                "snippet": text[:SNIPPET_CHARS],
+            })
+            weighted.append(counts)
+
+        total = len(entries)
+        lengths = [sum(counts.values()) for counts in weighted]
+        avg_length = (sum(lengths) / total) if total else 0.0
+        postings = {}
+        for entry_id, counts in enumerate(weighted):
+            for term in counts:
+                postings.setdefault(term, []).append(entry_id)
+
+        terms, ids, scores = {}, array("I"), array("f")
+        for term in sorted(postings):
+            entry_ids = postings[term]
+            idf = math.log(1 + (total - len(entry_ids) + 0.5) / (len(entry_ids) + 0.5))
+            scored = []
+            for entry_id in entry_ids:
+                tf = weighted[entry_id][term]
+                norm = k1 * (1 - b + b * lengths[entry_id] / (avg_length or 1))
+                scored.append((idf * tf * (k1 + 1) / (tf + norm), entry_id))
+            scored.sort(key=lambda pair: (-pair[0], pair[1]))
+            terms[term] = (len(ids), len(scored))
+            ids.extend(entry_id for _, entry_id in scored)
+            scores.extend(score for score, _ in scored)
+        return cls(terms, entries, ids, scores, meta)
+
+    def save(self, path):
+        """Write the index atomically."""
+        header = json.dumps({
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "meta": self.meta,
+            "terms": self.terms,
+            "entries": self.entries,
+        }).encode("utf-8")
+        # Pad so the uint32/float32 arrays start 8-byte aligned
+        start = len(MAGIC) + 8 + len(header)
+        header += b" " * (-start % 8)
+
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(array("I", self.ids).tobytes())
+            f.write(array("f", self.scores).tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open a saved index. The postings stay on disk, memory-mapped.
+        Returns:
+            InterestIndex, or None when the file is missing or unreadable.
+        """
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError("not an interest index")
+            (header_length,) = struct.unpack_from("<Q", mapped, len(MAGIC))
+            start = len(MAGIC) + 8
+            header = json.loads(bytes(mapped[start:start + header_length]))
+            if header["version"] != INDEX_VERSION or header["byteorder"] != sys.byteorder:
+                raise ValueError("index written by another version or platform")
+            count = sum(length for _, length in header["terms"].values())
+            view = memoryview(mapped)
+            offset = start + header_length
+            ids = view[offset:offset + 4 * count].cast("I")
+            scores = view[offset + 4 * count:offset + 8 * count].cast("f")
+        except (ValueError, KeyError, struct.error):
+            mapped.close()
+            return None
+        terms = {term: tuple(span) for term, span in header["terms"].items()}
+        return cls(terms, header["entries"], ids, scores, header["meta"], mapped)
+
+    def postings(self, term):
+        """Entry ids and scores for one stemmed term, best first."""
+        first, count = self.terms.get(term, (0, 0))
+        return self.ids[first:first + count], self.scores[first:first + count]
+
+    def _phrase_scores(self, phrase):
+        """Scores of the entries that contain every term of `phrase`."""
+        totals = None
+        for term in phrase:
+            ids, scores = self.postings(term)
+            current = dict(zip(ids, scores))
+            if totals is None:
+                totals = current
+            else:
+                totals = {i: totals[i] + s for i, s in current.items() if i in totals}
+            if not totals:
+                return {}
+        return totals or {}
+
+    def match(self, interest):
+        """
+        Entries matching any keyword of one interest, directly or through a
+        synonym. Scores add up, so entries matching more of it rank higher.
+        Returns:
+            dict: entry id → score.
+        """
+        matched = {}
+        for phrase, weight in expand_interest(interest):
+            for entry_id, score in self._phrase_scores(phrase).items():
+                matched[entry_id] = matched.get(entry_id, 0.0) + score * weight
+        return matched
+
+    def search(self, interests, kinds=None, parks=None, k=20):
+        """
+        Best entries for several interests.
+        Args:
+            interests (list | str): interests, or a comma-separated string.
+            kinds (set): only entries of these kinds (e.g. {"park", "thingstodo"}).
+            parks (set): only entries belonging to one of these park codes.
+        Returns:
+            list[tuple]: (entry, score, matched interests), best first.
+        """
+        totals, matched = {}, {}
+        for interest in split_interests(interests):
+            for entry_id, score in self.match(interest).items():
+                entry = self.entries[entry_id]
+                if kinds and entry["kind"] not in kinds:
+                    continue
+                if parks and not parks.intersection(entry["parks"]):
+                    continue
+                totals[entry_id] = totals.get(entry_id, 0.0) + score
+                matched.setdefault(entry_id, []).append(interest)
+        best = sorted(totals, key=lambda entry_id: (-totals[entry_id], entry_id))[:k]
+        return [(self.entries[i], totals[i], matched[i]) for i in best]
+
+    def close(self):
+        if self._mapped is not None:
+            self.ids.release()
+            self.scores.release()
+            self._mapped.close()
+            self._mapped = None
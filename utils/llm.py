@@ -0,0 +1,39 @@
+import os
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from utils.rate_limiter import gemini_limiter, UsageCallback
+from utils.llm_cache import get_response_cache
+from utils.tracing import tracing_callback
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+
+def create_llm(model=None, temperature=None, api_key=None, **kwargs):
+    """
+    Build a Gemini chat model that shares the process-wide rate limiter.
+    Every module that talks to Gemini should create its client here.
+
+    Deterministic (temperature 0) models also get the persistent response
+    cache, so repeating a prompt returns the stored answer immediately. Pass
+    `cache=` explicitly to override.
+
+    Args:
+        model (str): Gemini model name. Defaults to GEMINI_MODEL.
+        temperature (float): sampling temperature. Left to the provider default when None.
+        api_key (str): Gemini API key. Defaults to the GEMINI_API_KEY env var.
+    Returns:
+        ChatGoogleGenerativeAI: the configured chat model.
+    """
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    if temperature == 0.0 and "cache" not in kwargs:
+        kwargs["cache"] = get_response_cache()
+
+    return ChatGoogleGenerativeAI(
+        model=model or GEMINI_MODEL,
+        google_api_key=api_key or os.getenv("GEMINI_API_KEY"),
+        rate_limiter=gemini_limiter,
+        callbacks=[UsageCallback(gemini_limiter), tracing_callback],
+        **kwargs,
+    )
@@ -0,0 +1,70 @@
+import os
+import threading
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from utils.disk_cache import DiskCache, make_key
+from utils import tracing
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain cache that stores LLM responses in a DiskCache.
+
+    Keys hash the model settings (LangChain's llm_string covers the model name
+    and temperature) together with the serialized prompt or messages. Plugs in
+    underneath every chat model call, including safe_invoke and the
+    create_stuff_documents_chain chains.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def lookup(self, prompt, llm_string):
+        value = self.store.get(make_key(llm_string, prompt))
+        if value is None:
+            tracing.add("cache_misses")
+            return None
+        tracing.add("cache_hits")
+
+        generations = loads(value)
+        # A cache hit costs no tokens, so don't report the original usage
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None and hasattr(message, "usage_metadata"):
+                message.usage_metadata = None
+        return generations
+
+    def update(self, prompt, llm_string, return_val):
+        self.store.set(make_key(llm_string, prompt), dumps(return_val))
+
+    def clear(self, **kwargs):
+        self.store.clear()
+
+    def stats(self):
+        return self.store.stats()
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    The process-wide LLM response cache, opened on first use.
+    Returns None when disabled with LLM_CACHE=0.
+    """
+    global _response_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LLMResponseCache(
+                DiskCache("llm_responses.sqlite", max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL)
+            )
+    return _response_cache
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from utils import tracing
+
+try:
+    from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+    THROTTLING_ERRORS = (ResourceExhausted, TooManyRequests)
+except ImportError:
+    THROTTLING_ERRORS = ()
+
+# Gemini free-tier budget for gemini-2.0-flash. Override with env vars.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+
+# Upper bound on a single backoff sleep, in seconds.
+MAX_BACKOFF = 60.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Holds up to `capacity` tokens and refills at
+    `rate` tokens per second. Callers only wait when the bucket is empty.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        """
+        Take `amount` tokens, going into debt if needed.
+        Returns:
+            float: seconds the caller must wait before the tokens are available.
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def try_take(self, amount=1):
+        """Take `amount` tokens only if they are available right now."""
+        with self.lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return True
+            return False
+
+    def debt_wait(self):
+        """Seconds until the bucket is out of debt (0 when it is not in debt)."""
+        with self.lock:
+            self._refill()
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens have been taken. Returns seconds waited."""
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class SharedRateLimiter(BaseRateLimiter):
+    """
+    Process-wide limiter for an LLM provider's requests-per-minute and
+    tokens-per-minute budgets.
+
+    Requests are gated up front. Token usage is only known after a call, so it
+    is debited afterwards (see UsageCallback) and later callers wait while the
+    token budget is in debt. A rate-limit error from the server pauses every
+    caller until the server's retry hint has passed.
+    """
+
+    def __init__(self, requests_per_minute=GEMINI_RPM, tokens_per_minute=GEMINI_TPM):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _wait_time(self):
+        with self.lock:
+            wait = max(0.0, self.paused_until - time.monotonic())
+        if self.tokens:
+            wait = max(wait, self.tokens.debt_wait())
+        return wait
+
+    def acquire(self, *, blocking=True):
+        """
+        Take one request slot. Returns True once the call may proceed, or
+        False when `blocking` is False and the budget is exhausted.
+        """
+        if not blocking:
+            return self._wait_time() == 0 and self.requests.try_take()
+
+        waited = 0.0
+        wait = self._wait_time()
+        while wait > 0:
+            time.sleep(wait)
+            waited += wait
+            wait = self._wait_time()
+        waited += self.requests.acquire()
+        if waited:
+            tracing.add("queue_s", waited)
+        return True
+
+    async def aacquire(self, *, blocking=True):
+        if not blocking:
+            return self.acquire(blocking=False)
+
+        wait = self._wait_time()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self._wait_time()
+        wait = self.requests.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def record_tokens(self, count):
+        """Debit tokens actually used by a finished call."""
+        if self.tokens and count:
+            self.tokens.reserve(count)
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds`, e.g. after a 429 from the server."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def total_tokens(response):
+    """
+    Pull the total token count out of an LLMResult, or 0 if the provider did
+    not report usage.
+    """
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("total_tokens", 0)
+    usage = (response.llm_output or {}).get("usage_metadata") or {}
+    return usage.get("total_tokens", 0)
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Debits each finished LLM call's token usage from a SharedRateLimiter."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def on_llm_end(self, response, **kwargs):
+        self.limiter.record_tokens(total_tokens(response))
+
+
+def _status_code(error):
+    """HTTP status of an API error, from the error or the response it carries."""
+    for source in (error, getattr(error, "response", None)):
+        code = getattr(source, "status_code", None)
+        if code is None:
+            code = getattr(source, "code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_rate_limit_error(error):
+    """
+    True if `error` is a quota / rate-limit response: a Google API
+    ResourceExhausted, an HTTP 429, or (for wrapped errors) one whose text
+    carries Gemini's RESOURCE_EXHAUSTED status. The error's cause is checked too.
+    """
+    while error is not None:
+        if isinstance(error, THROTTLING_ERRORS) or _status_code(error) == 429:
+            return True
+        if "RESOURCE_EXHAUSTED" in str(error):
+            return True
+        error = error.__cause__
+    return False
+
+
+def retry_hint(error):
+    """
+    Seconds the server asked us to wait before retrying, or None.
+    Reads a `retry_after` attribute, a Retry-After header, or the retry delay
+    Gemini embeds in its error text.
+    """
+    hint = getattr(error, "retry_after", None)
+    if hint is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        hint = headers.get("Retry-After")
+    if hint is not None:
+        try:
+            return float(hint)
+        except (TypeError, ValueError):
+            pass
+
+    text = str(error)
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", text) or \
+        re.search(r"retry in ([\d.]+)\s*s", text, re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt, base=2.0, hint=None, cap=MAX_BACKOFF):
+    """
+    Jittered exponential backoff for the given retry attempt (0-based).
+    Never shorter than the server's retry hint.
+    """
+    delay = random.uniform(base, base * 2 ** (attempt + 1))
+    if hint is not None:
+        delay = max(delay, hint)
+    return min(delay, max(cap, hint or 0))
+
+
+# Shared by every Gemini client in the process.
+gemini_limiter = SharedRateLimiter()
@@ -0,0 +1,177 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from langchain_core.documents import Document
+
+from utils.summarize import split_text
+
+# Passages passed on to the LLM per source
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "12"))
+# Size of one retrievable passage, in tokens
+PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "300"))
+# How long fetched documents stay indexed per destination, in seconds
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_SIZE = 32
+# An empty fetch usually means the source failed (the loaders log and return
+# nothing), so it is only kept this long before the source is tried again
+RETRIEVAL_EMPTY_TTL = 60
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "i",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were",
+    "will", "with", "you", "your", "we", "our", "they", "their", "there", "what", "which",
+    "who", "can", "do", "if", "so", "up", "out", "about", "into", "also", "than", "then",
+}
+
+
+def tokenize(text):
+    """Lowercased word stems with stopwords removed."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        # Light stemming so "hiking"/"hikes"/"hike" meet
+        if len(word) > 5 and word.endswith("ing"):
+            word = word[:-3]
+            # "swimming" → "swim", like "swim"; "dressing" keeps its "ss"
+            if word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+        elif len(word) > 4 and word.endswith("es"):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        if len(word) > 3 and word.endswith("e"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def split_interests(interests):
+    """Turn "Hiking, History and Food" (or a list) into separate queries."""
+    if isinstance(interests, (list, tuple)):
+        parts = interests
+    else:
+        parts = re.split(r",|;|\band\b|\n", interests or "")
+    return [part.strip() for part in parts if part.strip()]
+
+
+class BM25Index:
+    """Okapi BM25 ranking over a fixed list of passages."""
+
+    def __init__(self, passages, k1=1.5, b=0.75):
+        """
+        Args:
+            passages (list[Document]): the retrievable units.
+        """
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(p.page_content)) for p in passages]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(passages)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    def scores(self, query):
+        """BM25 score of every passage for `query`."""
+        terms = [term for term in tokenize(query) if term in self.idf]
+        scores = [0.0] * len(self.passages)
+        for i, counts in enumerate(self.term_counts):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    scores[i] += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def rank(self, query):
+        """Indices of passages matching `query`, best first."""
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [i for i in ranked if scores[i] > 0]
+
+    def top_k(self, interests, k=RETRIEVAL_TOP_K):
+        """
+        Select up to `k` passages for the given interests.
+
+        Each interest is ranked separately and the results are interleaved, so
+        every interest gets passages even when one dominates the text. Falls
+        back to the first `k` passages when nothing matches.
+
+        Returns:
+            list[Document]: selected passages in their original order.
+        """
+        rankings = [self.rank(query) for query in split_interests(interests)]
+        chosen = []
+        seen = set()
+        for position in range(max((len(r) for r in rankings), default=0)):
+            for ranking in rankings:
+                if position < len(ranking) and ranking[position] not in seen:
+                    seen.add(ranking[position])
+                    chosen.append(ranking[position])
+            if len(chosen) >= k:
+                break
+
+        if not chosen:
+            return self.passages[:k]
+        return [self.passages[i] for i in sorted(chosen[:k])]
+
+
+def split_passages(docs, passage_tokens=PASSAGE_TOKENS):
+    """Break documents into passages that keep their document's metadata."""
+    passages = []
+    for doc in docs:
+        for text in split_text(doc.page_content, passage_tokens):
+            passages.append(Document(page_content=text, metadata=doc.metadata))
+    return passages
+
+
+class IndexCache:
+    """
+    Keeps each source's fetched documents indexed per destination, so a new
+    set of interests re-ranks the same passages instead of fetching again.
+    Bounded LRU with a TTL, shorter for fetches that returned nothing; shared
+    between threads.
+    """
+
+    def __init__(self, max_entries=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL, empty_ttl=RETRIEVAL_EMPTY_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_or_build(self, key, fetch):
+        """
+        Return the index for `key`, calling `fetch()` for the documents only
+        when it is missing or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.monotonic() < entry[0]:
+                self.entries.move_to_end(key)
+                return entry[1]
+
+        index = BM25Index(split_passages(fetch()))
+        ttl = self.ttl if index.passages else self.empty_ttl
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, index)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return index
+
+
+# Shared by the document sources
+destination_indexes = IndexCache()
@@ -0,0 +1,91 @@
+import os
+import re
+import threading
+from array import array
+
+from utils.disk_cache import DiskCache, make_key
+from utils import tracing
+
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv("ROUTE_CACHE_MAX_ENTRIES", "2000"))
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", str(7 * 24 * 3600)))
+# Decimal places kept for coordinates in keys: 5 is about 1 m
+KEY_PRECISION = 5
+
+_LATLNG = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def normalize_stop(stop):
+    """
+    Canonical form of one stop for cache keys: coordinates (as a pair or a
+    "lat,lng" string) are rounded; place names are lowercased with
+    whitespace collapsed.
+    """
+    if isinstance(stop, (list, tuple)) and len(stop) == 2:
+        return f"{round(float(stop[0]), KEY_PRECISION)},{round(float(stop[1]), KEY_PRECISION)}"
+    match = _LATLNG.match(str(stop))
+    if match:
+        return f"{round(float(match.group(1)), KEY_PRECISION)},{round(float(match.group(2)), KEY_PRECISION)}"
+    return " ".join(str(stop).lower().split())
+
+
+class RouteCache:
+    """
+    Persistent cache of routes keyed by provider, profile and the normalized
+    stop sequence. Directions responses are stored as JSON; bare geometry as
+    packed doubles. Entries expire after a TTL and the least recently used
+    are evicted past `max_entries`.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def key(provider, profile, stops, **options):
+        return make_key("route", provider, profile, [normalize_stop(stop) for stop in stops], options)
+
+    def get_route(self, provider, profile, stops, **options):
+        """The cached route dict, or None."""
+        route = self.store.get(self.key(provider, profile, stops, **options))
+        tracing.add("cache_hits" if route is not None else "cache_misses")
+        return route
+
+    def set_route(self, provider, profile, stops, route, **options):
+        self.store.set(self.key(provider, profile, stops, **options), route)
+
+    def get_points(self, provider, profile, stops, **options):
+        """
+        Cached route geometry.
+        Returns:
+            array: flat [lat0, lng0, lat1, lng1, ...] array('d'), or None.
+        """
+        value = self.store.get(self.key(provider, profile, stops, **options))
+        tracing.add("cache_hits" if value is not None else "cache_misses")
+        if value is None:
+            return None
+        points = array("d")
+        points.frombytes(value)
+        return points
+
+    def set_points(self, provider, profile, stops, points, **options):
+        """Store geometry given as (lat, lng) pairs or a flat array('d')."""
+        if not isinstance(points, array):
+            points = array("d", (value for point in points for value in point))
+        self.store.set(self.key(provider, profile, stops, **options), points.tobytes())
+
+    def stats(self):
+        return self.store.stats()
+
+
+_route_cache = None
+_route_cache_lock = threading.Lock()
+
+
+def get_route_cache():
+    """The process-wide route cache, opened on first use."""
+    global _route_cache
+    with _route_cache_lock:
+        if _route_cache is None:
+            _route_cache = RouteCache(
+                DiskCache("routes.sqlite", max_entries=ROUTE_CACHE_MAX_ENTRIES, ttl=ROUTE_CACHE_TTL)
+            )
+    return _route_cache
@@ -0,0 +1,164 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Haversine on a sphere is within 0.5% of the ellipsoidal geodesic distance
+HAVERSINE_ERROR = 0.005
+# Shortest length of one degree of latitude, so boxes built from it never cut a radius short
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG = 111.320
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """
+    Great-circle distances in km from one point (or an array of points) to
+    arrays of points, in degrees. Inputs broadcast like NumPy arrays.
+    """
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def _geodesic_km(center, lats, lngs):
+    from geopy.distance import geodesic
+
+    return np.array([geodesic(center, (lat, lng)).km for lat, lng in zip(lats, lngs)], dtype=float)
+
+
+class SpatialIndex:
+    """
+    Radius and nearest-neighbor queries over a fixed set of (lat, lng) points.
+
+    Points are bucketed into a grid of `cell_deg` degree cells stored as one
+    sorted array of cell keys, so a radius query only computes distances for
+    points in the cells its bounding box covers. Distances are NumPy
+    haversine, optionally refined with geopy's exact geodesic. Points with a
+    NaN coordinate are never returned. Query results are indices into the
+    arrays the index was built from.
+    """
+
+    def __init__(self, lats, lngs, cell_deg=1.0):
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        ids = np.flatnonzero(~(np.isnan(lats) | np.isnan(lngs)))
+
+        self.cell_deg = cell_deg
+        self.rows = int(math.ceil(180 / cell_deg))
+        self.cols = int(math.ceil(360 / cell_deg))
+        keys = self._row(lats[ids]) * self.cols + self._col(lngs[ids])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.lats = lats[self.ids]
+        self.lngs = lngs[self.ids]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell_deg), 0, self.rows - 1).astype(np.int64)
+
+    def _col(self, lng):
+        return (np.floor((np.asarray(lng) + 180) / self.cell_deg).astype(np.int64)) % self.cols
+
+    def _candidates(self, lat, lng, radius_km):
+        """Positions (into the sorted arrays) of points in the cells around a bounding box."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        first_row, last_row = int(self._row(lat - dlat)), int(self._row(lat + dlat))
+        widest = max(abs(lat - dlat), abs(lat + dlat))
+        if widest >= 90:
+            col_ranges = [(0, self.cols - 1)]
+        else:
+            dlng = radius_km / (KM_PER_DEG_LNG * math.cos(math.radians(widest)))
+            first_col = int(math.floor((lng - dlng + 180) / self.cell_deg))
+            last_col = int(math.floor((lng + dlng + 180) / self.cell_deg))
+            if last_col - first_col + 1 >= self.cols:
+                col_ranges = [(0, self.cols - 1)]
+            elif first_col % self.cols <= last_col % self.cols:
+                col_ranges = [(first_col % self.cols, last_col % self.cols)]
+            else:
+                # The box crosses the antimeridian
+                col_ranges = [(first_col % self.cols, self.cols - 1), (0, last_col % self.cols)]
+
+        rows = np.arange(first_row, last_row + 1, dtype=np.int64)
+        starts = np.concatenate([rows * self.cols + a for a, _ in col_ranges])
+        ends = np.concatenate([rows * self.cols + b for _, b in col_ranges])
+        lo = np.searchsorted(self.keys, starts, side="left")
+        hi = np.searchsorted(self.keys, ends, side="right")
+        spans = [np.arange(a, b) for a, b in zip(lo, hi) if b > a]
+        return np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+
+    def _refine(self, center, positions, radius_km):
+        distances = _geodesic_km(center, self.lats[positions], self.lngs[positions])
+        keep = distances <= radius_km
+        return positions[keep], distances[keep]
+
+    def query_radius(self, center, radius_km, exact=False):
+        """
+        Points within `radius_km` of `center`, nearest first.
+        Args:
+            center (tuple): (lat, lng).
+            exact (bool): refine the haversine distances with the ellipsoidal
+                geodesic (slower, but matches geopy.distance.geodesic).
+        Returns:
+            tuple: (indices, distances in km) as NumPy arrays.
+        """
+        lat, lng = center
+        # Points just outside the haversine radius may be inside the geodesic one
+        reach = radius_km * (1 + HAVERSINE_ERROR) if exact else radius_km
+        positions = self._candidates(lat, lng, reach)
+        distances = haversine_km(lat, lng, self.lats[positions], self.lngs[positions])
+        keep = distances <= reach
+        positions, distances = positions[keep], distances[keep]
+        if exact:
+            positions, distances = self._refine(center, positions, radius_km)
+        order = np.argsort(distances, kind="stable")
+        return self.ids[positions[order]], distances[order]
+
+    def query_radius_many(self, centers, radius_km, exact=False):
+        """
+        query_radius for several centers at once: one vectorized distance
+        matrix instead of a query per center.
+        Returns:
+            list[tuple]: (indices, distances) per center, in order.
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        reach = radius_km * (1 + HAVERSINE_ERROR) if exact else radius_km
+        matrix = haversine_km(centers[:, :1], centers[:, 1:], self.lats[None, :], self.lngs[None, :])
+
+        results = []
+        for center, distances in zip(centers, matrix):
+            positions = np.flatnonzero(distances <= reach)
+            distances = distances[positions]
+            if exact:
+                positions, distances = self._refine(tuple(center), positions, radius_km)
+            order = np.argsort(distances, kind="stable")
+            results.append((self.ids[positions[order]], distances[order]))
+        return results
+
+    def nearest(self, center, k=5, max_km=None):
+        """
+        The `k` points closest to `center`, optionally no further than `max_km`.
+        Returns:
+            tuple: (indices, distances in km), nearest first.
+        """
+        return self.nearest_many([center], k, max_km)[0]
+
+    def nearest_many(self, centers, k=5, max_km=None):
+        """nearest for several centers, as one distance matrix."""
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        if not len(self):
+            return [(self.ids[:0], np.empty(0))] * len(centers)
+        k = min(k, len(self))
+        matrix = haversine_km(centers[:, :1], centers[:, 1:], self.lats[None, :], self.lngs[None, :])
+        closest = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+
+        results = []
+        for distances, positions in zip(matrix, closest):
+            positions = positions[np.argsort(distances[positions], kind="stable")]
+            if max_km is not None:
+                positions = positions[distances[positions] <= max_km]
+            results.append((self.ids[positions], distances[positions]))
+        return results
@@ -9,6 +9,12 @@ def load_data():
             return json.load(f)
     return {"destinations": [], "plans": {}}
 
+def update_plan(data, destination, **fields):
+    """Merge `fields` into a destination's plan, keeping the keys not given (dates, origin)."""
+    plan = data.setdefault("plans", {}).setdefault(destination, {})
+    plan.update(fields)
+    return plan
+
 def save_data(data):
     with open(DATA_FILE, 'w') as f:
         json.dump(data, f)
@@ -0,0 +1,133 @@
+import os
+import re
+
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+# Most prompt text for the final "stuff" call, in tokens
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "8000"))
+# Largest piece of a document summarized in one map call, in tokens
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "2000"))
+# Map calls in flight at once
+MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+
+# Rough English average; good enough for budgeting and avoids a count_tokens API call
+CHARS_PER_TOKEN = 4
+
+MAP_PROMPT = ChatPromptTemplate.from_template(
+    "Using only the text below, list the places, activities and practical tips that help answer: {question}\n"
+    "Keep names exact and be brief. If nothing is relevant, reply with NONE.\n\n{context}"
+)
+
+
+def estimate_tokens(text):
+    """Approximate token count of `text`."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def split_text(text, chunk_tokens=CHUNK_TOKENS):
+    """
+    Split text into pieces of at most `chunk_tokens`, breaking on paragraphs,
+    then sentences, then hard character limits.
+    """
+    limit = chunk_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return [text]
+
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        if len(paragraph) <= limit:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            pieces.extend(sentence[i:i + limit] for i in range(0, len(sentence), limit))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_documents(docs, chunk_tokens=CHUNK_TOKENS):
+    """Split oversized documents; each chunk keeps its document's metadata."""
+    chunks = []
+    for doc in docs:
+        for text in split_text(doc.page_content, chunk_tokens):
+            chunks.append(Document(page_content=text, metadata=doc.metadata))
+    return chunks
+
+
+def _group_within_budget(docs, token_budget):
+    """Pack documents, in order, into groups whose text fits the budget."""
+    groups = []
+    current, used = [], 0
+    for doc in docs:
+        tokens = estimate_tokens(doc.page_content)
+        if current and used + tokens > token_budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(doc)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def summarize_documents(llm, prompt, docs, question, token_budget=SUMMARY_TOKEN_BUDGET,
+                        chunk_tokens=CHUNK_TOKENS, max_concurrency=MAP_CONCURRENCY):
+    """
+    Answer `question` over `docs` without ever sending more than `token_budget`
+    tokens of documents in one prompt.
+
+    Documents that already fit are stuffed into `prompt` in a single call.
+    Otherwise oversized documents are chunked, each chunk is summarized in
+    parallel (map), and the notes are combined, collapsing them again if
+    needed, until they fit the budget for the final call (reduce).
+
+    Args:
+        llm: chat model.
+        prompt (ChatPromptTemplate): final prompt with {question} and {context}.
+        docs (list[Document]): source documents.
+        question (str): the question to answer.
+        token_budget (int): most document tokens per prompt.
+        chunk_tokens (int): largest chunk summarized in one map call.
+        max_concurrency (int): map calls in flight at once.
+    Returns:
+        str: the model's answer.
+    """
+    final_chain = create_stuff_documents_chain(llm=llm, prompt=prompt)
+    if sum(estimate_tokens(doc.page_content) for doc in docs) <= token_budget:
+        return final_chain.invoke({"context": docs, "question": question})
+
+    map_chain = create_stuff_documents_chain(llm=llm, prompt=MAP_PROMPT, output_parser=StrOutputParser())
+    config = {"max_concurrency": max_concurrency}
+
+    # Map: notes for every chunk
+    groups = [[chunk] for chunk in chunk_documents(docs, min(chunk_tokens, token_budget))]
+    while True:
+        notes = map_chain.batch([{"context": group, "question": question} for group in groups], config=config)
+        notes = [
+            Document(page_content=note) for note in notes
+            if note.strip() and note.strip().upper() != "NONE"
+        ]
+        total = sum(estimate_tokens(note.page_content) for note in notes)
+        if total <= token_budget:
+            break
+        # Reduce: collapse notes in budget-sized groups until they fit
+        next_groups = _group_within_budget(notes, token_budget)
+        if len(next_groups) >= len(groups):
+            # Summaries are not shrinking; keep what fits rather than loop
+            notes = _group_within_budget(notes, token_budget)[0]
+            break
+        groups = next_groups
+
+    return final_chain.invoke({"context": notes, "question": question})
@@ -0,0 +1,261 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+_current_run = contextvars.ContextVar("trace_run", default=None)
+_current_span = contextvars.ContextVar("trace_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """One timed operation: a graph node, an LLM call, a tool call or an HTTP request."""
+
+    def __init__(self, kind, name, parent=None, **attrs):
+        self.id = next(_span_ids)
+        self.parent_id = parent.id if parent else None
+        self.kind = kind
+        self.name = name
+        self.attrs = dict(attrs)
+        self.started = time.time()
+        self.start_clock = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def set(self, **attrs):
+        with self.lock:
+            self.attrs.update(attrs)
+
+    def add(self, key, amount=1):
+        """Accumulate a counter or duration, e.g. retries or seconds spent sleeping."""
+        with self.lock:
+            self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self.start_clock
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self, run_id):
+        return {
+            "run_id": run_id,
+            "span_id": self.id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start": self.started,
+            "duration_ms": round((self.duration or 0.0) * 1000, 2),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+class Run:
+    """All spans recorded while one pipeline run was active."""
+
+    def __init__(self, name, **attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def record(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """
+        Aggregate finished spans by kind and name.
+        Returns:
+            list[dict]: one row per (kind, name), slowest total first.
+        """
+        rows = defaultdict(lambda: defaultdict(float))
+        for span in self.spans:
+            row = rows[(span.kind, span.name)]
+            row["count"] += 1
+            row["errors"] += 1 if span.error else 0
+            row["total_s"] += span.duration or 0.0
+            row["max_s"] = max(row["max_s"], span.duration or 0.0)
+            for key in ("queue_s", "sleep_s", "retries", "prompt_tokens", "completion_tokens",
+                        "cache_hits", "cache_misses"):
+                row[key] += span.attrs.get(key, 0)
+
+        table = []
+        for (kind, name), row in rows.items():
+            table.append({"kind": kind, "name": name, **row})
+        return sorted(table, key=lambda r: r["total_s"], reverse=True)
+
+    def format_summary(self):
+        columns = ["kind", "name", "count", "errors", "total_s", "max_s", "queue_s", "sleep_s",
+                   "retries", "prompt_tokens", "completion_tokens", "cache_hits"]
+        lines = [" | ".join(columns)]
+        for row in self.summary():
+            cells = []
+            for column in columns:
+                value = row.get(column, 0)
+                cells.append(f"{value:.2f}" if isinstance(value, float) and column.endswith("_s") else
+                             str(int(value)) if isinstance(value, float) else str(value))
+            lines.append(" | ".join(cells))
+        return "\n".join(lines)
+
+    def write(self, directory=TRACE_DIR):
+        """Write one JSON line per span, then a summary line. Returns the file path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.name}-{self.id}.jsonl")
+        with open(path, "w") as f:
+            for span in self.spans:
+                f.write(json.dumps(span.to_dict(self.id), default=str) + "\n")
+            f.write(json.dumps({"run_id": self.id, "kind": "summary", "name": self.name,
+                                **self.attrs, "rows": self.summary()}, default=str) + "\n")
+        return path
+
+
+@contextmanager
+def start_run(name, write=True, **attrs):
+    """
+    Record every span opened inside this block, then write them as JSON lines
+    to TRACE_DIR and print a per-stage summary table.
+    """
+    run = Run(name, **attrs)
+    token = _current_run.set(run)
+    try:
+        with span("run", name, **attrs):
+            yield run
+    finally:
+        _current_run.reset(token)
+        if write and TRACING_ENABLED:
+            path = run.write()
+            print(f"[Trace] {name} run {run.id} written to {path}\n{run.format_summary()}")
+
+
+@contextmanager
+def span(kind, name, **attrs):
+    """
+    Time the enclosed block as a span of the current run. Outside a run (or
+    with TRACING=0) the span is still usable but not recorded.
+    """
+    run = _current_run.get()
+    current = Span(kind, name, parent=_current_span.get(), **attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(error=e)
+        raise
+    else:
+        current.finish()
+    finally:
+        _current_span.reset(token)
+        if run is not None and TRACING_ENABLED:
+            run.record(current)
+
+
+@contextmanager
+def http_span(method, url, **attrs):
+    """Span for an outgoing HTTP request, named after the host."""
+    with span("http", urlparse(url).netloc or url, method=method, url=url.split("?")[0], **attrs) as current:
+        yield current
+
+
+def add(key, amount=1):
+    """Accumulate `amount` into `key` on the innermost open span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.add(key, amount)
+
+
+def traced(kind, name=None):
+    """Decorator that runs the function inside a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(fn):
+    """
+    Bind `fn` to the caller's trace context so spans it opens on a worker
+    thread (e.g. in a ThreadPoolExecutor) join the same run.
+    """
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+
+class TracingCallback(BaseCallbackHandler):
+    """
+    LangChain callback that records a span for every LLM call (including the
+    ones agents and chains make) and every agent tool call, with token usage.
+    """
+
+    def __init__(self):
+        self.open_spans = {}
+        self.lock = threading.Lock()
+
+    def _start(self, run_id, kind, name, **attrs):
+        run = _current_run.get()
+        if run is None or not TRACING_ENABLED:
+            return
+        current = Span(kind, name, parent=_current_span.get(), **attrs)
+        with self.lock:
+            self.open_spans[run_id] = (run, current)
+
+    def _end(self, run_id, error=None, **attrs):
+        with self.lock:
+            entry = self.open_spans.pop(run_id, None)
+        if entry is None:
+            return
+        run, current = entry
+        current.set(**attrs)
+        current.finish(error=error)
+        run.record(current)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm", (serialized or {}).get("name") or "chat_model")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", (serialized or {}).get("name") or "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        self._end(
+            run_id,
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", (serialized or {}).get("name") or "tool", input=str(input_str)[:200])
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+
+# Attach to LLMs and agent runs to trace them
+tracing_callback = TracingCallback()
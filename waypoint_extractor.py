@@ -0,0 +1,238 @@
+import re
+
+# Same layout PromptScreen.load_steps recognizes
+DAY_PATTERN = re.compile(r"^\*\*\s*(Day\s*\d+)")
+ENTRY_PATTERN = re.compile(r"\*\s+\*\*(.+?)\*\*\s*(.*)")
+BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*")
+LIST_ITEM_PATTERN = re.compile(r"^\s*(?:[*-]|\d+\.)\s+([^:*\n]{3,80}?)\s*(?::|\s-\s|$)")
+
+# Runs of capitalized words, allowing short connectors ("Museum of Art")
+CAPITALIZED_RUN = re.compile(
+    r"[A-Z0-9][\w'’.&-]*(?:\s+(?:(?:of|the|de|la|del|and|on|at|by)\s+)?[A-Z0-9][\w'’.&-]*)*"
+)
+
+# Connectors that join an activity to the place it happens at ("Picnic at
+# Balboa Park"); runs are split there rather than kept as one name
+PLACE_SEPARATOR = re.compile(r"\s+(?:at|on|by)\s+")
+
+# Clock times ("9:00 AM", "7 pm", "14:30"), which would otherwise start a capitalized run
+TIME_PATTERN = re.compile(r"\b\d{1,2}(?::\d{2})?\s*[ap]\.?m\b\.?|\b\d{1,2}:\d{2}\b", re.IGNORECASE)
+
+# Capitalized words that start a sentence but are not part of a place name
+NON_PLACE_WORDS = {
+    "a", "an", "the", "visit", "explore", "hike", "enjoy", "head", "drive", "walk", "take",
+    "breakfast", "brunch", "lunch", "dinner", "check", "checkout", "return", "relax", "stroll",
+    "grab", "depart", "arrive", "arrival", "departure", "free", "morning", "afternoon", "evening",
+    "day", "optional", "travel", "fly", "flight", "spend", "continue", "discover", "experience",
+    "see", "go", "end", "start", "begin", "wake", "sleep", "rest", "dine", "eat", "shop", "tour",
+    "catch", "watch", "learn", "admire", "wander", "pack", "leave", "transfer", "late", "early",
+    "in", "at", "to", "from", "for", "with", "your", "local", "time", "note",
+    "am", "pm", "on", "and", "or", "then", "after", "before",
+}
+
+# Connectors that never end a place name
+TRAILING_WORDS = {"a", "an", "the", "in", "at", "to", "from", "for", "with", "and", "or", "on", "by", "am", "pm"}
+
+# Words that make a capitalized run very likely to be a point of interest
+POI_WORDS = {
+    "park", "museum", "beach", "trail", "zoo", "center", "centre", "canyon", "lake", "garden",
+    "gardens", "market", "pier", "bridge", "island", "monument", "memorial", "cathedral",
+    "church", "temple", "plaza", "square", "tower", "castle", "falls", "peak", "mountain",
+    "point", "bay", "harbor", "harbour", "aquarium", "gallery", "theater", "theatre", "library",
+    "village", "district", "street", "road", "arch", "arches", "cove", "overlook", "state",
+    "national", "historic", "old", "town", "capitol", "stadium", "reserve", "forest", "valley",
+    "airport", "hotel", "resort", "lodge",
+}
+
+
+def normalize_place(name):
+    """Lowercase, strip punctuation and a leading 'the' so names compare reliably."""
+    name = re.sub(r"[^\w\s]", " ", name.lower())
+    name = " ".join(name.split())
+    return name[4:] if name.startswith("the ") else name
+
+
+def parse_itinerary_steps(steps):
+    """
+    Split itinerary lines into days.
+
+    Args:
+        steps (list[str]): itinerary lines as saved in travel_data.json.
+    Returns:
+        dict[str, list[tuple[str, str]]]: "Day N" → list of (time, description).
+    """
+    days = {}
+    current_day = None
+    for step in steps or []:
+        step = step.strip()
+        day_match = DAY_PATTERN.match(step)
+        if day_match:
+            current_day = " ".join(day_match.group(1).split())
+            days.setdefault(current_day, [])
+            continue
+
+        if current_day and step.startswith("*"):
+            entry = ENTRY_PATTERN.match(step)
+            if entry:
+                days[current_day].append((entry.group(1).strip(), entry.group(2).strip()))
+    return days
+
+
+def known_places_from_documents(texts):
+    """
+    Collect point-of-interest names from source document text: bold phrases
+    and the leading names of list items, which is how the source summaries
+    list places.
+
+    Args:
+        texts (list[str]): document text.
+    Returns:
+        list[str]: unique names in first-seen order.
+    """
+    names = {}
+    for text in texts:
+        for line in text.splitlines():
+            candidates = BOLD_PATTERN.findall(line)
+            item = LIST_ITEM_PATTERN.match(line.replace("**", ""))
+            if item:
+                candidates.append(item.group(1))
+            for candidate in candidates:
+                candidate = candidate.strip(" :.-")
+                key = normalize_place(candidate)
+                if key and key not in NON_PLACE_WORDS and len(candidate.split()) <= 8:
+                    names.setdefault(key, candidate)
+    return list(names.values())
+
+
+class Gazetteer:
+    """
+    Known place names, matched against free text by longest normalized word
+    sequence.
+    """
+
+    def __init__(self, names=()):
+        self.names = {}
+        self.max_words = 1
+        self.add_all(names)
+
+    def add(self, name):
+        key = normalize_place(name)
+        if not key or key in NON_PLACE_WORDS:
+            return
+        # Single short words ("Lunch", "Park") match too much
+        if " " not in key and len(key) < 5:
+            return
+        self.names.setdefault(key, name)
+        self.max_words = max(self.max_words, len(key.split()))
+
+    def add_all(self, names):
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def find(self, text):
+        """Return the longest known place name mentioned in `text`, or None."""
+        words = normalize_place(text).split()
+        for size in range(min(self.max_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                key = " ".join(words[start:start + size])
+                if key in self.names:
+                    return self.names[key]
+        return None
+
+
+def _place_words(text):
+    """Words of a capitalized run without the activity words around the name, or []."""
+    words = text.split()
+    while words and words[0].lower().strip(".") in NON_PLACE_WORDS:
+        words.pop(0)
+    while words and words[-1].lower().strip(".") in TRAILING_WORDS:
+        words.pop()
+    # A lone generic word ("Hotel", "Beach") is not a specific place
+    if len(words) == 1 and words[0].lower() in POI_WORDS:
+        return []
+    if all(word.lower() in NON_PLACE_WORDS for word in words):
+        return []
+    return words
+
+
+def guess_place(description, gazetteer=None):
+    """
+    Pull a likely place name out of an activity description using its
+    capitalization, e.g. "Visit the USS Midway Museum" → "USS Midway Museum".
+    A run joined by "at", "on" or "by" keeps its last part that `gazetteer`
+    knows or that ends in a point-of-interest word, so "Picnic at Balboa
+    Park" → "Balboa Park".
+    Returns None when nothing looks like a place.
+    """
+    description = TIME_PATTERN.sub(";", description)
+    text = description.split(":", 1)[0] if ":" in description[:60] else description
+    candidates = []
+    for run in CAPITALIZED_RUN.findall(text) + CAPITALIZED_RUN.findall(description):
+        names = [" ".join(words).rstrip(".,") for words in map(_place_words, PLACE_SEPARATOR.split(run)) if words]
+        if not names:
+            continue
+        known = [name for name in names if gazetteer is not None and gazetteer.find(name)]
+        suffixed = [name for name in names if normalize_place(name).split()[-1:] and normalize_place(name).split()[-1] in POI_WORDS]
+        candidates.append((known or suffixed or names)[-1])
+
+    if not candidates:
+        return None
+    with_poi = [c for c in candidates if POI_WORDS & set(normalize_place(c).split())]
+    return max(with_poi or candidates, key=len)
+
+
+def extract_waypoint_schedule(steps, gazetteer=None, context=None, fallback=None):
+    """
+    Build the daily waypoint schedule from itinerary text without a model call.
+
+    Each activity is resolved against the gazetteer first, then by
+    capitalization. Lines neither can resolve are passed, in one batch, to
+    `fallback` if given.
+
+    Args:
+        steps (list[str]): itinerary lines.
+        gazetteer (Gazetteer): known place names.
+        context (str): appended to each place (e.g. the destination city) to help geocoding.
+        fallback (callable): takes a list of descriptions and returns a dict
+            description → place name (or None).
+    Returns:
+        dict[str, list[str]]: "Day N" → ordered, de-duplicated waypoints. Empty
+        if the steps do not follow the **Day N** layout.
+    """
+    gazetteer = gazetteer or Gazetteer()
+    days = parse_itinerary_steps(steps)
+
+    resolved = {}
+    unresolved = []
+    for entries in days.values():
+        for _, description in entries:
+            if description in resolved:
+                continue
+            place = gazetteer.find(description) or guess_place(description, gazetteer)
+            resolved[description] = place
+            if place is None:
+                unresolved.append(description)
+
+    if unresolved and fallback:
+        for description, place in (fallback(unresolved) or {}).items():
+            if place:
+                resolved[description] = place
+
+    schedule = {}
+    for day, entries in days.items():
+        waypoints = []
+        seen = set()
+        for _, description in entries:
+            place = resolved.get(description)
+            if not place or normalize_place(place) in seen:
+                continue
+            seen.add(normalize_place(place))
+            if context and normalize_place(context) not in normalize_place(place):
+                place = f"{place}, {context}"
+            waypoints.append(place)
+        if waypoints:
+            schedule[day] = waypoints
+    return schedule